@@ -0,0 +1 @@
+"""Benchmarks for tacl, run with python -m benchmarks.run."""
@@ -0,0 +1,76 @@
+"""Compares two JSON benchmark reports produced by benchmarks.run.
+
+Usage: python -m benchmarks.compare BASELINE CURRENT [--threshold 1.1]
+
+For each operation and scale present in both reports, prints the
+ratio of the current to the baseline minimum time and peak memory,
+marking those that exceed the threshold. Exits with status 1 if any
+regression is found.
+
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as fh:
+        report = json.load(fh)
+    return {(result['scale'], result['operation']): result
+            for result in report['results']}
+
+
+def compare(baseline, current, threshold):
+    """Returns the lines of a comparison of `current` with `baseline`,
+    and whether any regression was found.
+
+    :param baseline: results keyed by scale and operation
+    :type baseline: `dict`
+    :param current: results keyed by scale and operation
+    :type current: `dict`
+    :param threshold: ratio above which a change is a regression
+    :type threshold: `float`
+    :rtype: `tuple` of `list` of `str` and `bool`
+
+    """
+    lines = ['{:<8} {:<20} {:>10} {:>10} {:>8} {:>8}'.format(
+        'scale', 'operation', 'time (s)', 'memory', 'time', 'memory')]
+    regressed = False
+    for key in sorted(set(baseline) & set(current)):
+        old, new = baseline[key], current[key]
+        ratios = []
+        for field in ('min_time', 'peak_memory'):
+            if not old[field] or new[field] is None:
+                ratios.append('{:>8}'.format('-'))
+                continue
+            ratio = new[field] / old[field]
+            marker = '!' if ratio > threshold else ' '
+            if marker == '!':
+                regressed = True
+            ratios.append('{:>7.2f}{}'.format(ratio, marker))
+        memory = new['peak_memory']
+        lines.append('{:<8} {:<20} {:>10.3f} {:>10} {} {}'.format(
+            key[0], key[1], new['min_time'], '-' if memory is None else memory,
+            *ratios))
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare two tacl benchmark reports.')
+    parser.add_argument('baseline', help='Path to baseline JSON report')
+    parser.add_argument('current', help='Path to current JSON report')
+    parser.add_argument('--threshold', default=1.1, type=float,
+                        help='Ratio above which a change is reported as '
+                        'a regression')
+    args = parser.parse_args()
+    lines, regressed = compare(load(args.baseline), load(args.current),
+                               args.threshold)
+    print('\n'.join(lines))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Module containing functions to generate synthetic corpora for
+benchmarking.
+
+The corpora are generated deterministically from a seed, without
+any external data, so that benchmarks may be run offline and their
+results compared across runs.
+
+"""
+
+import bisect
+import itertools
+import os
+import random
+
+from tacl import Catalogue, constants
+
+
+CBETA_STYLE = 'cbeta'
+LATIN_STYLE = 'latin'
+STYLES = (CBETA_STYLE, LATIN_STYLE)
+
+# Sigla used for the witnesses of each work, in order.
+CBETA_SIGLA = ('大', '宋', '元', '明', '宮', '聖')
+LATIN_SIGLA = ('base', 'A', 'B', 'C', 'D', 'E')
+
+# Number of distinct tokens in the vocabulary of each style.
+CBETA_VOCABULARY_SIZE = 4000
+LATIN_VOCABULARY_SIZE = 12000
+
+LATIN_ONSETS = ('', 'b', 'c', 'd', 'f', 'g', 'l', 'm', 'n', 'p', 'qu', 'r',
+                's', 't', 'v', 'st', 'tr', 'pr')
+LATIN_VOWELS = ('a', 'e', 'i', 'o', 'u', 'ae')
+LATIN_ENDINGS = ('', 'us', 'um', 'a', 'is', 'em', 'es', 'ibus', 'orum', 'it',
+                 'unt', 'ur')
+
+
+class CorpusGenerator:
+
+    """Generates a synthetic corpus of works, each with multiple
+    witnesses, laid out as a tacl corpus directory.
+
+    Works are made of tokens drawn from a Zipfian distribution over a
+    vocabulary resembling either CBETA Chinese (one character per
+    token) or Latin (space separated words). A proportion of each
+    work, given by `shared_density`, is made up of passages taken
+    from a pool that is common to the whole corpus, so that the
+    works share n-grams longer than chance would produce. Each
+    witness other than the first is a copy of the first with a small
+    proportion of its tokens varied.
+
+    """
+
+    def __init__(self, style=CBETA_STYLE, works=10, witnesses=2,
+                 tokens=5000, shared_density=0.2, passage_length=30,
+                 variation=0.01, labels=2, seed=0):
+        """Initialise a CorpusGenerator object.
+
+        :param style: style of corpus to generate
+        :type style: `str`
+        :param works: number of works
+        :type works: `int`
+        :param witnesses: number of witnesses of each work
+        :type witnesses: `int`
+        :param tokens: number of tokens in each witness
+        :type tokens: `int`
+        :param shared_density: proportion of each work made up of
+                               shared passages
+        :type shared_density: `float`
+        :param passage_length: number of tokens in each shared passage
+        :type passage_length: `int`
+        :param variation: proportion of tokens varied in each
+                          witness other than the first
+        :type variation: `float`
+        :param labels: number of labels in the generated catalogue
+        :type labels: `int`
+        :param seed: seed for the random number generator
+        :type seed: `int`
+
+        """
+        if style not in STYLES:
+            raise ValueError('Unknown corpus style "{}"'.format(style))
+        if style == CBETA_STYLE:
+            self._sigla = CBETA_SIGLA
+            self._tokenizer_choice = constants.TOKENIZER_CHOICE_CBETA
+        else:
+            self._sigla = LATIN_SIGLA
+            self._tokenizer_choice = constants.TOKENIZER_CHOICE_LATIN
+        if witnesses > len(self._sigla):
+            raise ValueError('At most {} witnesses may be generated'.format(
+                len(self._sigla)))
+        self._style = style
+        self._works = works
+        self._witnesses = witnesses
+        self._tokens = tokens
+        self._shared_density = shared_density
+        self._passage_length = passage_length
+        self._variation = variation
+        self._labels = labels
+        self._seed = seed
+
+    @property
+    def parameters(self):
+        """Returns the parameters of the generated corpus.
+
+        :rtype: `dict`
+
+        """
+        return {'style': self._style, 'works': self._works,
+                'witnesses': self._witnesses, 'tokens': self._tokens,
+                'shared_density': self._shared_density,
+                'passage_length': self._passage_length,
+                'variation': self._variation, 'labels': self._labels,
+                'seed': self._seed}
+
+    @property
+    def tokenizer_choice(self):
+        return self._tokenizer_choice
+
+    def generate(self, path):
+        """Writes the corpus to the directory at `path`, and returns a
+        catalogue labelling its works.
+
+        :param path: path to corpus directory
+        :type path: `str`
+        :rtype: `Catalogue`
+
+        """
+        rng = random.Random(self._seed)
+        vocabulary = self._generate_vocabulary(rng)
+        # Weight each token's likelihood by the inverse of its rank.
+        cumulative_weights = list(itertools.accumulate(
+            1 / rank for rank in range(1, len(vocabulary) + 1)))
+        total_weight = cumulative_weights[-1]
+
+        def draw(count):
+            return [vocabulary[bisect.bisect(
+                cumulative_weights, rng.random() * total_weight)]
+                    for _ in range(count)]
+
+        passage_count = max(1, self._works * 2)
+        passages = [draw(self._passage_length) for _ in range(passage_count)]
+        catalogue = Catalogue()
+        joiner = constants.TOKENIZERS[self._tokenizer_choice][1]
+        for index in range(self._works):
+            work = 'W{:04d}'.format(index + 1)
+            tokens = self._generate_work(rng, draw, passages)
+            work_path = os.path.join(path, work)
+            os.makedirs(work_path, exist_ok=True)
+            for siglum_index, siglum in enumerate(
+                    self._sigla[:self._witnesses]):
+                if siglum_index:
+                    witness_tokens = self._vary(rng, draw, tokens)
+                else:
+                    witness_tokens = tokens
+                self._write_witness(work_path, siglum, witness_tokens,
+                                    joiner)
+            catalogue[work] = 'L{}'.format(index % self._labels + 1)
+        return catalogue
+
+    def _generate_vocabulary(self, rng):
+        """Returns a list of distinct tokens in the style of the corpus.
+
+        :param rng: random number generator
+        :type rng: `random.Random`
+        :rtype: `list` of `str`
+
+        """
+        if self._style == CBETA_STYLE:
+            # Draw from the CJK Unified Ideographs block.
+            codepoints = rng.sample(range(0x4E00, 0x9FA6),
+                                    CBETA_VOCABULARY_SIZE)
+            return [chr(codepoint) for codepoint in codepoints]
+        vocabulary = set()
+        while len(vocabulary) < LATIN_VOCABULARY_SIZE:
+            syllables = [rng.choice(LATIN_ONSETS) + rng.choice(LATIN_VOWELS)
+                         for _ in range(rng.randint(1, 3))]
+            vocabulary.add(''.join(syllables) + rng.choice(LATIN_ENDINGS))
+        return sorted(vocabulary)
+
+    def _generate_work(self, rng, draw, passages):
+        """Returns the tokens of a work, made up of fresh tokens and
+        shared passages.
+
+        :param rng: random number generator
+        :type rng: `random.Random`
+        :param draw: function returning a number of random tokens
+        :type draw: `function`
+        :param passages: shared passages
+        :type passages: `list` of `list` of `str`
+        :rtype: `list` of `str`
+
+        """
+        tokens = []
+        shared_probability = self._shared_density / self._passage_length
+        while len(tokens) < self._tokens:
+            if rng.random() < shared_probability:
+                tokens.extend(rng.choice(passages))
+            else:
+                tokens.extend(draw(1))
+        return tokens[:self._tokens]
+
+    def _vary(self, rng, draw, tokens):
+        """Returns a copy of `tokens` with a proportion of them replaced
+        by random tokens.
+
+        :param rng: random number generator
+        :type rng: `random.Random`
+        :param draw: function returning a number of random tokens
+        :type draw: `function`
+        :param tokens: tokens to vary
+        :type tokens: `list` of `str`
+        :rtype: `list` of `str`
+
+        """
+        varied = list(tokens)
+        for _ in range(int(len(tokens) * self._variation)):
+            varied[rng.randrange(len(varied))] = draw(1)[0]
+        return varied
+
+    def _write_witness(self, work_path, siglum, tokens, joiner):
+        """Writes `tokens` as the witness `siglum` in `work_path`, broken
+        into lines.
+
+        :param work_path: path to work directory
+        :type work_path: `str`
+        :param siglum: siglum of witness
+        :type siglum: `str`
+        :param tokens: tokens of witness
+        :type tokens: `list` of `str`
+        :param joiner: string to join tokens with
+        :type joiner: `str`
+
+        """
+        line_length = 20
+        lines = [joiner.join(tokens[index:index+line_length])
+                 for index in range(0, len(tokens), line_length)]
+        path = os.path.join(work_path, '{}.txt'.format(siglum))
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write('\n'.join(lines))
+            fh.write('\n')
@@ -0,0 +1,347 @@
+"""Runs the tacl benchmarks and writes a JSON report of the results.
+
+Usage: python -m benchmarks.run [options]
+
+For each requested scale, a synthetic corpus is generated and each
+benchmarked operation is timed over a number of repetitions, with
+its peak memory use measured in a separate run. Each operation is
+set up afresh before every run, outside of the measured region.
+
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import tacl
+from tacl import constants
+
+from .corpus_generator import CorpusGenerator, CBETA_STYLE, STYLES
+
+
+REPORT_VERSION = 1
+
+# Number of works and tokens per witness at each scale.
+SCALES = {
+    'small': {'works': 4, 'tokens': 1000},
+    'medium': {'works': 6, 'tokens': 2000},
+    'large': {'works': 12, 'tokens': 10000},
+}
+DEFAULT_SCALES = ['small']
+
+
+class Fixture:
+
+    """Corpus, catalogue, data store and query results shared by the
+    benchmarks of a single scale."""
+
+    def __init__(self, base_dir, generator, minimum, maximum):
+        self.base_dir = base_dir
+        self.minimum = minimum
+        self.maximum = maximum
+        self.corpus_dir = os.path.join(base_dir, 'corpus')
+        self.catalogue = generator.generate(self.corpus_dir)
+        self.labels = self.catalogue.ordered_labels
+        self.tokenizer = tacl.Tokenizer(
+            *constants.TOKENIZERS[generator.tokenizer_choice])
+        self.corpus = tacl.Corpus(self.corpus_dir, self.tokenizer)
+        self.db_path = os.path.join(base_dir, 'ngrams.db')
+        # The data store holds an exclusive lock on its database, so
+        # the one store is used by all of the query benchmarks.
+        self.store = tacl.DataStore(self.db_path, False)
+        self.store.add_ngrams(self.corpus, minimum, maximum, filters=True)
+        self.intersect_results = self.store.intersection(
+            self.catalogue, io.StringIO()).getvalue()
+        self.diff_results = self.store.diff(
+            self.catalogue, self.tokenizer, io.StringIO()).getvalue()
+        self.intersect_path = os.path.join(base_dir, 'intersect.csv')
+        with open(self.intersect_path, 'w', encoding='utf-8',
+                  newline='') as fh:
+            fh.write(self.intersect_results)
+        self._path_count = 0
+
+    def get_output_dir(self):
+        """Returns the path to a new, empty directory."""
+        path = self.get_path('output{}')
+        os.makedirs(path)
+        return path
+
+    def get_path(self, name):
+        """Returns a new path in the fixture's directory, formed by
+        formatting `name` with a number unique within the fixture."""
+        self._path_count += 1
+        return os.path.join(self.base_dir, name.format(self._path_count))
+
+    def get_results(self, data):
+        return tacl.Results(io.StringIO(data), self.tokenizer)
+
+
+def prepare_add_ngrams(fixture):
+    store = tacl.DataStore(fixture.get_path('add{}.db'), False)
+    return lambda: store.add_ngrams(fixture.corpus, fixture.minimum,
+                                    fixture.maximum)
+
+
+def prepare_add_ngrams_filters(fixture):
+    store = tacl.DataStore(fixture.get_path('add{}.db'), False)
+    return lambda: store.add_ngrams(fixture.corpus, fixture.minimum,
+                                    fixture.maximum, filters=True)
+
+
+def prepare_add_ngrams_filters_minhashes(fixture):
+    store = tacl.DataStore(fixture.get_path('add{}.db'), False)
+    return lambda: store.add_ngrams(fixture.corpus, fixture.minimum,
+                                    fixture.maximum, filters=True,
+                                    minhashes=True)
+
+
+def prepare_add_ngrams_minhashes(fixture):
+    store = tacl.DataStore(fixture.get_path('add{}.db'), False)
+    return lambda: store.add_ngrams(fixture.corpus, fixture.minimum,
+                                    fixture.maximum, minhashes=True)
+
+
+def prepare_intersection(fixture):
+    return lambda: fixture.store.intersection(fixture.catalogue, io.StringIO())
+
+
+def prepare_intersection_engine(engine):
+    def prepare(fixture):
+        return lambda: fixture.store.intersection(
+            fixture.catalogue, io.StringIO(), engine=engine)
+    return prepare
+
+
+def prepare_diff(fixture):
+    return lambda: fixture.store.diff(fixture.catalogue, fixture.tokenizer,
+                                      io.StringIO())
+
+
+def prepare_diff_asymmetric(fixture):
+    return lambda: fixture.store.diff_asymmetric(
+        fixture.catalogue, fixture.labels[0], fixture.tokenizer,
+        io.StringIO())
+
+
+def prepare_diff_asymmetric_engine(engine):
+    def prepare(fixture):
+        return lambda: fixture.store.diff_asymmetric(
+            fixture.catalogue, fixture.labels[0], fixture.tokenizer,
+            io.StringIO(), engine=engine)
+    return prepare
+
+
+def prepare_reduce(fixture):
+    results = fixture.get_results(fixture.intersect_results)
+    return results.reduce
+
+
+def prepare_extend(fixture):
+    results = fixture.get_results(fixture.intersect_results)
+    return lambda: results.extend(fixture.corpus)
+
+
+def prepare_bifurcated_extend(fixture):
+    results = fixture.get_results(fixture.intersect_results)
+    return lambda: results.bifurcated_extend(fixture.corpus,
+                                             fixture.maximum + 2)
+
+
+def prepare_zero_fill(fixture):
+    results = fixture.get_results(fixture.diff_results)
+    return lambda: results.zero_fill(fixture.corpus)
+
+
+def prepare_statistics_report(fixture):
+    report = tacl.StatisticsReport(fixture.corpus, fixture.tokenizer,
+                                   io.StringIO(fixture.intersect_results))
+    return report.generate_statistics
+
+
+def prepare_lifetime_report(fixture):
+    results = fixture.get_results(fixture.intersect_results)
+    output_dir = fixture.get_output_dir()
+    report = tacl.LifetimeReport()
+    return lambda: report.generate(output_dir, fixture.catalogue, results,
+                                   fixture.labels[0])
+
+
+def prepare_highlight_report(fixture):
+    output_dir = fixture.get_output_dir()
+    report = tacl.ResultsHighlightReport(fixture.corpus, fixture.tokenizer)
+    work = sorted(fixture.catalogue)[0]
+    return lambda: report.generate(output_dir, work, fixture.intersect_path)
+
+
+OPERATIONS = (
+    ('add_ngrams', prepare_add_ngrams),
+    ('add_ngrams_filters', prepare_add_ngrams_filters),
+    ('add_ngrams_filters_minhashes', prepare_add_ngrams_filters_minhashes),
+    ('add_ngrams_minhashes', prepare_add_ngrams_minhashes),
+    ('intersection', prepare_intersection),
+    ('intersection_filter', prepare_intersection_engine(
+        constants.INTERSECT_ENGINE_FILTER)),
+    ('intersection_merge', prepare_intersection_engine(
+        constants.INTERSECT_ENGINE_MERGE)),
+    ('intersection_subquery', prepare_intersection_engine(
+        constants.INTERSECT_ENGINE_SUBQUERY)),
+    ('diff', prepare_diff),
+    ('diff_asymmetric', prepare_diff_asymmetric),
+    ('diff_asymmetric_filter', prepare_diff_asymmetric_engine(
+        constants.DIFF_ASYMMETRIC_ENGINE_FILTER)),
+    ('diff_asymmetric_query', prepare_diff_asymmetric_engine(
+        constants.DIFF_ASYMMETRIC_ENGINE_QUERY)),
+    ('reduce', prepare_reduce),
+    ('extend', prepare_extend),
+    ('bifurcated_extend', prepare_bifurcated_extend),
+    ('zero_fill', prepare_zero_fill),
+    ('statistics_report', prepare_statistics_report),
+    ('lifetime_report', prepare_lifetime_report),
+    ('highlight_report', prepare_highlight_report),
+)
+
+
+def measure(prepare, fixture, repeat, trace_memory=True):
+    """Returns the timings and peak memory use of the operation set up
+    by `prepare`.
+
+    The operation is first run once untimed, so that operations that
+    read the same data are timed alike, rather than the first of them
+    also paying for reading the data into the operating system's and
+    SQLite's caches.
+
+    Memory is traced in its own run, since tracing slows down the
+    operation. Only memory allocated through Python's allocators,
+    which includes that of numpy and pandas, is traced.
+
+    :param prepare: function returning the operation to measure
+    :type prepare: `function`
+    :param fixture: benchmark fixture
+    :type fixture: `Fixture`
+    :param repeat: number of timed runs
+    :type repeat: `int`
+    :param trace_memory: whether to measure peak memory use
+    :type trace_memory: `bool`
+    :rtype: `dict`
+
+    """
+    prepare(fixture)()
+    times = []
+    for _ in range(repeat):
+        operation = prepare(fixture)
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    peak_memory = None
+    if trace_memory:
+        operation = prepare(fixture)
+        tracemalloc.start()
+        try:
+            operation()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'times': times, 'min_time': min(times),
+            'median_time': statistics.median(times),
+            'peak_memory': peak_memory}
+
+
+def get_environment():
+    return {'python': platform.python_version(),
+            'platform': platform.platform(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'sqlite': sqlite3.sqlite_version}
+
+
+def run(scales, operations, style, shared_density, seed, repeat, minimum,
+        maximum, trace_memory=True, work_dir=None):
+    """Returns a report of running `operations` at each of `scales`.
+
+    :rtype: `dict`
+
+    """
+    parameters = {'style': style, 'shared_density': shared_density,
+                  'seed': seed, 'repeat': repeat, 'minimum': minimum,
+                  'maximum': maximum, 'trace_memory': trace_memory}
+    report = {'version': REPORT_VERSION, 'environment': get_environment(),
+              'parameters': parameters, 'results': []}
+    for scale in scales:
+        generator = CorpusGenerator(
+            style=style, shared_density=shared_density, seed=seed,
+            labels=3, **SCALES[scale])
+        base_dir = tempfile.mkdtemp(dir=work_dir)
+        try:
+            fixture = Fixture(base_dir, generator, minimum, maximum)
+            for name, prepare in OPERATIONS:
+                if name not in operations:
+                    continue
+                print('{}: {}'.format(scale, name), file=sys.stderr)
+                result = {'operation': name, 'scale': scale,
+                          'corpus': generator.parameters}
+                result.update(measure(prepare, fixture, repeat,
+                                      trace_memory))
+                report['results'].append(result)
+        finally:
+            shutil.rmtree(base_dir)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the tacl benchmarks and output a JSON report.')
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES),
+                        dest='scales', help='Scale to run the benchmarks '
+                        'at; may be specified multiple times (default: {})'
+                        .format(', '.join(DEFAULT_SCALES)))
+    parser.add_argument('--operation', action='append',
+                        choices=[name for name, prepare in OPERATIONS],
+                        dest='operations', help='Operation to benchmark; '
+                        'may be specified multiple times (default: all)')
+    parser.add_argument('--style', choices=STYLES, default=CBETA_STYLE,
+                        help='Style of synthetic corpus')
+    parser.add_argument('--density', default=0.2, type=float,
+                        help='Proportion of each work made up of shared '
+                        'passages')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Seed for corpus generation')
+    parser.add_argument('--repeat', default=3, type=int,
+                        help='Number of timed runs of each operation')
+    parser.add_argument('--min-size', default=2, dest='minimum', type=int,
+                        help='Minimum n-gram size')
+    parser.add_argument('--max-size', default=4, dest='maximum', type=int,
+                        help='Maximum n-gram size')
+    parser.add_argument('--no-memory', action='store_false',
+                        dest='trace_memory', help='Do not measure peak '
+                        'memory use')
+    parser.add_argument('--work-dir', help='Directory to create temporary '
+                        'files in')
+    parser.add_argument('-o', '--output', help='Path to write the JSON '
+                        'report to (default: standard output)')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    operations = args.operations or [name for name, prepare in OPERATIONS]
+    report = run(args.scales or DEFAULT_SCALES, operations, args.style,
+                 args.density, args.seed, args.repeat, args.minimum,
+                 args.maximum, args.trace_memory, args.work_dir)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from .lifetime_report import LifetimeReport
 from .results import Results
 from .sequence import SequenceReport
 from .statistics_report import StatisticsReport
+from .supplied_store import SuppliedStore
 from .stripper import Stripper
 from .tei_corpus import TEICorpusCBETAGitHub
 from .text import FilteredWitnessText
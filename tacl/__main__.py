@@ -2,6 +2,7 @@
 texts."""
 
 import argparse
+import cProfile
 import io
 import os
 import sys
@@ -10,7 +11,7 @@ import colorlog
 
 import tacl
 import tacl.cli.utils as utils
-from tacl import constants
+from tacl import constants, profiler
 from tacl.cli.formatters import ParagraphFormatter
 from tacl.exceptions import TACLError
 
@@ -22,10 +23,21 @@ def main():
     if hasattr(args, 'verbose'):
         utils.configure_logging(args.verbose, logger)
     if hasattr(args, 'func'):
+        if args.profile:
+            profiler.enable()
+        if args.profile_stats:
+            stats_profile = cProfile.Profile()
+            stats_profile.enable()
         try:
             args.func(args, parser)
         except TACLError as err:
             parser.error(err)
+        finally:
+            if args.profile_stats:
+                stats_profile.disable()
+                stats_profile.dump_stats(args.profile_stats)
+            if args.profile:
+                profiler.disable().write_trace(args.profile)
     else:
         parser.print_help()
 
@@ -38,7 +50,8 @@ def align_results(args, parser):
         results = open(args.results, 'r', encoding='utf-8', newline='')
     tokenizer = utils.get_tokenizer(args)
     corpus = tacl.Corpus(args.corpus, tokenizer)
-    report = tacl.SequenceReport(corpus, tokenizer, results)
+    report = tacl.SequenceReport(corpus, tokenizer, results,
+                                 args.band_width, args.processes)
     report.generate(args.output, args.minimum)
 
 
@@ -75,6 +88,10 @@ def generate_parser():
     parser = argparse.ArgumentParser(
         description=constants.TACL_DESCRIPTION,
         formatter_class=ParagraphFormatter)
+    parser.add_argument('--profile', help=constants.PROFILE_HELP,
+                        metavar='PROFILE')
+    parser.add_argument('--profile-stats', help=constants.PROFILE_STATS_HELP,
+                        metavar='STATS')
     subparsers = parser.add_subparsers(title='subcommands')
     generate_align_subparser(subparsers)
     generate_catalogue_subparser(subparsers)
@@ -89,6 +106,7 @@ def generate_parser():
     generate_results_subparser(subparsers)
     generate_supplied_diff_subparser(subparsers)
     generate_search_subparser(subparsers)
+    generate_similar_subparser(subparsers)
     generate_supplied_intersect_subparser(subparsers)
     generate_statistics_subparser(subparsers)
     generate_strip_subparser(subparsers)
@@ -104,8 +122,11 @@ def generate_align_subparser(subparsers):
         formatter_class=ParagraphFormatter, help=constants.ALIGN_HELP)
     parser.set_defaults(func=align_results)
     utils.add_common_arguments(parser)
+    parser.add_argument('--band-width', help=constants.ALIGN_BAND_WIDTH_HELP,
+                        metavar='BAND_WIDTH', type=int)
     parser.add_argument('-m', '--minimum', default=20,
                         help=constants.ALIGN_MINIMUM_SIZE_HELP, type=int)
+    utils.add_processes_argument(parser)
     utils.add_corpus_arguments(parser)
     parser.add_argument('output', help=constants.ALIGN_OUTPUT_HELP,
                         metavar='OUTPUT')
@@ -204,6 +225,7 @@ def generate_highlight_subparser(subparsers):
                        help=constants.HIGHLIGHT_RESULTS_HELP)
     parser.add_argument('-l', '--label', action='append', metavar='LABEL',
                         help=constants.HIGHLIGHT_LABEL_HELP)
+    utils.add_processes_argument(parser)
     utils.add_corpus_arguments(parser)
     parser.add_argument('base_name', help=constants.HIGHLIGHT_BASE_NAME_HELP,
                         metavar='BASE_NAME')
@@ -220,6 +242,9 @@ def generate_intersect_subparser(subparsers):
         help=constants.INTERSECT_HELP)
     parser.set_defaults(func=ngram_intersection)
     utils.add_common_arguments(parser)
+    parser.add_argument('--engine', choices=constants.INTERSECT_ENGINES,
+                        default=constants.INTERSECT_ENGINE_AUTO,
+                        help=constants.INTERSECT_ENGINE_HELP)
     utils.add_db_arguments(parser)
     utils.add_corpus_arguments(parser)
     utils.add_query_arguments(parser)
@@ -251,7 +276,8 @@ def generate_ngrams(args, parser):
         catalogue = utils.get_catalogue(args)
     else:
         catalogue = None
-    store.add_ngrams(corpus, args.min_size, args.max_size, catalogue)
+    store.add_ngrams(corpus, args.min_size, args.max_size, catalogue,
+                     args.filters, args.minhashes)
 
 
 def generate_ngrams_subparser(subparsers):
@@ -266,6 +292,10 @@ def generate_ngrams_subparser(subparsers):
     parser.add_argument('-c', '--catalogue', dest='catalogue',
                         help=constants.NGRAMS_CATALOGUE_HELP,
                         metavar='CATALOGUE')
+    parser.add_argument('--filters', action='store_true',
+                        help=constants.NGRAMS_FILTERS_HELP)
+    parser.add_argument('--minhashes', action='store_true',
+                        help=constants.NGRAMS_MINHASHES_HELP)
     utils.add_db_arguments(parser)
     utils.add_corpus_arguments(parser)
     parser.add_argument('min_size', help=constants.NGRAMS_MINIMUM_HELP,
@@ -283,6 +313,9 @@ def generate_prepare_subparser(subparsers):
         help=constants.PREPARE_HELP)
     parser.set_defaults(func=prepare_xml)
     utils.add_common_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help=constants.PREPARE_INCREMENTAL_HELP)
+    utils.add_processes_argument(parser)
     parser.add_argument('-s', '--source', dest='source',
                         choices=constants.TEI_SOURCE_CHOICES,
                         default=constants.TEI_SOURCE_CBETA_GITHUB,
@@ -342,6 +375,7 @@ def generate_results_subparser(subparsers):
                         metavar='COUNT', type=int)
     parser.add_argument('--ngrams', dest='ngrams',
                         help=constants.RESULTS_NGRAMS_HELP, metavar='NGRAMS')
+    utils.add_processes_argument(parser)
     parser.add_argument('--reciprocal', action='store_true',
                         help=constants.RESULTS_RECIPROCAL_HELP)
     parser.add_argument('--reduce', action='store_true',
@@ -390,10 +424,29 @@ def generate_search_subparser(subparsers):
                         nargs='*', metavar='NGRAMS')
 
 
+def generate_similar_subparser(subparsers):
+    """Adds a sub-command parser to `subparsers` to list witnesses
+    similar to those of a work."""
+    parser = subparsers.add_parser(
+        'similar', description=constants.SIMILAR_DESCRIPTION,
+        epilog=constants.SIMILAR_EPILOG, formatter_class=ParagraphFormatter,
+        help=constants.SIMILAR_HELP)
+    parser.set_defaults(func=similar_works)
+    utils.add_common_arguments(parser)
+    parser.add_argument('--minimum', default=0.0,
+                        help=constants.SIMILAR_MINIMUM_HELP, type=float)
+    parser.add_argument('-s', '--size', help=constants.SIMILAR_SIZE_HELP,
+                        type=int)
+    utils.add_db_arguments(parser)
+    parser.add_argument('work', help=constants.SIMILAR_WORK_HELP,
+                        metavar='WORK')
+
+
 def generate_statistics(args, parser):
     corpus = utils.get_corpus(args)
     tokenizer = utils.get_tokenizer(args)
-    report = tacl.StatisticsReport(corpus, tokenizer, args.results)
+    report = tacl.StatisticsReport(corpus, tokenizer, args.results,
+                                   args.processes)
     report.generate_statistics()
     report.csv(sys.stdout)
 
@@ -406,6 +459,7 @@ def generate_statistics_subparser(subparsers):
         formatter_class=ParagraphFormatter, help=constants.STATISTICS_HELP)
     parser.set_defaults(func=generate_statistics)
     utils.add_common_arguments(parser)
+    utils.add_processes_argument(parser)
     utils.add_corpus_arguments(parser)
     parser.add_argument('results', help=constants.STATISTICS_RESULTS_HELP,
                         metavar='RESULTS')
@@ -420,6 +474,9 @@ def generate_strip_subparser(subparsers):
         help=constants.STRIP_HELP)
     parser.set_defaults(func=strip_files)
     utils.add_common_arguments(parser)
+    parser.add_argument('--incremental', action='store_true',
+                        help=constants.STRIP_INCREMENTAL_HELP)
+    utils.add_processes_argument(parser)
     parser.add_argument('input', help=constants.STRIP_INPUT_HELP,
                         metavar='INPUT')
     parser.add_argument('output', help=constants.STRIP_OUTPUT_HELP,
@@ -436,7 +493,7 @@ def generate_supplied_diff_subparser(subparsers):
     parser.set_defaults(func=supplied_diff)
     utils.add_common_arguments(parser)
     utils.add_tokenizer_argument(parser)
-    utils.add_db_arguments(parser, True)
+    utils.add_db_arguments(parser, True, False)
     utils.add_supplied_query_arguments(parser)
 
 
@@ -450,7 +507,7 @@ def generate_supplied_intersect_subparser(subparsers):
         help=constants.SUPPLIED_INTERSECT_HELP)
     parser.set_defaults(func=supplied_intersect)
     utils.add_common_arguments(parser)
-    utils.add_db_arguments(parser, True)
+    utils.add_db_arguments(parser, True, False)
     utils.add_supplied_query_arguments(parser)
 
 
@@ -467,7 +524,7 @@ def highlight_text(args, parser):
         if args.label is None or len(args.label) != len(args.ngrams):
             parser.error('There must be as many labels as there are files '
                          'of n-grams')
-        report = tacl.NgramHighlightReport(corpus, tokenizer)
+        report = tacl.NgramHighlightReport(corpus, tokenizer, args.processes)
         ngrams = []
         for ngram_file in args.ngrams:
             ngrams.append(utils.get_ngrams(ngram_file))
@@ -521,7 +578,7 @@ def ngram_intersection(args, parser):
     corpus = utils.get_corpus(args)
     catalogue = utils.get_catalogue(args)
     store.validate(corpus, catalogue)
-    store.intersection(catalogue, sys.stdout)
+    store.intersection(catalogue, sys.stdout, engine=args.engine)
 
 
 def prepare_xml(args, parser):
@@ -535,7 +592,8 @@ def prepare_xml(args, parser):
         corpus_class = tacl.TEICorpusCBETAGitHub
     else:
         raise Exception('Unsupported TEI source option provided')
-    corpus = corpus_class(args.input, args.output)
+    corpus = corpus_class(args.input, args.output, args.processes,
+                          args.incremental)
     corpus.tidy()
 
 
@@ -549,13 +607,14 @@ def results(args, parser):
     results = tacl.Results(results_fh, tokenizer)
     if args.extend:
         corpus = tacl.Corpus(args.extend, tokenizer)
-        results.extend(corpus)
+        results.extend(corpus, args.processes)
     if args.bifurcated_extend:
         if not args.bifurcated_extend_size:
             parser.error('The bifurcated extend option requires that the '
                          '--max-be-count option also be supplied')
         corpus = tacl.Corpus(args.bifurcated_extend, tokenizer)
-        results.bifurcated_extend(corpus, args.bifurcated_extend_size)
+        results.bifurcated_extend(corpus, args.bifurcated_extend_size,
+                                  args.processes)
     if args.reduce:
         results.reduce()
     if args.reciprocal:
@@ -615,17 +674,25 @@ def search_texts(args, parser):
     store.search(catalogue, ngrams, sys.stdout)
 
 
+def similar_works(args, parser):
+    """Outputs the witnesses that are likely to be similar to those of
+    a work."""
+    store = utils.get_data_store(args)
+    store.similar(args.work, args.size, args.minimum, sys.stdout)
+
+
 def strip_files(args, parser):
     """Processes prepared XML files for use with the tacl ngrams
     command."""
-    stripper = tacl.Stripper(args.input, args.output)
+    stripper = tacl.Stripper(args.input, args.output, args.processes,
+                             args.incremental)
     stripper.strip_files()
 
 
 def supplied_diff(args, parser):
     labels = args.labels
     results = args.supplied
-    store = utils.get_data_store(args)
+    store = utils.get_supplied_store(args, parser)
     tokenizer = utils.get_tokenizer(args)
     store.diff_supplied(results, labels, tokenizer, sys.stdout)
 
@@ -633,7 +700,7 @@ def supplied_diff(args, parser):
 def supplied_intersect(args, parser):
     labels = args.labels
     results = args.supplied
-    store = utils.get_data_store(args)
+    store = utils.get_supplied_store(args, parser)
     store.intersection_supplied(results, labels, sys.stdout)
 
 
@@ -0,0 +1,81 @@
+"""Module containing functions to create and test Bloom filters of
+n-grams.
+
+A filter is a `bytes` object holding a bit array whose length in bits
+is a power of two. An n-gram is added to a filter by setting the bits
+at each of several positions derived from a hash of the n-gram, and
+a filter may contain an n-gram only if all of those bits are set.
+Filters therefore give no false negatives, and (at the sizes chosen
+here) false positives for around one in a hundred n-grams that are
+not in the filter.
+
+N-grams are hashed once, with `hash_ngrams`, into an array of bit
+positions that can be tested against filters of any size.
+
+"""
+
+import hashlib
+
+import numpy as np
+
+from . import constants
+
+
+def contains(ngram_filter, hashes):
+    """Returns a boolean array indicating, for each n-gram in `hashes`,
+    whether it may be in `ngram_filter`.
+
+    :param ngram_filter: Bloom filter
+    :type ngram_filter: `bytes`
+    :param hashes: hashed n-grams
+    :type hashes: `numpy.ndarray`
+    :rtype: `numpy.ndarray`
+
+    """
+    bits = np.frombuffer(ngram_filter, dtype=np.uint8)
+    positions = hashes & np.uint64(len(bits) * 8 - 1)
+    found = (bits[positions >> np.uint64(3)] >>
+             (positions & np.uint64(7)).astype(np.uint8)) & 1
+    return found.all(axis=1)
+
+
+def create_filter(hashes):
+    """Returns a Bloom filter containing the n-grams in `hashes`.
+
+    :param hashes: hashed n-grams
+    :type hashes: `numpy.ndarray`
+    :rtype: `bytes`
+
+    """
+    size = constants.NGRAM_FILTER_MINIMUM_BITS
+    while size < len(hashes) * constants.NGRAM_FILTER_BITS_PER_NGRAM:
+        size *= 2
+    bits = np.zeros(size // 8, dtype=np.uint8)
+    positions = (hashes & np.uint64(size - 1)).ravel()
+    np.bitwise_or.at(bits, positions >> np.uint64(3),
+                     np.left_shift(1, positions & np.uint64(7)).astype(
+                         np.uint8))
+    return bits.tobytes()
+
+
+def hash_ngrams(ngrams):
+    """Returns an array of the filter bit positions of each n-gram in
+    `ngrams`, before they are reduced to the size of a filter.
+
+    The positions are derived by double hashing from a hash of the
+    n-gram that, unlike Python's `hash`, is the same in every process.
+
+    :param ngrams: n-grams to hash
+    :type ngrams: iterable of `str`
+    :rtype: `numpy.ndarray`
+
+    """
+    digests = b''.join(hashlib.md5(ngram.encode('utf-8')).digest()
+                       for ngram in ngrams)
+    halves = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+    # The second hash is made odd so that successive positions do
+    # not repeat within any power of two sized filter.
+    first = halves[:, 0:1]
+    second = halves[:, 1:2] | np.uint64(1)
+    steps = np.arange(constants.NGRAM_FILTER_HASHES, dtype=np.uint64)
+    return first + second * steps
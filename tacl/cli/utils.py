@@ -23,7 +23,7 @@ def add_corpus_arguments(parser):
                         metavar='CORPUS')
 
 
-def add_db_arguments(parser, db_option=False):
+def add_db_arguments(parser, db_option=False, db_required=True):
     """Adds common arguments for the database sub-commands to
     `parser`.
 
@@ -32,21 +32,39 @@ def add_db_arguments(parser, db_option=False):
     that follows an optional argument with nargs='+' will not be
     recognised. When `db_optional` is True, create the database
     argument as a required optional argument, rather than a positional
-    argument.
+    argument. That optional argument is not required when
+    `db_required` is False, in which case the other database
+    arguments default to None, so that they can be rejected if given
+    without a database (see `get_supplied_store`).
 
     """
+    if db_required:
+        query_cache_size_default = constants.DB_QUERY_CACHE_SIZE_DEFAULT
+        ram_default = constants.DB_RAM_DEFAULT
+    else:
+        query_cache_size_default = ram_default = None
+    parser.add_argument('--query-cache-size',
+                        default=query_cache_size_default,
+                        help=constants.DB_QUERY_CACHE_SIZE_HELP,
+                        metavar='MB', type=int)
     parser.add_argument('-m', '--memory', action='store_true',
                         help=constants.DB_MEMORY_HELP)
-    parser.add_argument('-r', '--ram', default=3, help=constants.DB_RAM_HELP,
-                        type=int)
+    parser.add_argument('-r', '--ram', default=ram_default,
+                        help=constants.DB_RAM_HELP, type=int)
     if db_option:
         parser.add_argument('-d', '--db', help=constants.DB_DATABASE_HELP,
-                            metavar='DATABASE', required=True)
+                            metavar='DATABASE', required=db_required)
     else:
         parser.add_argument('db', help=constants.DB_DATABASE_HELP,
                             metavar='DATABASE')
 
 
+def add_processes_argument(parser):
+    """Adds an argument for the number of processes to use to `parser`."""
+    parser.add_argument('-p', '--processes', default=1,
+                        help=constants.PROCESSES_HELP, metavar='N', type=int)
+
+
 def add_query_arguments(parser):
     """Adds common arguments for query sub-commonads to `parser`."""
     parser.add_argument('catalogue', help=constants.CATALOGUE_CATALOGUE_HELP,
@@ -102,7 +120,8 @@ def get_corpus(args):
 
 def get_data_store(args):
     """Returns a `tacl.DataStore`."""
-    return tacl.DataStore(args.db, args.memory, args.ram)
+    return tacl.DataStore(args.db, args.memory, args.ram,
+                          query_cache_size=args.query_cache_size)
 
 
 def get_ngrams(path):
@@ -112,5 +131,23 @@ def get_ngrams(path):
     return ngrams
 
 
+def get_supplied_store(args, parser):
+    """Returns a `tacl.DataStore`, or, if no database is specified, a
+    `tacl.SuppliedStore`.
+
+    Database arguments given without a database are an error, rather
+    than being ignored."""
+    if args.db is None:
+        if args.memory or args.query_cache_size is not None or \
+                args.ram is not None:
+            parser.error(constants.SUPPLIED_DB_ARGUMENTS_ERROR)
+        return tacl.SuppliedStore()
+    if args.query_cache_size is None:
+        args.query_cache_size = constants.DB_QUERY_CACHE_SIZE_DEFAULT
+    if args.ram is None:
+        args.ram = constants.DB_RAM_DEFAULT
+    return get_data_store(args)
+
+
 def get_tokenizer(args):
     return tacl.Tokenizer(*constants.TOKENIZERS[args.tokenizer])
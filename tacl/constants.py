@@ -3,6 +3,20 @@
 TEI_SOURCE_CBETA_GITHUB = 'cbeta-github'
 TEI_SOURCE_CHOICES = [TEI_SOURCE_CBETA_GITHUB]
 
+DIFF_ASYMMETRIC_ENGINE_AUTO = 'auto'
+DIFF_ASYMMETRIC_ENGINE_FILTER = 'filter'
+DIFF_ASYMMETRIC_ENGINE_QUERY = 'query'
+DIFF_ASYMMETRIC_ENGINES = [DIFF_ASYMMETRIC_ENGINE_AUTO,
+                           DIFF_ASYMMETRIC_ENGINE_FILTER,
+                           DIFF_ASYMMETRIC_ENGINE_QUERY]
+
+INTERSECT_ENGINE_AUTO = 'auto'
+INTERSECT_ENGINE_FILTER = 'filter'
+INTERSECT_ENGINE_MERGE = 'merge'
+INTERSECT_ENGINE_SUBQUERY = 'subquery'
+INTERSECT_ENGINES = [INTERSECT_ENGINE_AUTO, INTERSECT_ENGINE_FILTER,
+                     INTERSECT_ENGINE_MERGE, INTERSECT_ENGINE_SUBQUERY]
+
 TOKENIZER_CHOICE_CBETA = 'cbeta'
 TOKENIZER_CHOICE_LATIN = 'latin'
 TOKENIZER_CHOICE_PAGEL = 'pagel'
@@ -30,6 +44,11 @@ TOKENIZERS = {
     TOKENIZER_CHOICE_PAGEL: [TOKENIZER_PATTERN_PAGEL, TOKENIZER_JOINER_PAGEL],
 }
 
+# Defaults of the database arguments: megabytes of query results to
+# cache, and gigabytes of RAM to use.
+DB_QUERY_CACHE_SIZE_DEFAULT = 0
+DB_RAM_DEFAULT = 3
+
 BASE_WITNESS = 'base'
 BASE_WITNESS_ID = ''
 # XML namespaces.
@@ -47,9 +66,47 @@ EXTEND_GAP_PENALTY = -0.1
 # as is, rather than further expanded.
 SCORE_THRESHOLD = 0.75
 
+# Number of rows of query results to fetch from the database, and
+# then write as CSV, at once.
+CSV_BATCH_SIZE = 10000
+
+# MinHash parameters. Signatures of 128 values are split into 64
+# bands of 2 values for locality-sensitive hashing, such that
+# witnesses whose sets of n-grams have a Jaccard similarity of 0.1
+# are found to be candidates with a probability of about 0.5, and of
+# 0.2 with a probability of over 0.9.
+MINHASH_BAND_ROWS = 2
+MINHASH_PERMUTATIONS = 128
+MINHASH_SEED = 1
+
+# N-gram Bloom filter parameters. With between 10 and 20 bits per
+# n-gram and 7 hashes, fewer than 1% of absent n-grams are false
+# positives.
+NGRAM_FILTER_BITS_PER_NGRAM = 10
+NGRAM_FILTER_HASHES = 7
+NGRAM_FILTER_MINIMUM_BITS = 64
+# Number of n-grams that n-gram filters indicate may be in a witness
+# to look up in the witnesses at once, in an asymmetric diff.
+NGRAM_FILTER_LOOKUP_BATCH_SIZE = 50000
+# Maximum number of n-gram filter tests to make in prefiltering an
+# intersection, asymmetric diff or search, above which the query is
+# made without the filters.
+NGRAM_FILTER_MAXIMUM_TESTS = 100000000
+# Estimated cost of an n-gram filter test, and of the lookups that
+# follow from it, relative to that of reading a row of n-grams in a
+# query. An asymmetric diff uses the filters only when the tests are
+# estimated to cost no more than reading the other witnesses' n-grams.
+NGRAM_FILTER_TEST_COST = 3
+
+# Number of rows of a supplied results file to add to the database at
+# once.
+SUPPLIED_RESULTS_BATCH_SIZE = 100000
+
 # CSV field names.
 COUNT_FIELDNAME = 'count'
 COUNT_TOKENS_FIELDNAME = 'matching tokens'
+EXCLUSIVE_NGRAMS_FIELDNAME = 'exclusively shared ngrams'
+JACCARD_FIELDNAME = 'estimated jaccard'
 LABEL_FIELDNAME = 'label'
 LABEL_COUNT_FIELDNAME = 'label count'
 LABEL_WORK_COUNT_FIELDNAME = 'label work count'
@@ -57,6 +114,9 @@ NGRAM_FIELDNAME = 'ngram'
 NGRAMS_FIELDNAME = 'ngrams'
 NUMBER_FIELDNAME = 'number of n-grams'
 PERCENTAGE_FIELDNAME = 'percentage'
+RELATED_WORK_FIELDNAME = 'related work'
+RELATED_SIGLUM_FIELDNAME = 'related siglum'
+SHARED_NGRAMS_FIELDNAME = 'shared ngrams'
 SIGLA_FIELDNAME = 'sigla'
 SIGLUM_FIELDNAME = 'siglum'
 SIZE_FIELDNAME = 'size'
@@ -73,6 +133,13 @@ QUERY_FIELDNAMES = (NGRAM_FIELDNAME, SIZE_FIELDNAME, WORK_FIELDNAME,
 COUNTS_FIELDNAMES = (WORK_FIELDNAME, SIGLUM_FIELDNAME, SIZE_FIELDNAME,
                      UNIQUE_NGRAMS_FIELDNAME, TOTAL_NGRAMS_FIELDNAME,
                      TOTAL_TOKENS_FIELDNAME, LABEL_FIELDNAME)
+SHARED_NGRAMS_FIELDNAMES = (WORK_FIELDNAME, SIGLUM_FIELDNAME,
+                            RELATED_WORK_FIELDNAME, SHARED_NGRAMS_FIELDNAME,
+                            EXCLUSIVE_NGRAMS_FIELDNAME,
+                            TOTAL_NGRAMS_FIELDNAME)
+SIMILAR_FIELDNAMES = (WORK_FIELDNAME, SIGLUM_FIELDNAME, RELATED_WORK_FIELDNAME,
+                      RELATED_SIGLUM_FIELDNAME, SIZE_FIELDNAME,
+                      JACCARD_FIELDNAME)
 STATISTICS_FIELDNAMES = (WORK_FIELDNAME, SIGLUM_FIELDNAME,
                          COUNT_TOKENS_FIELDNAME, TOTAL_TOKENS_FIELDNAME,
                          PERCENTAGE_FIELDNAME, LABEL_FIELDNAME)
@@ -82,6 +149,10 @@ ENCODING_EPILOG = '''\
     Due to encoding issues, you may need to set the environment
     variable PYTHONIOENCODING to "utf-8".'''
 
+ALIGN_BAND_WIDTH_HELP = '''\
+    Align sequences outward from the shared n-gram, considering only
+    alignments within BAND_WIDTH characters of the diagonal. This is
+    much faster than the default full alignment of each sequence.'''
 ALIGN_DESCRIPTION = '''\
     Generates an HTML report giving tables showing aligned sequences
     of text between each witness within each label and all of the
@@ -90,7 +161,8 @@ ALIGN_DESCRIPTION = '''\
 ALIGN_EPILOG = ENCODING_EPILOG + '''\
     \n\nThis function requires the Biopython suite of software to be
     installed. It is extremely slow and resource hungry when the
-    overlap between two witnesses is very great.'''
+    overlap between two witnesses is very great, unless the
+    --band-width option is used.'''
 ALIGN_HELP = 'Show aligned sets of matches between two witnesses side by side.'
 ALIGN_MINIMUM_SIZE_HELP = 'Minimum size of n-gram to base sequences around.'
 ALIGN_OUTPUT_HELP = 'Directory to output alignment files to.'
@@ -115,7 +187,11 @@ DB_MEMORY_HELP = '''\
     Use RAM for temporary database storage.
 
     This may cause an out of memory error, in which case run the
-    command without this switch.'''
+    command without this switch, to keep temporary storage on disk.'''
+DB_QUERY_CACHE_SIZE_HELP = '''\
+    Number of megabytes of query results to cache in the database, so
+    that repeated queries against unchanged n-gram data return
+    immediately. Caching is disabled by default.'''
 DB_RAM_HELP = 'Number of gigabytes of RAM to use.'
 DB_TOKENIZER_HELP = '''\
     Type of tokenizer to use. The "cbeta" tokenizer is suitable for
@@ -189,7 +265,9 @@ HIGHLIGHT_EPILOG = '''\
     colour. The -l/--labels option can be used with -n/--ngrams in
     order to provide labels for groups of n-grams. There must be as
     many instances of -l/--labels as there are of -n/--ngrams. The
-    order of the labels matches the order of the n-grams files.
+    order of the labels matches the order of the n-grams files. The
+    reports for multiple witnesses may be generated in parallel with
+    the -p/--processes option.
 
     If results are supplied via the -r/--results option, the resulting
     HTML reports contain an interactive heatmap of the results, allowing the
@@ -233,6 +311,13 @@ INTERSECT_EPILOG = '''\
         tacl intersect -t pagel pagel1-7.db corpus/pagel/ by-author.txt > output.csv
 
 ''' + ENCODING_EPILOG
+INTERSECT_ENGINE_HELP = '''\
+    Method used to find the intersection. "subquery" uses a single
+    database query; "filter" first eliminates n-grams using the
+    n-gram filters made when n-grams were added to the database;
+    "merge" sorts the n-grams of all sub-corpora together. "auto"
+    currently uses "subquery", since each of the others is faster
+    only for some catalogues. All give the same results.'''
 INTERSECT_HELP = 'List n-grams common to all sub-corpora.'
 
 LIFETIME_DESCRIPTION = '''\
@@ -279,6 +364,19 @@ NGRAMS_EPILOG = '''\
     database or manipulate the existing dataase directly to remove the
     witness and its associated n-grams.
 
+    With --filters, a Bloom filter of each witness' n-grams of each
+    size is also added, for every witness in the database that lacks
+    one. The filters let search and asymmetric diff queries (and
+    intersect, with --engine filter) avoid looking up n-grams in
+    witnesses that cannot contain them.
+
+    With --minhashes, a MinHash signature of each witness' n-grams of
+    each size is likewise added, as required by tacl similar.
+
+    Both require hashing every n-gram, which is done only once if
+    both are made. Filters add around a tenth to the time taken to add
+    n-grams, and MinHash signatures around a third.
+
     examples:
 
       Create a database of 2 to 10-grams from a CBETA corpus.
@@ -291,6 +389,10 @@ NGRAMS_EPILOG = '''\
         tacl ngrams -c dhr-texts.txt cbeta-dhr1-7.db corpus/cbeta/ 1 7
 
 '''
+NGRAMS_FILTERS_HELP = '''\
+    Add a Bloom filter of each witness' n-grams of each size.'''
+NGRAMS_MINHASHES_HELP = '''\
+    Add a MinHash signature of each witness' n-grams of each size.'''
 NGRAMS_HELP = 'Generate n-grams from a corpus.'
 NGRAMS_MAXIMUM_HELP = 'Maximum size of n-gram to generate (integer).'
 NGRAMS_MINIMUM_HELP = 'Minimum size of n-gram to generate (integer).'
@@ -308,10 +410,24 @@ PREPARE_EPILOG = '''\
 PREPARE_HELP = '''\
     Convert CBETA TEI XML files into an XML form suitable for
     stripping.'''
+PREPARE_INCREMENTAL_HELP = '''\
+    Only prepare works that have a source file that is newer than
+    their existing output.'''
 PREPARE_INPUT_HELP = 'Directory containing XML files to prepare.'
 PREPARE_OUTPUT_HELP = 'Directory to output prepared files to.'
 PREPARE_SOURCE_HELP = 'Source of TEI files.'
 
+PROCESSES_HELP = '''\
+    Number of processes to use; values greater than 1 distribute the
+    work across a pool of worker processes.'''
+PROFILE_HELP = '''\
+    Record the time taken by each stage of the command, and write it
+    to PROFILE as a Chrome trace event JSON file. Stages run in worker
+    processes are not recorded.'''
+PROFILE_STATS_HELP = '''\
+    Profile the command with cProfile and write the statistics to
+    STATS.'''
+
 REPORT_OUTPUT_HELP = 'Directory to output report to.'
 
 RESULTS_ADD_LABEL_COUNT_HELP = '''\
@@ -470,6 +586,46 @@ SEARCH_NGRAMS_HELP = '''\
     Path to file containing list of n-grams to search for, with one
     n-gram per line.'''
 
+SIMILAR_DESCRIPTION = '''\
+    List the witnesses that are likely to share n-grams with the
+    witnesses of a work, with an estimate of the Jaccard similarity of
+    their sets of n-grams.'''
+SIMILAR_EPILOG = '''\
+    The similarity of witnesses is estimated from MinHash signatures
+    of their n-grams of a single size, made when the n-grams were
+    added to the database with tacl ngrams --minhashes, and candidate
+    witnesses are found by locality-sensitive hashing of those
+    signatures. The search is
+    therefore fast, but approximate: witnesses whose n-grams have a
+    Jaccard similarity of 0.2 or more are very likely to be found,
+    while those with a lower similarity may not be.
+
+    The results are sorted by decreasing estimated similarity, and
+    are intended for choosing the works to make intersect queries
+    against, rather than as a substitute for those queries.
+
+    By default the largest size of n-gram in the database for the
+    work is used; since n-grams of a larger size are less likely to
+    be shared by chance, this will generally best indicate shared
+    material.
+
+    examples:
+
+      List the witnesses most similar to the witnesses of T0001.
+        tacl similar cbeta2-10.db T0001 > similar.csv
+
+      List the witnesses whose 5-grams are estimated to be at least
+      10% the same as those of a witness of T0001.
+        tacl similar -s 5 --minimum 0.1 cbeta2-10.db T0001 > similar.csv
+
+''' + ENCODING_EPILOG
+SIMILAR_HELP = 'List witnesses that are likely to share n-grams with a work.'
+SIMILAR_MINIMUM_HELP = '''\
+    Minimum estimated Jaccard similarity of the n-grams of two
+    witnesses for them to be listed.'''
+SIMILAR_SIZE_HELP = 'Size of n-grams to compare.'
+SIMILAR_WORK_HELP = 'Work to find similar witnesses to.'
+
 STATISTICS_DESCRIPTION = '''\
     Generate summary statistics for a set of results. This gives, for
     each witness, the total number of tokens and the count of matching
@@ -485,6 +641,9 @@ STRIP_EPILOG = '''\
     This command operates on files in an augmented TEI XML format that
     is quite close to that used in the CBETA GitHub files.'''
 STRIP_HELP = 'Generate files for use with TACL from a corpus of TEI XML.'
+STRIP_INCREMENTAL_HELP = '''\
+    Only strip files that are newer than their existing output,
+    replacing that output.'''
 STRIP_INPUT_HELP = 'Directory containing files to strip.'
 STRIP_OUTPUT_HELP = 'Directory to output stripped files to.'
 
@@ -499,9 +658,14 @@ SUPPLIED_EPILOG = '''\
     results file, etc. The labels specified in the results files are
     replaced with the supplied labels in the output.
 
+    If no database is specified, the query is made on the results
+    held in memory, without opening a database.
+
     examples:
 
-        tacl {cmd} -d cbeta2-10.db -l A B -s results1.csv results2.csv > output.csv'''
+        tacl {cmd} -d cbeta2-10.db -l A B -s results1.csv results2.csv > output.csv
+
+        tacl {cmd} -l A B -s results1.csv results2.csv > output.csv'''
 SUPPLIED_DIFF_EPILOG = SUPPLIED_EPILOG.format(cmd='sdiff')
 SUPPLIED_INTERSECT_EPILOG = SUPPLIED_EPILOG.format(cmd='sintersect')
 SUPPLIED_INTERSECT_DESCRIPTION = '''\
@@ -522,15 +686,27 @@ VERBOSE_HELP = '''\
 CATALOGUE_WORK_RELABELLED_ERROR = 'Catalogue file labels "{}" more than once'
 CATALOGUE_WORK_NOT_IN_CORPUS_ERROR = (
     'Catalogue references work "{}" that does not exist in the corpus')
+DATABASE_LOCKED_PROCESSES_ERROR = (
+    'The database is locked, and so cannot be read by worker processes; '
+    'supply a data store that has not yet been used, or use one process')
 EXCISE_OVERWRITE_WORK_WARNING = ('Output work directory "{}" already exists;'
                                  'existing files may be overwritten.')
 INSUFFICIENT_LABELS_QUERY_ERROR = (
     'Not running query with fewer than two defined labels')
 LABEL_NOT_IN_CATALOGUE_ERROR = (
     'Supplied label is not present in the supplied catalogue')
+NGRAM_FILTERS_MISSING_WARNING = (
+    'Not all of the labelled witnesses have n-gram filters; they may be '
+    'made with tacl ngrams --filters')
 SUPPLIED_ARGS_LENGTH_MISMATCH_ERROR = (
     'The number of labels supplied does not match the number of results files.'
 )
+SUPPLIED_DB_ARGUMENTS_ERROR = (
+    'The --memory, --query-cache-size and --ram arguments apply only to a '
+    'database, and so require --db')
+WORK_NOT_IN_DATABASE_ERROR = (
+    'Work {} has no MinHash signatures of n-grams of the requested size '
+    'in the database; they may be made with tacl ngrams --minhashes')
 MISSING_REQUIRED_COLUMNS_ERROR = (
     'Results file is missing required column(s) {}')
 
@@ -540,14 +716,42 @@ ANALYSE_SQL = 'ANALYZE {}'
 CREATE_INDEX_INPUT_RESULTS_SQL = (
     'CREATE INDEX IF NOT EXISTS temp.InputResultsLabel '
     'ON InputResults (ngram)')
+CREATE_INDEX_TEMPORARY_TEXT_SQL = (
+    'CREATE INDEX IF NOT EXISTS temp.TextIndexLabel ON Text (label)')
 CREATE_INDEX_TEXT_SQL = (
     'CREATE INDEX IF NOT EXISTS TextIndexLabel ON Text (label)')
 CREATE_INDEX_TEXTHASNGRAM_SQL = (
     'CREATE UNIQUE INDEX IF NOT EXISTS TextHasNGramIndex '
     'ON TextHasNGram (text, size)')
+CREATE_INDEX_TEXTNGRAMFILTER_SQL = (
+    'CREATE UNIQUE INDEX IF NOT EXISTS TextNGramFilterIndex '
+    'ON TextNGramFilter (text, size)')
+CREATE_INDEX_TEXTMINHASHBAND_SQL = (
+    'CREATE INDEX IF NOT EXISTS TextMinHashBandIndex '
+    'ON TextMinHashBand (size, band, hash, text)')
+CREATE_INDEX_TEXTMINHASH_SQL = (
+    'CREATE UNIQUE INDEX IF NOT EXISTS TextMinHashIndex '
+    'ON TextMinHash (text, size)')
 CREATE_INDEX_TEXTNGRAM_SQL = (
     'CREATE INDEX IF NOT EXISTS TextNGramIndexTextNGram '
     'ON TextNGram (text, ngram)')
+CREATE_TABLE_QUERY_CACHE_SQL = (
+    'CREATE TABLE IF NOT EXISTS QueryCache ('
+    'key TEXT NOT NULL PRIMARY KEY, '
+    'data BLOB NOT NULL, '
+    'size INTEGER NOT NULL, '
+    'last_used REAL NOT NULL)')
+CREATE_TABLE_TEXTMINHASH_SQL = (
+    'CREATE TABLE IF NOT EXISTS TextMinHash ('
+    'text INTEGER NOT NULL REFERENCES Text (id), '
+    'size INTEGER NOT NULL, '
+    'signature BLOB NOT NULL)')
+CREATE_TABLE_TEXTMINHASHBAND_SQL = (
+    'CREATE TABLE IF NOT EXISTS TextMinHashBand ('
+    'text INTEGER NOT NULL REFERENCES Text (id), '
+    'size INTEGER NOT NULL, '
+    'band INTEGER NOT NULL, '
+    'hash INTEGER NOT NULL)')
 CREATE_TABLE_TEXT_SQL = (
     'CREATE TABLE IF NOT EXISTS Text ('
     'id INTEGER PRIMARY KEY ASC, '
@@ -563,6 +767,11 @@ CREATE_TABLE_TEXTNGRAM_SQL = (
     'ngram TEXT NOT NULL, '
     'size INTEGER NOT NULL, '
     'count INTEGER NOT NULL)')
+CREATE_TABLE_TEXTNGRAMFILTER_SQL = (
+    'CREATE TABLE IF NOT EXISTS TextNGramFilter ('
+    'text INTEGER NOT NULL REFERENCES Text (id), '
+    'size INTEGER NOT NULL, '
+    'filter BLOB NOT NULL)')
 CREATE_TABLE_TEXTHASNGRAM_SQL = (
     'CREATE TABLE IF NOT EXISTS TextHasNGram ('
     'text INTEGER NOT NULL REFERENCES Text (id), '
@@ -578,13 +787,43 @@ CREATE_TEMPORARY_RESULTS_TABLE_SQL = (
     'siglum TEXT NOT NULL, '
     'count INTEGER NOT NULL, '
     'label TEXT NOT NULL)')
+CREATE_TEMPORARY_TEXT_NGRAMS_TABLE_SQL = (
+    'CREATE TEMPORARY TABLE IF NOT EXISTS InputTextNGram ('
+    'text INTEGER NOT NULL, '
+    'ngram TEXT NOT NULL)')
+CREATE_TEMPORARY_TEXT_TABLE_SQL = (
+    'CREATE TEMPORARY TABLE Text ('
+    'id INTEGER PRIMARY KEY ASC, '
+    'work TEXT NOT NULL, '
+    'siglum TEXT NOT NULL, '
+    'checksum TEXT NOT NULL, '
+    'token_count INTEGER NOT NULL, '
+    'label TEXT NOT NULL, '
+    'UNIQUE (work, siglum))')
+DELETE_QUERY_CACHE_SQL = 'DELETE FROM QueryCache WHERE key = ?'
+DELETE_TEMPORARY_TEXT_NGRAMS_SQL = 'DELETE FROM temp.InputTextNGram'
 DELETE_TEXT_HAS_NGRAMS_SQL = 'DELETE FROM TextHasNGram WHERE text = ?'
+DELETE_TEXT_MINHASH_BANDS_SQL = 'DELETE FROM TextMinHashBand WHERE text = ?'
+DELETE_TEXT_MINHASHES_SQL = 'DELETE FROM TextMinHash WHERE text = ?'
+DELETE_TEXT_NGRAM_FILTERS_SQL = 'DELETE FROM TextNGramFilter WHERE text = ?'
 DELETE_TEXT_NGRAMS_SQL = 'DELETE FROM TextNGram WHERE text = ?'
+DROP_TABLE_QUERY_CACHE_SQL = 'DROP TABLE IF EXISTS QueryCache'
 DROP_TEMPORARY_NGRAMS_TABLE_SQL = 'DROP TABLE IF EXISTS InputNGram'
 DROP_TEMPORARY_RESULTS_TABLE_SQL = 'DROP TABLE IF EXISTS InputResults'
+DROP_TEMPORARY_TEXT_TABLE_SQL = 'DROP TABLE IF EXISTS temp.Text'
 DROP_TEXTNGRAM_INDEX_SQL = 'DROP INDEX IF EXISTS TextNGramIndexTextNGram'
 INSERT_NGRAM_SQL = (
     'INSERT INTO TextNGram (text, ngram, size, count) VALUES (?, ?, ?, ?)')
+INSERT_MINHASH_BAND_SQL = (
+    'INSERT INTO TextMinHashBand (text, size, band, hash) '
+    'VALUES (?, ?, ?, ?)')
+INSERT_MINHASH_SQL = (
+    'INSERT INTO TextMinHash (text, size, signature) VALUES (?, ?, ?)')
+INSERT_NGRAM_FILTER_SQL = (
+    'INSERT INTO TextNGramFilter (text, size, filter) VALUES (?, ?, ?)')
+INSERT_QUERY_CACHE_SQL = (
+    'INSERT OR REPLACE INTO QueryCache (key, data, size, last_used) '
+    'VALUES (?, ?, ?, ?)')
 INSERT_TEXT_HAS_NGRAM_SQL = (
     'INSERT INTO TextHasNGram (text, size, count) VALUES (?, ?, ?)')
 INSERT_TEXT_SQL = (
@@ -595,11 +834,15 @@ INSERT_TEMPORARY_RESULTS_SQL = (
     'INSERT INTO temp.InputResults '
     '(ngram, size, work, siglum, count, label) '
     'VALUES (?, ?, ?, ?, ?, ?)')
+INSERT_TEMPORARY_TEXT_NGRAM_SQL = (
+    'INSERT INTO temp.InputTextNGram (text, ngram) VALUES (?, ?)')
+INSERT_TEMPORARY_TEXT_SQL = 'INSERT INTO temp.Text SELECT * FROM main.Text'
 PRAGMA_CACHE_SIZE_SQL = 'PRAGMA cache_size={}'
 PRAGMA_COUNT_CHANGES_SQL = 'PRAGMA count_changes=OFF'
 PRAGMA_FOREIGN_KEYS_SQL = 'PRAGMA foreign_keys=ON'
 PRAGMA_LOCKING_MODE_SQL = 'PRAGMA locking_mode=EXCLUSIVE'
 PRAGMA_SYNCHRONOUS_SQL = 'PRAGMA synchronous=OFF'
+PRAGMA_TEMP_STORE_FILE_SQL = 'PRAGMA temp_store=FILE'
 PRAGMA_TEMP_STORE_SQL = 'PRAGMA temp_store=MEMORY'
 SELECT_COUNTS_SQL = (
     'SELECT Text.work, Text.siglum, '
@@ -639,12 +882,35 @@ SELECT_DIFF_SUPPLIED_SQL = (
     'GROUP BY ngram HAVING COUNT(DISTINCT label) = 1)')
 SELECT_HAS_NGRAMS_SQL = (
     'SELECT text FROM TextHasNGram WHERE text = ? AND size = ?')
+SELECT_INPUT_NGRAMS_FOUND_SQL = (
+    'SELECT DISTINCT InputTextNGram.ngram '
+    'FROM temp.InputTextNGram CROSS JOIN TextNGram '
+    'WHERE TextNGram.text = InputTextNGram.text '
+    'AND TextNGram.ngram = InputTextNGram.ngram')
+SELECT_INPUT_TEXT_NGRAMS_SQL = (
+    'SELECT TextNGram.ngram, TextNGram.size, Text.work, Text.siglum, '
+    'TextNGram.count, Text.label '
+    'FROM temp.InputTextNGram CROSS JOIN TextNGram CROSS JOIN Text '
+    'WHERE TextNGram.text = InputTextNGram.text '
+    'AND TextNGram.ngram = InputTextNGram.ngram '
+    'AND Text.id = InputTextNGram.text')
+SELECT_INPUT_TEXT_NGRAMS_BY_NGRAM_SQL = (
+    SELECT_INPUT_TEXT_NGRAMS_SQL + ' ORDER BY InputTextNGram.ngram')
 SELECT_INTERSECT_SQL = (
     'SELECT TextNGram.ngram, TextNGram.size, '
     'Text.work, Text.siglum, TextNGram.count, Text.label '
     'FROM Text, TextNGram '
     'WHERE Text.label IN ({}) AND Text.id = TextNGram.text '
     'AND TextNGram.ngram IN ({})')
+SELECT_INTERSECT_MERGE_SQL = (
+    'SELECT TextNGram.ngram, TextNGram.size, '
+    'Text.work, Text.siglum, TextNGram.count, Text.label '
+    'FROM Text, TextNGram '
+    'WHERE Text.label IN ({}) AND Text.id = TextNGram.text '
+    'AND TextNGram.ngram IN ('
+    'SELECT TextNGram.ngram FROM Text, TextNGram '
+    'WHERE Text.id = TextNGram.text AND Text.label IN ({}) '
+    'GROUP BY TextNGram.ngram HAVING COUNT(DISTINCT Text.label) = ?)')
 SELECT_INTERSECT_SUB_EXTRA_SQL = ' AND TextNGram.ngram IN ({})'
 SELECT_INTERSECT_SUB_SQL = (
     'SELECT TextNGram.ngram '
@@ -656,6 +922,67 @@ SELECT_INTERSECT_SUPPLIED_SQL = (
     'WHERE ngram IN ('
     'SELECT ngram FROM temp.InputResults '
     'GROUP BY ngram HAVING COUNT(DISTINCT label) = ?)')
+SELECT_LABEL_NGRAMS_SQL = (
+    'SELECT TextNGram.text, TextNGram.ngram, TextNGram.size '
+    'FROM Text, TextNGram '
+    'WHERE Text.label = ? AND Text.id = TextNGram.text')
+SELECT_LABEL_RESULTS_SQL = (
+    'SELECT TextNGram.ngram, TextNGram.size, '
+    'Text.work, Text.siglum, TextNGram.count, Text.label '
+    'FROM Text, TextNGram '
+    'WHERE Text.label = ? AND Text.id = TextNGram.text')
+SELECT_MISSING_LABEL_NGRAM_FILTERS_SQL = (
+    'SELECT COUNT(*) FROM Text, TextHasNGram '
+    'LEFT JOIN TextNGramFilter '
+    'ON TextHasNGram.text = TextNGramFilter.text '
+    'AND TextHasNGram.size = TextNGramFilter.size '
+    'WHERE Text.label IN ({}) AND Text.id = TextHasNGram.text '
+    'AND TextNGramFilter.text IS NULL')
+SELECT_MISSING_MINHASHES_SQL = (
+    'SELECT TextHasNGram.text, TextHasNGram.size FROM TextHasNGram '
+    'LEFT JOIN TextMinHash '
+    'ON TextHasNGram.text = TextMinHash.text '
+    'AND TextHasNGram.size = TextMinHash.size '
+    'WHERE TextMinHash.text IS NULL AND TextHasNGram.count > 0')
+SELECT_MISSING_NGRAM_FILTERS_SQL = (
+    'SELECT TextHasNGram.text, TextHasNGram.size FROM TextHasNGram '
+    'LEFT JOIN TextNGramFilter '
+    'ON TextHasNGram.text = TextNGramFilter.text '
+    'AND TextHasNGram.size = TextNGramFilter.size '
+    'WHERE TextNGramFilter.text IS NULL')
+SELECT_NGRAM_FILTER_COUNTS_SQL = (
+    'SELECT Text.label, TextHasNGram.size, COUNT(*) AS texts, '
+    'SUM(TextHasNGram.count) AS ngrams '
+    'FROM Text, TextHasNGram '
+    'WHERE Text.label IN ({}) AND Text.id = TextHasNGram.text '
+    'GROUP BY Text.label, TextHasNGram.size')
+SELECT_NGRAM_FILTERS_SQL = (
+    'SELECT TextNGramFilter.text, TextNGramFilter.size, '
+    'TextNGramFilter.filter '
+    'FROM Text, TextNGramFilter '
+    'WHERE Text.label IN ({}) AND Text.id = TextNGramFilter.text '
+    'ORDER BY TextNGramFilter.text')
+SELECT_QUERY_CACHE_SIZES_SQL = (
+    'SELECT key, size FROM QueryCache ORDER BY last_used DESC')
+SELECT_QUERY_CACHE_SQL = 'SELECT data FROM QueryCache WHERE key = ?'
+SELECT_SIMILAR_BAND_SQL = (
+    'SELECT text FROM TextMinHashBand '
+    'WHERE size = ? AND band = ? AND hash = ?')
+SELECT_SIMILAR_CANDIDATE_SQL = (
+    'SELECT Text.work, Text.siglum, TextMinHash.signature '
+    'FROM Text, TextMinHash '
+    'WHERE Text.id = ? AND TextMinHash.text = Text.id '
+    'AND TextMinHash.size = ?')
+SELECT_SIMILAR_SIZE_SQL = (
+    'SELECT MAX(TextMinHash.size) FROM Text, TextMinHash '
+    'WHERE Text.work = ? AND Text.id = TextMinHash.text')
+SELECT_SIMILAR_TARGETS_SQL = (
+    'SELECT Text.id, Text.siglum, TextMinHash.signature '
+    'FROM Text, TextMinHash '
+    'WHERE Text.work = ? AND Text.id = TextMinHash.text '
+    'AND TextMinHash.size = ? '
+    'ORDER BY Text.siglum')
+SELECT_SCHEMA_SQL = 'SELECT COUNT(*) FROM sqlite_master'
 SELECT_SEARCH_SQL = (
     'SELECT TextNGram.ngram, TextNGram.size, Text.work, Text.siglum, '
     'TextNGram.count, Text.label '
@@ -667,10 +994,23 @@ SELECT_SEARCH_ALL_SQL = (
     'TextNGram.count, Text.label '
     'FROM Text, TextNGram '
     'WHERE Text.label IN ({}) AND Text.id = TextNGram.text')
+SELECT_SHARED_NGRAMS_SQL = (
+    'SELECT TextNGram.ngram, Text.work, Text.siglum, TextNGram.count, '
+    'Text.label '
+    'FROM Text, TextNGram '
+    'WHERE Text.label IN ({}) AND Text.id = TextNGram.text '
+    'AND TextNGram.size = ? '
+    'ORDER BY TextNGram.ngram')
 SELECT_TEXT_TOKEN_COUNT_SQL = (
     'SELECT Text.token_count FROM Text WHERE Text.work = ?')
+SELECT_TEXT_TOTAL_NGRAMS_SQL = (
+    'SELECT work, siglum, MAX(token_count + 1 - ?, 0) AS total '
+    'FROM Text WHERE label IN ({})')
+SELECT_TEXT_SIZE_NGRAMS_SQL = (
+    'SELECT ngram FROM TextNGram WHERE text = ? AND size = ?')
 SELECT_TEXT_SQL = 'SELECT id, checksum FROM Text WHERE work = ? AND siglum = ?'
 UPDATE_LABEL_SQL = 'UPDATE Text SET label = ? WHERE work = ?'
 UPDATE_LABELS_SQL = 'UPDATE Text SET label = ?'
+UPDATE_QUERY_CACHE_SQL = 'UPDATE QueryCache SET last_used = ? WHERE key = ?'
 UPDATE_TEXT_SQL = 'UPDATE Text SET checksum = ?, token_count = ? WHERE id = ?'
 VACUUM_SQL = 'VACUUM'
@@ -4,10 +4,11 @@ import glob
 import logging
 import os.path
 
+from .parallel import LoggerPickleMixin
 from .text import WitnessText
 
 
-class Corpus:
+class Corpus (LoggerPickleMixin):
 
     """A Corpus represents a collection of `WitnessText`s.
 
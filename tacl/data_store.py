@@ -1,16 +1,23 @@
 """Module containing the DataStore class."""
 
+import collections
 import csv
+import itertools
 import logging
+import operator
 import os.path
 import sqlite3
 import sys
 import tempfile
+import urllib.request
 
+import numpy as np
 import pandas as pd
 
-from . import constants
-from .exceptions import MalformedQueryError
+from . import bloom, constants, minhash, profiler
+from .decorators import cached_query, timed
+from .exceptions import MalformedQueryError, MalformedResultsError
+from .query_cache import CacheWriter, QueryCache
 
 
 class DataStore:
@@ -22,24 +29,73 @@ class DataStore:
 
     """
 
-    def __init__(self, db_name, use_memory=True, ram=0):
+    def __init__(self, db_name, use_memory=True, ram=0, read_only=False,
+                 query_cache_size=0):
+        """Initialise a DataStore object.
+
+        A read-only data store does not modify the database; labels
+        set for a query are applied to a temporary copy of the Text
+        table instead. This allows for multiple read-only data stores,
+        each in its own process, to query the same database at the
+        same time.
+
+        If `query_cache_size` is given, the results of counts, diff,
+        intersection and search queries are cached in the database,
+        and reused when the same query is made again before any
+        n-grams are added to the database. A read-only data store
+        uses, but does not add to, the cache.
+
+        :param db_name: path to database file, or ':memory:'
+        :type db_name: `str`
+        :param use_memory: whether to keep temporary tables in memory,
+                           rather than on disk
+        :type use_memory: `bool`
+        :param ram: number of gigabytes of RAM to use for the cache
+        :type ram: `int`
+        :param read_only: whether to open the database read-only
+        :type read_only: `bool`
+        :param query_cache_size: number of megabytes of query results
+                                 to cache
+        :type query_cache_size: `int`
+
+        """
         self._logger = logging.getLogger(__name__)
         if db_name == ':memory:':
             self._db_name = db_name
         else:
             self._db_name = os.path.abspath(db_name)
-        self._conn = sqlite3.connect(self._db_name)
+        self._read_only = read_only
+        if read_only:
+            uri = 'file:{}?mode=ro'.format(
+                urllib.request.pathname2url(self._db_name))
+            self._conn = sqlite3.connect(uri, uri=True)
+        else:
+            self._conn = sqlite3.connect(self._db_name)
         self._conn.row_factory = sqlite3.Row
         if use_memory:
             self._conn.execute(constants.PRAGMA_TEMP_STORE_SQL)
+        elif self._db_name != ':memory:':
+            # Temporary tables, such as those holding supplied
+            # results, may be far larger than available memory, and
+            # SQLite may have been compiled to keep them in memory by
+            # default.
+            self._conn.execute(constants.PRAGMA_TEMP_STORE_FILE_SQL)
         if ram:
             cache_size = ram * -1000000
             self._conn.execute(constants.PRAGMA_CACHE_SIZE_SQL.format(
                     cache_size))
         self._conn.execute(constants.PRAGMA_COUNT_CHANGES_SQL)
         self._conn.execute(constants.PRAGMA_FOREIGN_KEYS_SQL)
-        self._conn.execute(constants.PRAGMA_LOCKING_MODE_SQL)
+        # An exclusive lock, once acquired, is never released, which
+        # would prevent other read-only stores from reading the
+        # database.
+        if not read_only:
+            self._conn.execute(constants.PRAGMA_LOCKING_MODE_SQL)
         self._conn.execute(constants.PRAGMA_SYNCHRONOUS_SQL)
+        self._cache = None
+        if query_cache_size:
+            self._cache = QueryCache(self._conn, query_cache_size * 1000000,
+                                     read_only)
 
     def _add_indices(self):
         """Adds the database indices relating to n-grams."""
@@ -47,9 +103,24 @@ class DataStore:
         self._conn.execute(constants.CREATE_INDEX_TEXTNGRAM_SQL)
         self._logger.info('Indices added')
 
-    def add_ngrams(self, corpus, minimum, maximum, catalogue=None):
+    @timed
+    def add_ngrams(self, corpus, minimum, maximum, catalogue=None,
+                   filters=False, minhashes=False):
         """Adds n-gram data from `corpus` to the data store.
 
+        If `filters` is True, a Bloom filter of each witness' n-grams
+        of each size is also added (for every witness in the data
+        store that lacks one), which the search and asymmetric diff
+        queries, and the filter intersection engine, use to avoid
+        looking up n-grams in witnesses that cannot contain them.
+
+        If `minhashes` is True, a MinHash signature of each witness'
+        n-grams of each size is likewise added, which the similar
+        query requires.
+
+        Making either requires hashing every n-gram (once, for both),
+        which adds substantially to the time taken to add n-grams.
+
         :param corpus: corpus of works
         :type corpus: `Corpus`
         :param minimum: minimum n-gram size
@@ -58,32 +129,108 @@ class DataStore:
         :type maximum: `int`
         :param catalogue: optional catalogue to limit corpus to
         :type catalogue: `Catalogue`
+        :param filters: whether to add n-gram filters
+        :type filters: `bool`
+        :param minhashes: whether to add MinHash signatures
+        :type minhashes: `bool`
 
         """
         self._initialise_database()
+        QueryCache.clear(self._conn)
         if catalogue:
             for work in catalogue:
                 for witness in corpus.get_witnesses(work):
-                    self._add_text_ngrams(witness, minimum, maximum)
+                    self._add_text_ngrams(witness, minimum, maximum,
+                                          filters, minhashes)
         else:
             for witness in corpus.get_witnesses():
-                self._add_text_ngrams(witness, minimum, maximum)
+                self._add_text_ngrams(witness, minimum, maximum, filters,
+                                      minhashes)
         self._add_indices()
+        if filters or minhashes:
+            self._add_missing_filters_and_minhashes(filters, minhashes)
         self._analyse()
 
+    def _add_minhash(self, text_id, size, hashes):
+        """Adds the MinHash signature, and its locality-sensitive hashing
+        bands, of the n-grams of `size` in the text with `text_id`.
+
+        :param text_id: database ID of text
+        :type text_id: `int`
+        :param size: size of n-grams
+        :type size: `int`
+        :param hashes: hashed n-grams, as returned by
+                       `bloom.hash_ngrams`
+        :type hashes: `numpy.ndarray`
+
+        """
+        # The first bit position of an n-gram's hash is the hash
+        # itself.
+        signature = minhash.create_signature(hashes[:, 0])
+        self._conn.execute(constants.INSERT_MINHASH_SQL,
+                           [text_id, size, minhash.to_bytes(signature)])
+        self._conn.executemany(
+            constants.INSERT_MINHASH_BAND_SQL,
+            [(text_id, size, band, band_hash) for band, band_hash in
+             enumerate(minhash.get_band_hashes(signature))])
+
+    def _add_missing_filters_and_minhashes(self, filters, minhashes):
+        """Adds n-gram filters (if `filters`) and MinHash signatures (if
+        `minhashes`) for those texts and sizes whose n-grams were added
+        to the data store without them.
+
+        The n-grams of each text and size are hashed only once, for
+        both.
+
+        :param filters: whether to add missing n-gram filters
+        :type filters: `bool`
+        :param minhashes: whether to add missing MinHash signatures
+        :type minhashes: `bool`
+
+        """
+        missing_filters = set()
+        missing_minhashes = set()
+        if filters:
+            missing_filters.update(tuple(row) for row in self._conn.execute(
+                constants.SELECT_MISSING_NGRAM_FILTERS_SQL))
+        if minhashes:
+            missing_minhashes.update(tuple(row) for row in self._conn.execute(
+                constants.SELECT_MISSING_MINHASHES_SQL))
+        for text_id, size in sorted(missing_filters | missing_minhashes):
+            self._logger.info('Adding missing filter and/or MinHash '
+                              'signature of {}-grams for text {}'.format(
+                                  size, text_id))
+            hashes = self._get_text_size_hashes(text_id, size)
+            with self._conn:
+                if (text_id, size) in missing_filters:
+                    self._conn.execute(constants.INSERT_NGRAM_FILTER_SQL,
+                                       [text_id, size,
+                                        bloom.create_filter(hashes)])
+                if (text_id, size) in missing_minhashes:
+                    self._add_minhash(text_id, size, hashes)
+
     def _add_temporary_ngrams(self, ngrams):
         """Adds `ngrams` to a temporary table."""
-        # Remove duplicate n-grams, empty n-grams, and non-string n-grams.
-        ngrams = [ngram for ngram in ngrams if ngram and
-                  isinstance(ngram, str)]
-        # Deduplicate while preserving order (useful for testing).
-        seen = {}
-        ngrams = [seen.setdefault(x, x) for x in ngrams if x not in seen]
+        ngrams = self._get_unique_ngrams(ngrams)
         self._conn.execute(constants.DROP_TEMPORARY_NGRAMS_TABLE_SQL)
         self._conn.execute(constants.CREATE_TEMPORARY_NGRAMS_TABLE_SQL)
         self._conn.executemany(constants.INSERT_TEMPORARY_NGRAM_SQL,
                                [(ngram,) for ngram in ngrams])
 
+    def _add_temporary_text_ngrams(self, text_ngrams):
+        """Adds `text_ngrams` to a temporary table.
+
+        :param text_ngrams: pairs of text database ID and n-gram
+        :type text_ngrams: iterable of `tuple`
+
+        """
+        # The table is emptied rather than dropped, since it may be
+        # filled while other queries are still being read.
+        self._conn.execute(constants.CREATE_TEMPORARY_TEXT_NGRAMS_TABLE_SQL)
+        self._conn.execute(constants.DELETE_TEMPORARY_TEXT_NGRAMS_SQL)
+        self._conn.executemany(constants.INSERT_TEMPORARY_TEXT_NGRAM_SQL,
+                               text_ngrams)
+
     def _add_temporary_results_sets(self, results_filenames, labels):
         if len(labels) < 2:
             raise MalformedQueryError(
@@ -107,18 +254,41 @@ class DataStore:
         :type label: `str`
 
         """
-        NGRAM, SIZE, NAME, SIGLUM, COUNT, LABEL = constants.QUERY_FIELDNAMES
-        reader = csv.DictReader(results)
-        data = [(row[NGRAM], row[SIZE], row[NAME], row[SIGLUM], row[COUNT],
-                 label) for row in reader]
-        self._conn.executemany(constants.INSERT_TEMPORARY_RESULTS_SQL, data)
+        reader = csv.reader(results)
+        try:
+            fieldnames = next(reader)
+        except StopIteration:
+            return
+        required_cols = constants.QUERY_FIELDNAMES[:-1]
+        missing_cols = ['"{}"'.format(col) for col in required_cols
+                        if col not in fieldnames]
+        if missing_cols:
+            raise MalformedResultsError(
+                constants.MISSING_REQUIRED_COLUMNS_ERROR.format(
+                    ', '.join(missing_cols)))
+        indices = [fieldnames.index(col) for col in required_cols]
+        # As with csv.DictReader, blank rows are skipped and fields
+        # missing from the end of a short row are NULL.
+        rows = ([row[index] if index < len(row) else None
+                 for index in indices] + [label]
+                for row in reader if row)
+        # Rows are inserted in batches, so that no more than one batch
+        # of a (possibly very large) results file is held in memory.
+        while True:
+            batch = list(itertools.islice(
+                rows, constants.SUPPLIED_RESULTS_BATCH_SIZE))
+            if not batch:
+                break
+            self._conn.executemany(constants.INSERT_TEMPORARY_RESULTS_SQL,
+                                   batch)
 
     def _add_temporary_results_index(self):
         self._logger.info('Adding index to temporary results table')
         self._conn.execute(constants.CREATE_INDEX_INPUT_RESULTS_SQL)
         self._logger.info('Index added')
 
-    def _add_text_ngrams(self, witness, minimum, maximum):
+    def _add_text_ngrams(self, witness, minimum, maximum, filters=False,
+                         minhashes=False):
         """Adds n-gram data from `witness` to the data store.
 
         :param witness: witness to get n-grams from
@@ -127,6 +297,10 @@ class DataStore:
         :type minimum: `int`
         :param maximum: maximum n-gram size
         :type maximum: `int`
+        :param filters: whether to add n-gram filters
+        :type filters: `bool`
+        :param minhashes: whether to add MinHash signatures
+        :type minhashes: `bool`
 
         """
         text_id = self._get_text_id(witness)
@@ -139,7 +313,8 @@ class DataStore:
                     '{}-grams are already in the database'.format(size))
                 skip_sizes.append(size)
         for size, ngrams in witness.get_ngrams(minimum, maximum, skip_sizes):
-            self._add_text_size_ngrams(text_id, size, ngrams)
+            self._add_text_size_ngrams(text_id, size, ngrams, filters,
+                                       minhashes)
 
     def _add_text_record(self, witness):
         """Adds a Text record for `witness`.
@@ -159,7 +334,8 @@ class DataStore:
                 [name, siglum, checksum, token_count, ''])
         return cursor.lastrowid
 
-    def _add_text_size_ngrams(self, text_id, size, ngrams):
+    def _add_text_size_ngrams(self, text_id, size, ngrams, filters=False,
+                              minhashes=False):
         """Adds `ngrams`, that are of size `size`, to the data store.
 
         The added `ngrams` are associated with `text_id`.
@@ -170,6 +346,10 @@ class DataStore:
         :type size: `int`
         :param ngrams: n-grams to be added
         :type ngrams: `collections.Counter`
+        :param filters: whether to add an n-gram filter
+        :type filters: `bool`
+        :param minhashes: whether to add a MinHash signature
+        :type minhashes: `bool`
 
         """
         unique_ngrams = len(ngrams)
@@ -177,9 +357,18 @@ class DataStore:
             unique_ngrams, size))
         parameters = [[text_id, ngram, size, count]
                       for ngram, count in ngrams.items()]
+        minhashes = minhashes and unique_ngrams
+        if filters or minhashes:
+            hashes = bloom.hash_ngrams(ngrams)
         with self._conn:
             self._conn.execute(constants.INSERT_TEXT_HAS_NGRAM_SQL,
                                [text_id, size, unique_ngrams])
+            if filters:
+                self._conn.execute(constants.INSERT_NGRAM_FILTER_SQL,
+                                   [text_id, size,
+                                    bloom.create_filter(hashes)])
+            if minhashes:
+                self._add_minhash(text_id, size, hashes)
             self._conn.executemany(constants.INSERT_NGRAM_SQL, parameters)
 
     def _analyse(self, table=''):
@@ -240,6 +429,8 @@ class DataStore:
             row[count] = 0
         return row
 
+    @timed
+    @cached_query
     def counts(self, catalogue, output_fh):
         """Returns `output_fh` populated with CSV results giving
         n-gram counts of the witnesses of the works in `catalogue`.
@@ -259,10 +450,29 @@ class DataStore:
         cursor = self._conn.execute(query, labels)
         return self._csv(cursor, constants.COUNTS_FIELDNAMES, output_fh)
 
+    def _create_temporary_text_table(self):
+        """Creates a temporary copy of the Text table.
+
+        Since unqualified table names are resolved against the
+        temporary schema first, queries made through this connection
+        will use the copy, which can be labelled without modifying
+        the database.
+
+        """
+        self._conn.execute(constants.DROP_TEMPORARY_TEXT_TABLE_SQL)
+        self._conn.execute(constants.CREATE_TEMPORARY_TEXT_TABLE_SQL)
+        self._conn.execute(constants.INSERT_TEMPORARY_TEXT_SQL)
+        self._conn.execute(constants.CREATE_INDEX_TEMPORARY_TEXT_SQL)
+
     def _create_temporary_results_table(self):
         self._conn.execute(constants.DROP_TEMPORARY_RESULTS_TABLE_SQL)
         self._conn.execute(constants.CREATE_TEMPORARY_RESULTS_TABLE_SQL)
 
+    @property
+    def db_name(self):
+        """The path to the database file, or ':memory:'."""
+        return self._db_name
+
     def _csv(self, cursor, fieldnames, output_fh):
         """Writes the rows of `cursor` in CSV format to `output_fh`
         and returns it.
@@ -280,13 +490,32 @@ class DataStore:
         # Specify a lineterminator to avoid an extra \r being added on
         # Windows; see
         # https://stackoverflow.com/questions/3191528/csv-in-python-adding-extra-carriage-return
-        if sys.platform in ('win32', 'cygwin') and output_fh is sys.stdout:
+        target_fh = output_fh
+        if isinstance(output_fh, CacheWriter):
+            target_fh = output_fh.target
+        if sys.platform in ('win32', 'cygwin') and target_fh is sys.stdout:
             writer = csv.writer(output_fh, lineterminator='\n')
         else:
             writer = csv.writer(output_fh)
         writer.writerow(fieldnames)
-        for row in cursor:
-            writer.writerow(row)
+        with profiler.span('DataStore._csv') as span:
+            # Since SQLite executes a query as its rows are fetched,
+            # fetching (and so the query) and writing are timed
+            # separately, a batch of rows at a time.
+            rows = iter(cursor)
+            row_count = 0
+            while True:
+                with profiler.span('DataStore._csv.fetch') as batch_span:
+                    batch = list(itertools.islice(
+                        rows, constants.CSV_BATCH_SIZE))
+                    batch_span.rows = len(batch)
+                if not batch:
+                    break
+                with profiler.span('DataStore._csv.write') as batch_span:
+                    writer.writerows(batch)
+                    batch_span.rows = len(batch)
+                row_count += len(batch)
+            span.rows = row_count
         self._logger.info('Finished outputting results')
         return output_fh
 
@@ -317,6 +546,11 @@ class DataStore:
         with self._conn:
             self._conn.execute(constants.DELETE_TEXT_NGRAMS_SQL, [text_id])
             self._conn.execute(constants.DELETE_TEXT_HAS_NGRAMS_SQL, [text_id])
+            self._conn.execute(constants.DELETE_TEXT_NGRAM_FILTERS_SQL,
+                               [text_id])
+            self._conn.execute(constants.DELETE_TEXT_MINHASHES_SQL, [text_id])
+            self._conn.execute(constants.DELETE_TEXT_MINHASH_BANDS_SQL,
+                               [text_id])
 
     def _diff(self, cursor, tokenizer, output_fh):
         """Returns output_fh with diff results that have been reduced.
@@ -342,6 +576,8 @@ class DataStore:
                                'unreduced results: {}'.format(e))
         return output_fh
 
+    @timed
+    @cached_query
     def diff(self, catalogue, tokenizer, output_fh):
         """Returns `output_fh` populated with CSV results giving the n-grams
         that are unique to the witnesses of each labelled set of works
@@ -374,12 +610,30 @@ class DataStore:
         cursor = self._conn.execute(query, parameters)
         return self._diff(cursor, tokenizer, output_fh)
 
-    def diff_asymmetric(self, catalogue, prime_label, tokenizer, output_fh):
+    @timed
+    @cached_query
+    def diff_asymmetric(self, catalogue, prime_label, tokenizer, output_fh,
+                        engine=constants.DIFF_ASYMMETRIC_ENGINE_AUTO):
         """Returns `output_fh` populated with CSV results giving the
         difference in n-grams between the witnesses of labelled sets
         of works in `catalogue`, limited to those works labelled with
         `prime_label`.
 
+        The difference may be found by one of two engines, which give
+        the same results:
+
+        * query: a single query reading the n-grams of all of the
+          labelled witnesses
+
+        * filter: n-gram filters eliminate n-grams of the prime
+          label's witnesses that cannot occur in each other witness,
+          and the remainder are looked up
+
+        The auto engine uses the filter engine when the n-gram filter
+        tests are estimated to cost less than reading the other
+        witnesses' n-grams, which is when the prime label's witnesses
+        have few n-grams compared to each other witness.
+
         :param catalogue: catalogue matching filenames to labels
         :type catalogue: `Catalogue`
         :param prime_label: label to limit results to
@@ -388,6 +642,8 @@ class DataStore:
         :type tokenizer: `Tokenizer`
         :param output_fh: object to output results to
         :type output_fh: file-like object
+        :param engine: name of the engine to use
+        :type engine: `str`
         :rtype: file-like object
 
         """
@@ -399,6 +655,18 @@ class DataStore:
             labels.remove(prime_label)
         except ValueError:
             raise MalformedQueryError(constants.LABEL_NOT_IN_CATALOGUE_ERROR)
+        if engine != constants.DIFF_ASYMMETRIC_ENGINE_QUERY:
+            filter_counts = self._get_ngram_filter_counts(
+                [prime_label] + labels)
+            if filter_counts is None:
+                if engine == constants.DIFF_ASYMMETRIC_ENGINE_FILTER:
+                    self._logger.warning(
+                        constants.NGRAM_FILTERS_MISSING_WARNING)
+            elif engine == constants.DIFF_ASYMMETRIC_ENGINE_FILTER or \
+                    self._is_ngram_filter_cheaper(filter_counts, prime_label,
+                                                  labels):
+                return self._diff_asymmetric_filtered(
+                    prime_label, labels, tokenizer, output_fh)
         label_placeholders = self._get_placeholders(labels)
         query = constants.SELECT_DIFF_ASYMMETRIC_SQL.format(label_placeholders)
         parameters = [prime_label, prime_label] + labels
@@ -409,6 +677,71 @@ class DataStore:
         cursor = self._conn.execute(query, parameters)
         return self._diff(cursor, tokenizer, output_fh)
 
+    def _diff_asymmetric_filtered(self, prime_label, labels, tokenizer,
+                                  output_fh):
+        """Returns `output_fh` populated with CSV results giving the
+        difference in n-grams between the witnesses labelled with
+        `prime_label` and those labelled with `labels`, limited to
+        the former, using n-gram filters to avoid reading the n-grams
+        of the latter.
+
+        The n-grams of the prime label's witnesses are tested against
+        the filters of every other witness, and only those that may
+        occur in a witness are looked up in it, in batches; n-grams
+        found are not tested against the remaining witnesses. The
+        prime label's n-grams are then read again, in a single scan,
+        omitting those that were found.
+
+        :param prime_label: label to limit results to
+        :type prime_label: `str`
+        :param labels: other labels
+        :type labels: `list` of `str`
+        :param tokenizer: tokenizer for the n-grams
+        :type tokenizer: `Tokenizer`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        self._logger.info('Running asymmetric diff query using n-gram '
+                          'filters')
+        size_ngrams = collections.defaultdict(set)
+        cursor = self._conn.execute(constants.SELECT_LABEL_NGRAMS_SQL,
+                                    [prime_label])
+        for text_id, ngram, size in cursor:
+            size_ngrams[size].add(ngram)
+        candidates = {}
+        hashes = {}
+        for size, ngrams in size_ngrams.items():
+            candidates[size] = np.array(list(ngrams), dtype=object)
+            hashes[size] = bloom.hash_ngrams(candidates[size])
+        found = set()
+        pairs = []
+        lookups = 0
+        for text_id, filters in self._get_ngram_filters(labels):
+            for size, ngram_filter in filters:
+                if size in candidates:
+                    matches = candidates[size][bloom.contains(
+                        ngram_filter, hashes[size])]
+                    pairs.extend(zip(itertools.repeat(text_id), matches))
+            if len(pairs) >= constants.NGRAM_FILTER_LOOKUP_BATCH_SIZE:
+                lookups += len(pairs)
+                found.update(self._get_found_ngrams(pairs))
+                pairs = []
+                for size, ngrams in candidates.items():
+                    remaining = np.array([ngram not in found
+                                          for ngram in ngrams], dtype=bool)
+                    candidates[size] = ngrams[remaining]
+                    hashes[size] = hashes[size][remaining]
+        lookups += len(pairs)
+        found.update(self._get_found_ngrams(pairs))
+        self._logger.info('Looked up {} n-grams in witnesses'.format(lookups))
+        cursor = self._conn.execute(constants.SELECT_LABEL_RESULTS_SQL,
+                                    [prime_label])
+        rows = (row for row in cursor if row[0] not in found)
+        return self._diff(rows, tokenizer, output_fh)
+
+    @timed
     def diff_supplied(self, results_filenames, labels, tokenizer, output_fh):
         """Returns `output_fh` populated with CSV results giving the n-grams
         that are unique to the witnesses in each set of works in
@@ -443,6 +776,25 @@ class DataStore:
         self._conn.execute(constants.DROP_TEXTNGRAM_INDEX_SQL)
         self._logger.info('Finished dropping database indices')
 
+    @staticmethod
+    def _get_intersecting_rows(cursor, label_count):
+        """Yields the rows of `cursor`, which are ordered by n-gram,
+        whose n-gram occurs with `label_count` distinct labels.
+
+        :param cursor: database cursor containing results
+        :type cursor: `sqlite3.Cursor`
+        :param label_count: number of labels
+        :type label_count: `int`
+        :rtype: `generator`
+
+        """
+        for ngram, rows in itertools.groupby(cursor,
+                                             key=operator.itemgetter(0)):
+            rows = list(rows)
+            if len(set(row[5] for row in rows)) == label_count:
+                for row in rows:
+                    yield row
+
     @staticmethod
     def _get_intersection_subquery(labels):
         # Create nested subselects.
@@ -456,6 +808,69 @@ class DataStore:
                            subquery)
         return subquery
 
+    def _get_found_ngrams(self, text_ngrams):
+        """Returns the n-grams in `text_ngrams` that occur in the text
+        they are paired with.
+
+        :param text_ngrams: pairs of text database ID and n-gram
+        :type text_ngrams: iterable of `tuple`
+        :rtype: `list` of `str`
+
+        """
+        self._add_temporary_text_ngrams(text_ngrams)
+        cursor = self._conn.execute(constants.SELECT_INPUT_NGRAMS_FOUND_SQL)
+        return [row[0] for row in cursor]
+
+    def _get_ngram_filter_counts(self, labels):
+        """Returns the number of witnesses and the total number of
+        unique n-grams in them, keyed by label and n-gram size, of the
+        witnesses labelled with one of `labels`, or None if not all of
+        those witnesses have n-gram filters.
+
+        :param labels: labels of witnesses
+        :type labels: `list` of `str`
+        :rtype: `dict`
+
+        """
+        label_placeholders = self._get_placeholders(labels)
+        query = constants.SELECT_MISSING_LABEL_NGRAM_FILTERS_SQL.format(
+            label_placeholders)
+        try:
+            missing = self._conn.execute(query, labels).fetchone()[0]
+        except sqlite3.OperationalError as err:
+            # Databases created before n-gram filters were introduced
+            # have no table of them.
+            self._logger.debug('Could not read n-gram filters: {}'.format(
+                err))
+            return None
+        if missing:
+            self._logger.info('Not using n-gram filters, since {} are '
+                              'missing'.format(missing))
+            return None
+        counts = collections.defaultdict(dict)
+        query = constants.SELECT_NGRAM_FILTER_COUNTS_SQL.format(
+            label_placeholders)
+        for row in self._conn.execute(query, labels):
+            counts[row['label']][row['size']] = (row['texts'], row['ngrams'])
+        return counts
+
+    def _get_ngram_filters(self, labels):
+        """Returns a generator supplying, for each witness labelled with
+        one of `labels`, its database ID and a list of its n-gram sizes
+        and filters.
+
+        :param labels: labels of witnesses
+        :type labels: `list` of `str`
+        :rtype: `generator`
+
+        """
+        query = constants.SELECT_NGRAM_FILTERS_SQL.format(
+            self._get_placeholders(labels))
+        cursor = self._conn.execute(query, labels)
+        for text_id, rows in itertools.groupby(cursor,
+                                               key=operator.itemgetter(0)):
+            yield text_id, [(row[1], row[2]) for row in rows]
+
     @staticmethod
     def _get_placeholders(items):
         """Returns a string of placeholders, one for each item in
@@ -498,6 +913,37 @@ class DataStore:
                 self._delete_text_ngrams(text_id)
         return text_id
 
+    def _get_text_size_hashes(self, text_id, size):
+        """Returns the hashed n-grams of `size` in the text with
+        `text_id`.
+
+        :param text_id: database ID of text
+        :type text_id: `int`
+        :param size: size of n-grams
+        :type size: `int`
+        :rtype: `numpy.ndarray`
+
+        """
+        cursor = self._conn.execute(constants.SELECT_TEXT_SIZE_NGRAMS_SQL,
+                                    [text_id, size])
+        return bloom.hash_ngrams(row[0] for row in cursor)
+
+    @staticmethod
+    def _get_unique_ngrams(ngrams):
+        """Returns `ngrams` without duplicate, empty, and non-string
+        n-grams.
+
+        :param ngrams: n-grams
+        :type ngrams: `list`
+        :rtype: `list` of `str`
+
+        """
+        ngrams = [ngram for ngram in ngrams if ngram and
+                  isinstance(ngram, str)]
+        # Deduplicate while preserving order (useful for testing).
+        seen = {}
+        return [seen.setdefault(x, x) for x in ngrams if x not in seen]
+
     def _has_ngrams(self, text_id, size):
         """Returns True if a text has existing records for n-grams of
         size `size`.
@@ -526,17 +972,47 @@ class DataStore:
         self._conn.execute(constants.CREATE_TABLE_TEXTNGRAM_SQL)
         self._conn.execute(constants.CREATE_TABLE_TEXTHASNGRAM_SQL)
         self._conn.execute(constants.CREATE_INDEX_TEXTHASNGRAM_SQL)
+        self._conn.execute(constants.CREATE_TABLE_TEXTNGRAMFILTER_SQL)
+        self._conn.execute(constants.CREATE_INDEX_TEXTNGRAMFILTER_SQL)
+        self._conn.execute(constants.CREATE_TABLE_TEXTMINHASH_SQL)
+        self._conn.execute(constants.CREATE_INDEX_TEXTMINHASH_SQL)
+        self._conn.execute(constants.CREATE_TABLE_TEXTMINHASHBAND_SQL)
+        self._conn.execute(constants.CREATE_INDEX_TEXTMINHASHBAND_SQL)
         self._conn.execute(constants.CREATE_INDEX_TEXT_SQL)
 
-    def intersection(self, catalogue, output_fh):
+    @timed
+    @cached_query
+    def intersection(self, catalogue, output_fh,
+                     engine=constants.INTERSECT_ENGINE_AUTO):
         """Returns `output_fh` populated with CSV results giving the
         intersection in n-grams of the witnesses of labelled sets of
         works in `catalogue`.
 
+        The intersection may be found by one of several engines,
+        which give the same results:
+
+        * subquery: a single query with a nested subquery for each
+          label
+
+        * filter: n-gram filters eliminate n-grams of the smallest
+          labelled set of witnesses that cannot occur in the others,
+          and the remainder are looked up
+
+        * merge: the n-grams of all of the labelled witnesses are
+          sorted together, and those that occur with every label
+          looked up
+
+        The filter and merge engines are each faster than the
+        subquery engine only for some catalogues, and there is no
+        estimate of which that will be, so the auto engine uses the
+        subquery engine.
+
         :param catalogue: catalogue matching filenames to labels
         :type catalogue: `Catalogue`
         :param output_fh: object to output results to
         :type output_fh: file-like object
+        :param engine: name of the engine to use
+        :type engine: `str`
         :rtype: file-like object
 
         """
@@ -544,6 +1020,13 @@ class DataStore:
         if len(labels) < 2:
             raise MalformedQueryError(
                 constants.INSUFFICIENT_LABELS_QUERY_ERROR)
+        if engine == constants.INTERSECT_ENGINE_MERGE:
+            return self._intersection_merge(labels, output_fh)
+        if engine == constants.INTERSECT_ENGINE_FILTER:
+            if self._get_ngram_filter_counts(labels) is None:
+                self._logger.warning(constants.NGRAM_FILTERS_MISSING_WARNING)
+            else:
+                return self._intersection_filtered(labels, output_fh)
         label_placeholders = self._get_placeholders(labels)
         subquery = self._get_intersection_subquery(labels)
         query = constants.SELECT_INTERSECT_SQL.format(label_placeholders,
@@ -555,6 +1038,100 @@ class DataStore:
         cursor = self._conn.execute(query, parameters)
         return self._csv(cursor, constants.QUERY_FIELDNAMES, output_fh)
 
+    def _intersection_filtered(self, labels, output_fh):
+        """Returns `output_fh` populated with CSV results giving the
+        intersection in n-grams of the witnesses labelled with
+        `labels`, using n-gram filters to avoid looking up n-grams in
+        witnesses that cannot contain them.
+
+        The candidate n-grams are those of the witnesses of the last
+        (smallest) label. Candidates that no witness of another label
+        may contain, according to their filters, are eliminated, and
+        only the remainder are looked up, in those witnesses whose
+        filters may contain them.
+
+        :param labels: labels sorted by decreasing size
+        :type labels: `list` of `str`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        self._logger.info('Running intersection query using n-gram filters')
+        text_ngrams = collections.defaultdict(list)
+        cursor = self._conn.execute(constants.SELECT_LABEL_NGRAMS_SQL,
+                                    [labels[-1]])
+        for text_id, ngram, size in cursor:
+            text_ngrams[size].append((text_id, ngram))
+        candidates = {}
+        hashes = {}
+        for size, pairs in text_ngrams.items():
+            candidates[size] = self._get_unique_ngrams(
+                [ngram for text_id, ngram in pairs])
+            hashes[size] = bloom.hash_ngrams(candidates[size])
+        # Test the larger labels last, when there are fewest
+        # candidates remaining.
+        for label in reversed(labels[:-1]):
+            found = {size: np.zeros(len(ngrams), dtype=bool)
+                     for size, ngrams in candidates.items()}
+            for text_id, filters in self._get_ngram_filters([label]):
+                for size, ngram_filter in filters:
+                    if size not in candidates:
+                        continue
+                    matches = bloom.contains(ngram_filter, hashes[size])
+                    found[size] |= matches
+                    text_ngrams[size].extend(
+                        (text_id, ngram) for ngram in itertools.compress(
+                            candidates[size], matches))
+            for size, matches in found.items():
+                candidates[size] = list(itertools.compress(
+                    candidates[size], matches))
+                hashes[size] = hashes[size][matches]
+        self._logger.info('{} candidate n-grams remain after filtering'.format(
+            sum(len(ngrams) for ngrams in candidates.values())))
+        pairs = []
+        for size, ngrams in candidates.items():
+            ngrams = set(ngrams)
+            pairs.extend(pair for pair in text_ngrams[size]
+                         if pair[1] in ngrams)
+        self._add_temporary_text_ngrams(pairs)
+        cursor = self._conn.execute(
+            constants.SELECT_INPUT_TEXT_NGRAMS_BY_NGRAM_SQL)
+        # Filters give false positives, so the candidates must still
+        # be checked to occur with every label.
+        return self._csv(self._get_intersecting_rows(cursor, len(labels)),
+                         constants.QUERY_FIELDNAMES, output_fh)
+
+    def _intersection_merge(self, labels, output_fh):
+        """Returns `output_fh` populated with CSV results giving the
+        intersection in n-grams of the witnesses labelled with
+        `labels`, found by merging the n-grams of all of those
+        witnesses.
+
+        The n-grams of each witness are read from the (text, ngram)
+        index alone, and sorted together in a single pass, keeping
+        those n-grams that occur with every label. This avoids
+        materialising the n-grams of each label separately, as the
+        nested subqueries do.
+
+        :param labels: labels
+        :type labels: `list` of `str`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        label_placeholders = self._get_placeholders(labels)
+        query = constants.SELECT_INTERSECT_MERGE_SQL.format(
+            label_placeholders, label_placeholders)
+        parameters = labels + labels + [len(labels)]
+        self._logger.info('Running intersection query by merging n-grams')
+        self._logger.debug('Query: {}\nLabels: {}'.format(query, labels))
+        self._log_query_plan(query, parameters)
+        cursor = self._conn.execute(query, parameters)
+        return self._csv(cursor, constants.QUERY_FIELDNAMES, output_fh)
+
+    @timed
     def intersection_supplied(self, results_filenames, labels, output_fh):
         """Returns `output_fh` populated with CSV results giving the n-grams
         that are common to witnesses in every set of works in
@@ -579,6 +1156,60 @@ class DataStore:
         cursor = self._conn.execute(query, parameters)
         return self._csv(cursor, constants.QUERY_FIELDNAMES, output_fh)
 
+    def is_locked(self):
+        """Returns True if the database cannot be read by another
+        connection to it, as when this store holds the exclusive lock
+        on it that it acquires when first used.
+
+        :rtype: `bool`
+
+        """
+        if self._db_name == ':memory:':
+            return False
+        uri = 'file:{}?mode=ro'.format(
+            urllib.request.pathname2url(self._db_name))
+        conn = sqlite3.connect(uri, uri=True, timeout=0)
+        try:
+            conn.execute(constants.SELECT_SCHEMA_SQL).fetchone()
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            conn.close()
+        return False
+
+    @staticmethod
+    def _is_ngram_filter_cheaper(filter_counts, prime_label, labels):
+        """Returns True if an asymmetric diff of the witnesses labelled
+        `prime_label` against those labelled with `labels` is
+        estimated to be cheaper made with n-gram filters than by
+        reading the n-grams of the latter.
+
+        Each n-gram of the prime label's witnesses may be tested
+        against the filter of the same size of every other witness,
+        and each test (with the lookups that follow from it) is
+        estimated to cost `constants.NGRAM_FILTER_TEST_COST` reads of
+        a row of the other witnesses' n-grams.
+
+        :param filter_counts: numbers of witnesses and unique n-grams,
+                              keyed by label and n-gram size
+        :type filter_counts: `dict`
+        :param prime_label: label to limit results to
+        :type prime_label: `str`
+        :param labels: other labels
+        :type labels: `list` of `str`
+        :rtype: `bool`
+
+        """
+        prime = filter_counts.get(prime_label, {})
+        tests = 0
+        rows = 0
+        for label in labels:
+            for size, (texts, ngrams) in filter_counts.get(label, {}).items():
+                tests += texts * prime.get(size, (0, 0))[1]
+                rows += ngrams
+        return tests <= constants.NGRAM_FILTER_MAXIMUM_TESTS and \
+            tests * constants.NGRAM_FILTER_TEST_COST <= rows
+
     def _log_query_plan(self, query, parameters):
         cursor = self._conn.execute('EXPLAIN QUERY PLAN ' + query, parameters)
         query_plan = 'Query plan:\n'
@@ -586,6 +1217,7 @@ class DataStore:
             query_plan += '|'.join([str(value) for value in row]) + '\n'
         self._logger.debug(query_plan)
 
+    @timed
     def _reduce_diff_results(self, matches_path, tokenizer, output_fh):
         """Returns `output_fh` populated with a reduced set of data from
         `matches_fh`.
@@ -654,10 +1286,13 @@ class DataStore:
                     constants.COUNT_FIELDNAME] != 0])
         reduced_results = pd.concat(results, ignore_index=True).reindex(
             columns=constants.QUERY_FIELDNAMES)
+        profiler.set_rows(len(reduced_results))
         reduced_results.to_csv(output_fh, encoding='utf-8', float_format='%d',
                                index=False)
         return output_fh
 
+    @timed
+    @cached_query
     def search(self, catalogue, ngrams, output_fh):
         """Returns `output_fh` populated with CSV results for each n-gram in
         `ngrams` that occurs within labelled witnesses in `catalogue`.
@@ -676,6 +1311,14 @@ class DataStore:
         labels = list(self._set_labels(catalogue))
         label_placeholders = self._get_placeholders(labels)
         if ngrams:
+            filter_counts = self._get_ngram_filter_counts(labels)
+            if filter_counts is not None:
+                # Each n-gram may be tested against every filter.
+                tests = len(ngrams) * sum(
+                    texts for sizes in filter_counts.values()
+                    for texts, size_ngrams in sizes.values())
+                if tests <= constants.NGRAM_FILTER_MAXIMUM_TESTS:
+                    return self._search_filtered(labels, ngrams, output_fh)
             self._add_temporary_ngrams(ngrams)
             query = constants.SELECT_SEARCH_SQL.format(label_placeholders)
         else:
@@ -687,6 +1330,40 @@ class DataStore:
         cursor = self._conn.execute(query, labels)
         return self._csv(cursor, constants.QUERY_FIELDNAMES, output_fh)
 
+    def _search_filtered(self, labels, ngrams, output_fh):
+        """Returns `output_fh` populated with CSV results for each n-gram
+        in `ngrams` that occurs within witnesses labelled with
+        `labels`, using n-gram filters to avoid looking up n-grams in
+        witnesses that cannot contain them.
+
+        Since the size of the n-grams is not known, each is tested
+        against the filters of all sizes.
+
+        :param labels: labels of witnesses to search
+        :type labels: `list` of `str`
+        :param ngrams: n-grams to search for
+        :type ngrams: `list` of `str`
+        :param output_fh: object to write results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        self._logger.info('Running search query using n-gram filters')
+        ngrams = self._get_unique_ngrams(ngrams)
+        hashes = bloom.hash_ngrams(ngrams)
+        pairs = []
+        for text_id, filters in self._get_ngram_filters(labels):
+            matches = np.zeros(len(ngrams), dtype=bool)
+            for size, ngram_filter in filters:
+                matches |= bloom.contains(ngram_filter, hashes)
+            pairs.extend((text_id, ngram) for ngram in itertools.compress(
+                ngrams, matches))
+        self._logger.info('Looking up {} n-grams in witnesses'.format(
+            len(pairs)))
+        self._add_temporary_text_ngrams(pairs)
+        cursor = self._conn.execute(constants.SELECT_INPUT_TEXT_NGRAMS_SQL)
+        return self._csv(cursor, constants.QUERY_FIELDNAMES, output_fh)
+
     def _set_labels(self, catalogue):
         """Returns a dictionary of the unique labels in `catalogue` and the
         count of all tokens associated with each, and sets the record
@@ -703,6 +1380,8 @@ class DataStore:
         :rtype: `dict`
 
         """
+        if self._read_only:
+            self._create_temporary_text_table()
         with self._conn:
             self._conn.execute(constants.UPDATE_LABELS_SQL, [''])
             labels = {}
@@ -714,6 +1393,138 @@ class DataStore:
                 labels[label] = labels.get(label, 0) + token_count
         return labels
 
+    @timed
+    def shared_ngrams(self, catalogue, size, excluded_label=None):
+        """Returns a sparse matrix giving, for each witness of the works
+        in `catalogue` and each other work in `catalogue`, the number
+        of n-grams of `size` in the witness that are shared with that
+        other work.
+
+        The matrix is accumulated in a single pass over the n-grams
+        of all of the labelled witnesses, ordered by n-gram, and is
+        returned as a `pandas.DataFrame` having a row only for each
+        witness and related work that share at least one n-gram.
+
+        Works labelled `excluded_label` are not themselves included
+        in the matrix, but an n-gram that occurs in any of them is
+        not counted as exclusively shared.
+
+        The counts are of n-gram occurrences in the witness, so that
+        the ratio of a count to the total number of n-grams in the
+        witness approximates the proportion of its tokens covered by
+        the shared n-grams.
+
+        :param catalogue: catalogue matching filenames to labels
+        :type catalogue: `Catalogue`
+        :param size: size of n-grams to count
+        :type size: `int`
+        :param excluded_label: label of works to exclude
+        :type excluded_label: `str`
+        :rtype: `pandas.DataFrame`
+
+        """
+        labels = list(self._set_labels(catalogue))
+        label_placeholders = self._get_placeholders(labels)
+        query = constants.SELECT_SHARED_NGRAMS_SQL.format(label_placeholders)
+        parameters = labels + [size]
+        self._logger.info('Running shared n-grams query')
+        self._logger.debug('Query: {}\nLabels: {}'.format(query, labels))
+        self._log_query_plan(query, parameters)
+        cursor = self._conn.execute(query, parameters)
+        shared = collections.Counter()
+        exclusive = collections.Counter()
+        for ngram, rows in itertools.groupby(cursor,
+                                             key=operator.itemgetter(0)):
+            witnesses = []
+            works = set()
+            is_excluded = False
+            for row in rows:
+                if row[4] == excluded_label:
+                    is_excluded = True
+                else:
+                    witnesses.append(row)
+                    works.add(row[1])
+            if len(works) < 2:
+                continue
+            for row in witnesses:
+                for work in works:
+                    if work != row[1]:
+                        key = (row[1], row[2], work)
+                        shared[key] += row[3]
+                        if not is_excluded:
+                            exclusive[key] += row[3]
+        query = constants.SELECT_TEXT_TOTAL_NGRAMS_SQL.format(
+            label_placeholders)
+        totals = {(row[0], row[1]): row[2] for row in
+                  self._conn.execute(query, [size] + labels)}
+        matrix = [key + (count, exclusive[key], totals[key[:2]])
+                  for key, count in sorted(shared.items())]
+        self._logger.info('Finished shared n-grams query')
+        return pd.DataFrame(matrix, columns=constants.SHARED_NGRAMS_FIELDNAMES)
+
+    @timed
+    def similar(self, work, size, minimum, output_fh):
+        """Returns `output_fh` populated with CSV results giving, for
+        each witness of `work`, the witnesses of other works whose
+        n-grams of `size` are likely to be similar, with the
+        estimated Jaccard similarity of their n-grams.
+
+        Candidate witnesses are found using locality-sensitive
+        hashing of the MinHash signatures of the witnesses' n-grams,
+        and so witnesses of low similarity may be missed.
+
+        :param work: name of work
+        :type work: `str`
+        :param size: size of n-grams to compare, or None to use the
+                     largest size
+        :type size: `int`
+        :param minimum: minimum estimated Jaccard similarity
+        :type minimum: `float`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        try:
+            if size is None:
+                size = self._conn.execute(constants.SELECT_SIMILAR_SIZE_SQL,
+                                          [work]).fetchone()[0]
+            targets = self._conn.execute(
+                constants.SELECT_SIMILAR_TARGETS_SQL, [work, size]).fetchall()
+        except sqlite3.OperationalError as err:
+            # Databases created before MinHash signatures were
+            # introduced have no table of them.
+            self._logger.debug('Could not read MinHash signatures: {}'.format(
+                err))
+            targets = []
+        if not targets:
+            raise MalformedQueryError(
+                constants.WORK_NOT_IN_DATABASE_ERROR.format(work))
+        self._logger.info('Finding witnesses similar to {} using {}-grams'
+                          .format(work, size))
+        rows = []
+        for text_id, siglum, signature in targets:
+            signature = minhash.from_bytes(signature)
+            candidates = set()
+            for band, band_hash in enumerate(
+                    minhash.get_band_hashes(signature)):
+                cursor = self._conn.execute(constants.SELECT_SIMILAR_BAND_SQL,
+                                            [size, band, band_hash])
+                candidates.update(row[0] for row in cursor)
+            for candidate in candidates:
+                row = self._conn.execute(
+                    constants.SELECT_SIMILAR_CANDIDATE_SQL,
+                    [candidate, size]).fetchone()
+                if row['work'] == work:
+                    continue
+                jaccard = minhash.estimate_jaccard(
+                    signature, minhash.from_bytes(row['signature']))
+                if jaccard >= minimum:
+                    rows.append((work, siglum, row['work'], row['siglum'],
+                                 size, jaccard))
+        rows.sort(key=lambda row: (-row[5], row[1], row[2], row[3]))
+        return self._csv(rows, constants.SIMILAR_FIELDNAMES, output_fh)
+
     @staticmethod
     def _sort_labels(label_data):
         """Returns the labels in `label_data` sorted in descending order
@@ -1,9 +1,47 @@
 from functools import wraps
+import inspect
 
-from . import constants
+from . import constants, profiler
 from .exceptions import MalformedResultsError
 
 
+def cached_query(f):
+    """Decorator that supplies the results of the decorated `DataStore`
+    query method from the store's query cache, if they are there, and
+    adds them to it if not.
+
+    The decorated method's first argument must be the catalogue, and
+    it must have an `output_fh` argument for the file to write the
+    results to, which may be passed positionally or by keyword. The
+    arguments between the catalogue and `output_fh` form part of the
+    cache key; any after `output_fh` do not, and so must not affect
+    the results.
+
+    """
+    signature = inspect.signature(f)
+    parameters = list(signature.parameters)
+    key_parameters = parameters[2:parameters.index('output_fh')]
+
+    @wraps(f)
+    def decorated_function(store, *args, **kwargs):
+        cache = store._cache
+        if cache is None:
+            return f(store, *args, **kwargs)
+        bound = signature.bind(store, *args, **kwargs)
+        output_fh = bound.arguments['output_fh']
+        key = cache.get_key(
+            f.__name__, bound.arguments['catalogue'],
+            *[bound.arguments[name] for name in key_parameters])
+        if cache.get(key, output_fh):
+            return output_fh
+        writer = cache.get_writer(output_fh)
+        bound.arguments['output_fh'] = writer
+        f(*bound.args, **bound.kwargs)
+        cache.add(key, writer)
+        return output_fh
+    return decorated_function
+
+
 def requires_columns(required_cols):
     """Decorator that raises a `MalformedResultsError` if any of
     `required_cols` is not present as a column in the matches of the
@@ -28,3 +66,30 @@ def requires_columns(required_cols):
             return f(*args, **kwargs)
         return decorated_function
     return dec
+
+
+def timed(f):
+    """Decorator that records a profiling span around each call of the
+    decorated function, named after it."""
+    name = f.__qualname__
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with profiler.span(name):
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def timed_results(f):
+    """Decorator that records a profiling span around each call of the
+    decorated method of a `Results` object, with the number of result
+    rows after the call."""
+    name = f.__qualname__
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with profiler.span(name) as span:
+            result = f(*args, **kwargs)
+            span.rows = len(args[0]._matches)
+        return result
+    return decorated_function
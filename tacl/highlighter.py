@@ -3,18 +3,17 @@
 import logging
 import re
 
-from lxml import etree
 import pandas as pd
 
 from . import constants
 from .colour import generate_colours
+from .decorators import timed
+from .parallel import LoggerPickleMixin, map_tasks
 from .report import Report
-from .text import WitnessText
+from .text import WitnessText, find_ngrams
 
 
-class HighlightReport(Report):
-
-    _base_token_markup = r'<span>\1</span>'
+class HighlightReport(LoggerPickleMixin, Report):
 
     def __init__(self, corpus, tokenizer):
         self._logger = logging.getLogger(__name__)
@@ -35,35 +34,56 @@ class HighlightReport(Report):
         content = re.sub(r'&#160; ', '&#160;&#160;', content)
         return content
 
-    def _generate_base(self, work, siglum):
-        witness = self._corpus.get_witness(work, siglum)
-        content = witness.get_content().strip()
-        return self._prepare_text(content)
-
-    def _get_regexp_pattern(self, ngram):
-        inter_token_pattern = r'</span>\W*<span[^>]*>'
-        pattern = inter_token_pattern.join(
-            [re.escape(token) for token in self._tokenizer.tokenize(ngram)])
-        return r'(<span[^>]*>{}</span>)'.format(pattern)
-
     def generate(self, output_dir, work, *args):
         raise NotImplementedError
 
-    def _prepare_text(self, text):
-        """Returns `text` with each consituent token wrapped in HTML markup
-        for later match annotation.
+    def _get_content(self, work, siglum):
+        """Returns the content of the witness `work` `siglum`, less any
+        characters that should be escaped for XML input (but which
+        cause problems when escaped, since they become tokens).
+
+        :param work: name of work
+        :type work: `str`
+        :param siglum: siglum of witness
+        :type siglum: `str`
+        :rtype: `str`
+
+        """
+        witness = self._corpus.get_witness(work, siglum)
+        content = witness.get_content().strip()
+        return re.sub(r'[<>&]', '', content)
+
+    def _render(self, text, token_matches, values):
+        """Returns `text` with each token in `token_matches` wrapped in
+        HTML markup including its corresponding item in `values`.
 
         :param text: text to be marked up
         :type text: `str`
+        :param token_matches: matches of the tokens in `text`
+        :type token_matches: `list` of `re.Match`
+        :param values: value to include in each token's markup
+        :type values: `list` of `str`
         :rtype: `str`
 
         """
-        # Remove characters that should be escaped for XML input (but
-        # which cause problems when escaped, since they become
-        # tokens).
-        text = re.sub(r'[<>&]', '', text)
-        pattern = r'({})'.format(self._tokenizer.pattern)
-        return re.sub(pattern, self._base_token_markup, text)
+        html = []
+        position = 0
+        for match, value in zip(token_matches, values):
+            html.append(text[position:match.start()])
+            html.append(self._token_markup.format(value, match.group()))
+            position = match.end()
+        html.append(text[position:])
+        return ''.join(html)
+
+    def _tokenize(self, text):
+        """Returns the matches of each token in `text`.
+
+        :param text: text to be tokenized
+        :type text: `str`
+        :rtype: `list` of `re.Match`
+
+        """
+        return list(re.finditer(self._tokenizer.pattern, text))
 
     def _write(self, work, siglum, text, report_dir, report_name,
                template, copy_assets=False, **kwargs):
@@ -77,20 +97,22 @@ class HighlightReport(Report):
 
 class NgramHighlightReport (HighlightReport):
 
-    _base_token_markup = r'<span>\1</span>'
-    _ngrams_count = 1
+    """Generate reports of the text of each witness to a work, with
+    groups of n-grams highlighted.
+
+    If more than one process is specified, the report for each
+    witness is generated in a pool of worker processes.
+
+    """
+
     _report_name = 'ngram_highlight'
+    _token_markup = '<span{}>{}</span>'
 
-    def _annotate_tokens(self, match_obj):
-        match = match_obj.group(0)
-        root = etree.fromstring('<div>{}</div>'.format(match))
-        for span in root.xpath('//span'):
-            if self._add_highlight:
-                span.set('class', 'highlight{}'.format(self._ngrams_count))
-            elif span.get('class'):
-                del span.attrib['class']
-        return etree.tostring(root, encoding='unicode')[5:-6]
+    def __init__(self, corpus, tokenizer, processes=1):
+        super().__init__(corpus, tokenizer)
+        self._processes = processes
 
+    @timed
     def generate(self, output_dir, work, ngrams, labels, minus_ngrams):
         """Generates HTML reports for each witness to `work`, showing its text
         with the n-grams in `ngrams` highlighted.
@@ -111,56 +133,84 @@ class NgramHighlightReport (HighlightReport):
         :rtype: `str`
 
         """
-        template = self._get_template()
-        colours = generate_colours(len(ngrams))
-        for siglum in self._corpus.get_sigla(work):
-            ngram_data = zip(labels, ngrams)
-            content = self._generate_base(work, siglum)
-            for ngrams_group in ngrams:
-                content = self._highlight(content, ngrams_group, True)
-            content = self._highlight(content, minus_ngrams, False)
-            self._ngrams_count = 1
-            content = self._format_content(content)
-            report_name = '{}-{}.html'.format(work, siglum)
-            self._write(work, siglum, content, output_dir, report_name,
-                        template, ngram_data=ngram_data,
-                        minus_ngrams=minus_ngrams, colours=colours)
+        tasks = [(output_dir, work, siglum, ngrams, labels, minus_ngrams)
+                 for siglum in self._corpus.get_sigla(work)]
+        for _ in map_tasks(self._generate_witness, tasks, self._processes):
+            pass
+
+    def _generate_witness(self, task):
+        """Generates the HTML report for the witness in `task`.
 
-    def _highlight(self, content, ngrams, highlight):
-        """Returns `content` with its n-grams from `ngrams` highlighted (if
-        `add_class` is True) or unhighlighted.
+        :param task: output directory, work, siglum, n-grams, labels
+                     and minus n-grams
+        :type task: `tuple`
 
-        :param content: text to be modified
+        """
+        output_dir, work, siglum, ngrams, labels, minus_ngrams = task
+        template = self._get_template()
+        colours = generate_colours(len(ngrams))
+        ngram_data = zip(labels, ngrams)
+        content = self._get_content(work, siglum)
+        content = self._highlight(content, ngrams, minus_ngrams)
+        content = self._format_content(content)
+        report_name = '{}-{}.html'.format(work, siglum)
+        self._write(work, siglum, content, output_dir, report_name,
+                    template, ngram_data=ngram_data,
+                    minus_ngrams=minus_ngrams, colours=colours)
+
+    def _highlight(self, content, ngrams, minus_ngrams):
+        """Returns `content` with its n-grams from each group in `ngrams`
+        highlighted, other than those tokens that are part of an
+        n-gram in `minus_ngrams`.
+
+        Each token is given the class of the last group having an
+        n-gram that includes it. All of the n-grams, in every group
+        and in `minus_ngrams`, are located in a single pass over the
+        tokens of `content`, and the HTML is then rendered once.
+
+        :param content: text to be highlighted
         :type content: `str`
-        :param ngrams: n-grams to modify
-        :type ngrams: `list` of `str`
-        :param highlight: whether to highlight or unhighlight `ngrams`
-        :type highlight: `bool`
+        :param ngrams: groups of n-grams to highlight
+        :type ngrams: `list` of `list` of `str`
+        :param minus_ngrams: n-grams to remove highlighting from
+        :type minus_ngrams: `list` of `str`
         :rtype: `str`
 
         """
-        self._add_highlight = highlight
-        for ngram in ngrams:
-            pattern = self._get_regexp_pattern(ngram)
-            content = re.sub(pattern, self._annotate_tokens, content)
-        self._ngrams_count += 1
-        return content
+        # Map each n-gram to the group it is highlighted with, with
+        # the minus n-grams as group 0, to be unhighlighted.
+        ngram_groups = {}
+        for index, ngrams_group in enumerate(ngrams, 1):
+            for ngram in ngrams_group:
+                ngram_groups[ngram] = index
+        for ngram in minus_ngrams:
+            ngram_groups[ngram] = 0
+        token_matches = self._tokenize(content)
+        tokens = [match.group() for match in token_matches]
+        token_groups = [None] * len(tokens)
+        minus_tokens = [False] * len(tokens)
+        for start, end, ngram in find_ngrams(tokens, ngram_groups,
+                                             self._tokenizer):
+            group = ngram_groups[ngram]
+            for index in range(start, end):
+                if group == 0:
+                    minus_tokens[index] = True
+                elif token_groups[index] is None or \
+                        token_groups[index] < group:
+                    token_groups[index] = group
+        values = []
+        for group, is_minus in zip(token_groups, minus_tokens):
+            if group is None or is_minus:
+                values.append('')
+            else:
+                values.append(' class="highlight{}"'.format(group))
+        return self._render(content, token_matches, values)
 
 
 class ResultsHighlightReport (HighlightReport):
 
-    _base_token_markup = r'<span data-count="0" data-texts=" ">\1</span>'
     _report_name = 'results_highlight'
-
-    def _annotate_tokens(self, match_obj):
-        match = match_obj.group(0)
-        root = etree.fromstring('<div>{}</div>'.format(match))
-        for span in root.xpath('//span'):
-            texts = span.get('data-texts')
-            if ' {} '.format(self._match_source) not in texts:
-                new_value = '{}{} '.format(texts, self._match_source)
-                span.set('data-texts', new_value)
-        return etree.tostring(root, encoding='unicode')[5:-6]
+    _token_markup = '<span data-count="0" data-texts=" {}">{}</span>'
 
     @staticmethod
     def _generate_text_list(matches):
@@ -172,6 +222,7 @@ class ResultsHighlightReport (HighlightReport):
         text_list.sort()
         return text_list
 
+    @timed
     def generate(self, output_dir, work, matches_filename):
         """Generates HTML reports showing the text of each witness to `work`
         with its matches in `matches` highlighted.
@@ -190,7 +241,7 @@ class ResultsHighlightReport (HighlightReport):
         for siglum in self._corpus.get_sigla(work):
             subm = matches[(matches[constants.WORK_FIELDNAME] != work) |
                            (matches[constants.SIGLUM_FIELDNAME] != siglum)]
-            content = self._generate_base(work, siglum)
+            content = self._get_content(work, siglum)
             content = self._highlight(content, subm)
             content = self._format_content(content)
             text_list = self._generate_text_list(subm)
@@ -199,10 +250,35 @@ class ResultsHighlightReport (HighlightReport):
                         template, True, text_list=text_list)
 
     def _highlight(self, content, matches):
-        for row_index, row in matches.iterrows():
-            ngram = row[constants.NGRAM_FIELDNAME]
-            self._match_source = WitnessText.assemble_filename(
-                row[constants.WORK_FIELDNAME], row[constants.SIGLUM_FIELDNAME])
-            pattern = self._get_regexp_pattern(ngram)
-            content = re.sub(pattern, self._annotate_tokens, content)
-        return content
+        """Returns `content` with each token marked up with the witnesses
+        in `matches` that have an n-gram including that token.
+
+        All of the n-grams in `matches` are located in a single pass
+        over the tokens of `content`, and the HTML is rendered once
+        all of the witnesses for each token are known.
+
+        :param content: text to be highlighted
+        :type content: `str`
+        :param matches: matches to highlight
+        :type matches: `pandas.DataFrame`
+        :rtype: `str`
+
+        """
+        ngram_sources = {}
+        cols = [constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
+                constants.SIGLUM_FIELDNAME]
+        for ngram, work, siglum in matches[cols].drop_duplicates().itertuples(
+                index=False):
+            ngram_sources.setdefault(ngram, set()).add(
+                WitnessText.assemble_filename(work, siglum))
+        token_matches = self._tokenize(content)
+        tokens = [match.group() for match in token_matches]
+        token_sources = [set() for token in tokens]
+        for start, end, ngram in find_ngrams(tokens, ngram_sources,
+                                             self._tokenizer):
+            sources = ngram_sources[ngram]
+            for index in range(start, end):
+                token_sources[index].update(sources)
+        values = [''.join('{} '.format(source) for source in sorted(sources))
+                  for sources in token_sources]
+        return self._render(content, token_matches, values)
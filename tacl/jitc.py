@@ -1,5 +1,6 @@
 import csv
 import io
+import itertools
 import json
 import logging
 import os
@@ -8,9 +9,14 @@ import pandas as pd
 
 from . import constants
 from .colour import generate_colours
+from .data_store import DataStore
+from .decorators import timed
+from .exceptions import MalformedQueryError
+from .parallel import LoggerPickleMixin, map_tasks
 from .report import Report
 from .results import Results
 from .statistics_report import StatisticsReport
+from .supplied_store import SuppliedStore
 
 
 # Data headers.
@@ -25,8 +31,28 @@ SIGLUM = 'siglum'
 UNIQUE = 'unique'  # Text unique to yes.
 WORK = 'work'
 
+# Read-only data stores opened within a worker process, keyed by
+# database path.
+_read_only_stores = {}
 
-class JitCReport(Report):
+
+def _get_read_only_store(db_name):
+    """Returns a read-only `DataStore` for the database at `db_name`,
+    reusing one previously opened in this process.
+
+    :param db_name: path to database
+    :type db_name: `str`
+    :rtype: `DataStore`
+
+    """
+    store = _read_only_stores.get(db_name)
+    if store is None:
+        store = _read_only_stores[db_name] = DataStore(db_name,
+                                                       read_only=True)
+    return store
+
+
+class JitCReport(LoggerPickleMixin, Report):
 
     """Generate statistics to list works from one corpus (referred to
     below as "Maybe" and defined in a catalogue file) in order of
@@ -61,15 +87,48 @@ class JitCReport(Report):
     eg, if two n-grams in a witness of M are found only in two
     different witnesses of Y, they will both be counted as shared.
 
+    If more than one process is specified, the queries and
+    statistics reports for each work and pair of works are run in a
+    pool of worker processes, each with its own read-only connection
+    to the database, before the statistics are collected from the
+    files they generate. This requires that the database not be held
+    under an exclusive lock by `store` (as it will be if `store` has
+    already been used to make a query), which raises a
+    `MalformedQueryError`, and is not possible with an in-memory
+    database.
+
+    If an n-gram size is supplied to `generate`, the statistics are
+    instead derived from a matrix of the n-grams of that size shared
+    between each pair of works, computed by the data store in a
+    single pass over the n-grams of all of the works. Each statistic
+    is then the proportion of the n-grams (rather than of the tokens)
+    of a witness of M that are shared with Y, and no results or
+    statistics files are generated.
+
     """
 
     _report_name = 'jitc'
 
-    def __init__(self, store, corpus, tokenizer):
+    def __init__(self, store, corpus, tokenizer, processes=1):
         self._logger = logging.getLogger(__name__)
         self._corpus = corpus
         self._tokenizer = tokenizer
         self._store = store
+        # Supplied diffs are made without the database.
+        self._supplied_store = SuppliedStore()
+        self._processes = processes
+
+    def __getstate__(self):
+        # A database connection cannot be passed to another process,
+        # so a worker process instead opens its own, read-only,
+        # connection to the same database.
+        state = super().__getstate__()
+        state['_store'] = self._store.db_name
+        return state
+
+    def __setstate__(self, state):
+        state['_store'] = _get_read_only_store(state['_store'])
+        super().__setstate__(state)
 
     def _create_breakdown_chart(self, data, work, output_dir):
         """Generates and writes to a file in `output_dir` the data used to
@@ -178,7 +237,8 @@ class JitCReport(Report):
         results.remove_label(self._no_label)
         results.csv(fh)
 
-    def generate(self, output_dir, catalogue, maybe_label):
+    @timed
+    def generate(self, output_dir, catalogue, maybe_label, size=None):
         maybe_works = [work for work, label in catalogue.items()
                        if label == maybe_label]
         maybe_works.sort()
@@ -187,7 +247,10 @@ class JitCReport(Report):
         no_works.sort()
         self._maybe_label = maybe_label
         self._no_label = catalogue[no_works[0]]
-        data = self._process_works(maybe_works, no_works, output_dir)
+        if size is None:
+            data = self._process_works(maybe_works, no_works, output_dir)
+        else:
+            data = self._process_shared_ngrams(maybe_works, no_works, size)
         grouped = data.groupby(level=[BASE_WORK, RELATED_WORK],
                                axis=0, group_keys=False)
         max_data = grouped.apply(lambda x: x.loc[x[SHARED].idxmax()])
@@ -233,6 +296,26 @@ class JitCReport(Report):
             with open(out_path, mode='w', encoding='utf-8', newline='') as fh:
                 report.csv(fh)
 
+    def _get_ym_results_path(self, yes_work, maybe_work):
+        """Returns the path to the results intersecting `yes_work` with
+        `maybe_work`.
+
+        :param yes_work: name of work for which stats are collected
+        :type yes_work: `str`
+        :param maybe_work: name of work being compared with `yes_work`
+        :type maybe_work: `str`
+        :rtype: `str`
+
+        """
+        # Sort the works to have a single filename for the
+        # intersection each pair of works, whether they are yes or
+        # maybe. This saves repeating the intersection with the roles
+        # switched, since _run_query will use a found file rather than
+        # rerun the query.
+        works = sorted([yes_work, maybe_work])
+        return os.path.join(self._ym_intersects_dir,
+                            '{}_intersect_{}.csv'.format(*works))
+
     def _get_reversed_data(self, data):
         reverse_data = data.unstack(BASE_WORK)[SHARED]
         tuples = list(zip([SHARED_RELATED_WORK] * len(reverse_data.columns),
@@ -244,6 +327,94 @@ class JitCReport(Report):
                 SHARED_RELATED_WORK].loc[work].tolist()
         return reverse_data.swaplevel(WORK, BASE_WORK, axis=1)
 
+    def _prepare_pair(self, task):
+        """Generates the intersection and difference statistics files for
+        the pair of works in `task`.
+
+        :param task: "yes" work, "maybe" work and output data directory
+        :type task: `tuple` of `str`
+
+        """
+        yes_work, maybe_work, output_dir = task
+        ym_results_path = self._get_ym_results_path(yes_work, maybe_work)
+        work_dir = os.path.join(output_dir, yes_work)
+        yn_results_path = os.path.join(work_dir, 'intersect_with_no.csv')
+        self._generate_statistics(
+            os.path.join(work_dir, 'stats_intersect_{}.csv'.format(
+                maybe_work)), ym_results_path)
+        distinct_results_path = os.path.join(
+            work_dir, 'distinct_{}.csv'.format(maybe_work))
+        results = [yn_results_path, ym_results_path]
+        labels = [self._no_label, self._maybe_label]
+        self._run_query(distinct_results_path,
+                        self._supplied_store.diff_supplied,
+                        [results, labels, self._tokenizer])
+        self._generate_statistics(
+            os.path.join(work_dir, 'stats_diff_{}.csv'.format(maybe_work)),
+            distinct_results_path)
+
+    def _prepare_pair_intersection(self, task):
+        """Generates the results of intersecting the pair of works in
+        `task`.
+
+        :param task: two works
+        :type task: `tuple` of `str`
+
+        """
+        yes_work, maybe_work = task
+        ym_results_path = self._get_ym_results_path(yes_work, maybe_work)
+        catalogue = {yes_work: self._no_label, maybe_work: self._maybe_label}
+        self._run_query(ym_results_path, self._store.intersection, [catalogue],
+                        False)
+
+    def _prepare_works(self, maybe_works, no_works, output_dir):
+        """Generates, in a pool of worker processes, all of the results and
+        statistics files used in comparing each work in `maybe_works`
+        with each other.
+
+        The files are generated in stages, such that no file is
+        generated by more than one worker, and every file a stage
+        depends on has been generated by an earlier stage.
+
+        :param maybe_works: names of "maybe" works
+        :type maybe_works: `list` of `str`
+        :param no_works: names of "no" works
+        :type no_works: `list` of `str`
+        :param output_dir: base output data directory
+        :type output_dir: `str`
+
+        """
+        self._logger.info('Generating results and statistics using {} '
+                          'processes'.format(self._processes))
+        stages = (
+            (self._prepare_yes_work,
+             [(yes_work, no_works, output_dir) for yes_work in maybe_works]),
+            (self._prepare_pair_intersection,
+             list(itertools.combinations(maybe_works, 2))),
+            (self._prepare_pair,
+             [(yes_work, maybe_work, output_dir) for yes_work, maybe_work in
+              itertools.permutations(maybe_works, 2)]),
+        )
+        for function, tasks in stages:
+            list(map_tasks(function, tasks, self._processes))
+
+    def _prepare_yes_work(self, task):
+        """Generates the results of intersecting the "yes" work in `task`
+        with the "no" works.
+
+        :param task: "yes" work, "no" works and output data directory
+        :type task: `tuple`
+
+        """
+        yes_work, no_works, output_dir = task
+        catalogue = {work: self._no_label for work in no_works}
+        catalogue[yes_work] = self._maybe_label
+        yes_work_dir = os.path.join(output_dir, yes_work)
+        os.makedirs(yes_work_dir, exist_ok=True)
+        yn_results_path = os.path.join(yes_work_dir, 'intersect_with_no.csv')
+        self._run_query(yn_results_path, self._store.intersection,
+                        [catalogue])
+
     def _process_diff(self, yes_work, maybe_work, work_dir, ym_results_path,
                       yn_results_path, stats):
         """Returns statistics on the difference between the intersection of
@@ -271,7 +442,8 @@ class JitCReport(Report):
             work_dir, 'distinct_{}.csv'.format(maybe_work))
         results = [yn_results_path, ym_results_path]
         labels = [self._no_label, self._maybe_label]
-        self._run_query(distinct_results_path, self._store.diff_supplied,
+        self._run_query(distinct_results_path,
+                        self._supplied_store.diff_supplied,
                         [results, labels, self._tokenizer])
         return self._update_stats('diff', work_dir, distinct_results_path,
                                   yes_work, maybe_work, stats, SHARED, COMMON)
@@ -337,21 +509,51 @@ class JitCReport(Report):
             stats[COMMON][witness] = 0
             stats[SHARED][witness] = 0
             stats[UNIQUE][witness] = 100
-        works = [yes_work, maybe_work]
-        # Sort the works to have a single filename for the
-        # intersection each pair of works, whether they are yes or
-        # maybe. This saves repeating the intersection with the roles
-        # switched, since _run_query will use a found file rather than
-        # rerun the query.
-        works.sort()
-        ym_results_path = os.path.join(
-            self._ym_intersects_dir, '{}_intersect_{}.csv'.format(*works))
+        ym_results_path = self._get_ym_results_path(yes_work, maybe_work)
         stats = self._process_intersection(yes_work, maybe_work, work_dir,
                                            ym_results_path, stats)
         stats = self._process_diff(yes_work, maybe_work, work_dir,
                                    ym_results_path, yn_results_path, stats)
         return stats
 
+    def _process_shared_ngrams(self, maybe_works, no_works, size):
+        """Collect and return the data of how each work in `maybe_works`
+        relates to each other work, derived from the matrix of shared
+        n-grams of `size`.
+
+        :param maybe_works: names of "maybe" works
+        :type maybe_works: `list` of `str`
+        :param no_works: names of "no" works
+        :type no_works: `list` of `str`
+        :param size: size of n-grams to compare works by
+        :type size: `int`
+        :rtype: `pandas.DataFrame`
+
+        """
+        catalogue = {work: self._no_label for work in no_works}
+        catalogue.update({work: self._maybe_label for work in maybe_works})
+        matrix = self._store.shared_ngrams(catalogue, size, self._no_label)
+        # Each row of the matrix gives the n-grams of a witness of a
+        # "maybe" work that are shared with a "yes" work.
+        matrix = matrix.set_index([constants.RELATED_WORK_FIELDNAME,
+                                   constants.WORK_FIELDNAME,
+                                   constants.SIGLUM_FIELDNAME])
+        matrix.index.names = [BASE_WORK, RELATED_WORK, SIGLUM]
+        total = matrix[constants.TOTAL_NGRAMS_FIELDNAME]
+        shared = 100 * matrix[constants.EXCLUSIVE_NGRAMS_FIELDNAME] / total
+        common = 100 * matrix[constants.SHARED_NGRAMS_FIELDNAME] / total - \
+            shared
+        index = pd.MultiIndex.from_tuples(
+            [(yes_work, maybe_work, siglum) for yes_work in maybe_works
+             for maybe_work in maybe_works if maybe_work != yes_work
+             for siglum in self._corpus.get_sigla(maybe_work)],
+            names=[BASE_WORK, RELATED_WORK, SIGLUM])
+        df = pd.DataFrame({COMMON: common, SHARED: shared}).reindex(
+            index).fillna(0)
+        df[UNIQUE] = 100 - df[COMMON] - df[SHARED]
+        df.columns.name = SCOPE
+        return df
+
     def _process_works(self, maybe_works, no_works, output_dir):
         """Collect and return the data of how each work in `maybe_works`
         relates to each other work.
@@ -371,6 +573,16 @@ class JitCReport(Report):
                                                'ym_intersects')
         data = {}
         os.makedirs(self._ym_intersects_dir, exist_ok=True)
+        if self._processes > 1:
+            if self._store.db_name == ':memory:':
+                self._logger.warning(
+                    'An in-memory database cannot be shared between '
+                    'processes; processing works serially')
+            elif self._store.is_locked():
+                raise MalformedQueryError(
+                    constants.DATABASE_LOCKED_PROCESSES_ERROR)
+            else:
+                self._prepare_works(maybe_works, no_works, output_data_dir)
         for yes_work in maybe_works:
             no_catalogue[yes_work] = self._maybe_label
             stats = self._process_yes_work(yes_work, no_catalogue,
@@ -1,7 +1,11 @@
 import os
 import os.path
 
+import numpy as np
+import pandas as pd
+
 from . import constants
+from .decorators import timed
 from .report import Report
 
 
@@ -25,8 +29,10 @@ class LifetimeReport (Report):
 
     """
 
+    _periods = ('first', 'only', 'last')
     _report_name = 'lifetime'
 
+    @timed
     def generate(self, output_dir, catalogue, results, label):
         """Generates the report, writing it to `output_dir`."""
         data = results.get_raw_data()
@@ -47,15 +53,35 @@ class LifetimeReport (Report):
         return '\n'.join(html)
 
     def _generate_ngram_table(self, output_dir, labels, results):
-        """Returns an HTML table containing data on each n-gram in
-        `results`."""
-        html = []
-        grouped = results.groupby(constants.NGRAM_FIELDNAME)
+        """Returns a generator of the HTML rows of a table containing data
+        on each n-gram in `results`.
+
+        The count range of each work is derived from a single
+        grouping of `results` by n-gram and work.
+
+        """
         row_template = self._generate_ngram_row_template(labels)
-        for name, group in grouped:
-            html.append(self._render_ngram_row(name, group, row_template,
-                                               labels))
-        return '\n'.join(html)
+        counts = results.groupby(
+            [constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME]).agg(
+                {constants.COUNT_FIELDNAME: ['min', 'max'],
+                 constants.LABEL_FIELDNAME: 'first'})
+        counts.columns = ['min', 'max', constants.LABEL_FIELDNAME]
+        counts = counts.reset_index()
+        min_counts = counts['min'].astype(str)
+        count_ranges = min_counts.where(
+            counts['min'] == counts['max'],
+            min_counts + '\N{EN DASH}' + counts['max'].astype(str))
+        counts['cell'] = counts[constants.WORK_FIELDNAME].astype(str) + \
+            ' (' + count_ranges + ')'
+        cells = counts.groupby(
+            [constants.NGRAM_FIELDNAME, constants.LABEL_FIELDNAME],
+            sort=False)['cell'].agg('; '.join).unstack(
+                constants.LABEL_FIELDNAME).reindex(columns=labels).fillna('')
+        for row in cells.itertuples():
+            cell_data = dict(zip(labels, row[1:]))
+            cell_data['ngram'] = row[0]
+            html = row_template.format(**cell_data)
+            yield '<tr>\n{}\n</tr>'.format(html)
 
     def _generate_ngram_row_template(self, labels):
         """Returns the HTML template for a row in the n-gram table."""
@@ -71,35 +97,35 @@ class LifetimeReport (Report):
         containing those n-grams with that label that first occurred,
         only occurred, and last occurred in that label.
 
+        The index of the first and last label each n-gram occurs in
+        is found with a single grouping of `results` by n-gram, from
+        which every row is classified at once.
+
         """
+        label_indices = pd.Series(pd.Categorical(
+            results[constants.LABEL_FIELDNAME], categories=labels,
+            ordered=True).codes, index=results.index)
+        # Results with a label not in `labels` are ignored.
+        results = results[label_indices >= 0]
+        label_indices = label_indices[label_indices >= 0]
+        grouped = label_indices.groupby(results[constants.NGRAM_FIELDNAME])
+        first_indices = grouped.transform('min')
+        last_indices = grouped.transform('max')
+        periods = pd.Series(np.select(
+            [first_indices == last_indices, first_indices == label_indices,
+             last_indices == label_indices], ['only', 'first', 'last'], ''),
+            index=results.index)
         ngrams = {}
         for idx, label in enumerate(labels):
-            now_results = results[results[constants.LABEL_FIELDNAME] == label]
-            earlier_labels = labels[:idx]
-            earlier_ngrams = results[results[constants.LABEL_FIELDNAME].isin(
-                earlier_labels)][constants.NGRAM_FIELDNAME].values
-            later_labels = labels[idx + 1:]
-            later_ngrams = results[results[constants.LABEL_FIELDNAME].isin(
-                later_labels)][constants.NGRAM_FIELDNAME].values
-            first_ngrams = []
-            only_ngrams = []
-            last_ngrams = []
-            for ngram in now_results[constants.NGRAM_FIELDNAME].unique():
-                if ngram in earlier_ngrams:
-                    if ngram not in later_ngrams:
-                        last_ngrams.append(ngram)
-                elif ngram in later_ngrams:
-                    first_ngrams.append(ngram)
-                else:
-                    only_ngrams.append(ngram)
-            self._save_results(output_dir, label, now_results, first_ngrams,
-                               'first')
-            self._save_results(output_dir, label, now_results, only_ngrams,
-                               'only')
-            self._save_results(output_dir, label, now_results, last_ngrams,
-                               'last')
-            ngrams[label] = {'first': first_ngrams, 'last': last_ngrams,
-                             'only': only_ngrams}
+            is_label = label_indices == idx
+            now_results = results[is_label]
+            now_periods = periods[is_label]
+            ngrams[label] = {}
+            for period in self._periods:
+                period_results = now_results[now_periods == period]
+                self._save_results(output_dir, label, period_results, period)
+                ngrams[label][period] = list(period_results[
+                    constants.NGRAM_FIELDNAME].unique())
         return ngrams
 
     def _render_corpus_row(self, label, ngrams):
@@ -107,48 +133,22 @@ class LifetimeReport (Report):
         row = ('<tr>\n<td>{label}</td>\n<td>{first}</td>\n<td>{only}</td>\n'
                '<td>{last}</td>\n</tr>')
         cell_data = {'label': label}
-        for period in ('first', 'only', 'last'):
+        for period in self._periods:
             cell_data[period] = ', '.join(ngrams[label][period])
         return row.format(**cell_data)
 
-    def _render_ngram_row(self, ngram, ngram_group, row_template, labels):
-        """Returns the HTML for an n-gram row."""
-        cell_data = {'ngram': ngram}
-        label_data = {}
-        for label in labels:
-            label_data[label] = []
-        work_grouped = ngram_group.groupby(constants.WORK_FIELDNAME)
-        for work, group in work_grouped:
-            min_count = group[constants.COUNT_FIELDNAME].min()
-            max_count = group[constants.COUNT_FIELDNAME].max()
-            if min_count == max_count:
-                count = min_count
-            else:
-                count = '{}\N{EN DASH}{}'.format(min_count, max_count)
-            label_data[group[constants.LABEL_FIELDNAME].iloc[0]].append(
-                '{} ({})'.format(work, count))
-        for label, data in label_data.items():
-            label_data[label] = '; '.join(data)
-        cell_data.update(label_data)
-        html = row_template.format(**cell_data)
-        return '<tr>\n{}\n</tr>'.format(html)
-
-    def _save_results(self, output_dir, label, results, ngrams, type_label):
-        """Saves `results` filtered by `label` and `ngram` to `output_dir`.
+    def _save_results(self, output_dir, label, results, type_label):
+        """Saves `results` to `output_dir`.
 
         :param output_dir: directory to save results to
         :type output_dir: `str`
         :param label: catalogue label of results, used in saved filename
         :type label: `str`
-        :param results: results to filter and save
+        :param results: results to save
         :type results: `pandas.DataFrame`
-        :param ngrams: n-grams to save from results
-        :type ngrams: `list` of `str`
         :param type_label: name of type of results, used in saved filename
         :type type_label: `str`
 
         """
         path = os.path.join(output_dir, '{}-{}.csv'.format(label, type_label))
-        results[results[constants.NGRAM_FIELDNAME].isin(
-            ngrams)].to_csv(path, encoding='utf-8', float_format='%d',
-                            index=False)
+        results.to_csv(path, encoding='utf-8', float_format='%d', index=False)
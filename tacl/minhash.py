@@ -0,0 +1,122 @@
+"""Module containing functions to create and compare MinHash
+signatures of sets of n-grams.
+
+A signature is an array of the minimum value, over the n-grams in a
+set, of each of a fixed number of hash functions. The proportion of
+values that two signatures have in common estimates the Jaccard
+similarity of their sets of n-grams.
+
+Signatures are divided into bands for locality-sensitive hashing:
+two signatures that share the hash of any band are candidates for
+being similar, and the greater their similarity the more likely they
+are to share one.
+
+"""
+
+import hashlib
+
+import numpy as np
+
+from . import constants
+
+
+def _get_hash_parameters():
+    """Returns the multipliers and increments of the hash functions,
+    each of which maps a 64 bit n-gram hash x to the top 32 bits of
+    (multiplier * x + increment) modulo 2 ** 64.
+
+    :rtype: `tuple` of `numpy.ndarray`
+
+    """
+    random_state = np.random.RandomState(constants.MINHASH_SEED)
+    parameters = []
+    for _ in range(2):
+        high, low = random_state.randint(
+            0, 2 ** 32, size=(2, constants.MINHASH_PERMUTATIONS),
+            dtype=np.uint64)
+        parameters.append((high << np.uint64(32)) | low)
+    multipliers, increments = parameters
+    # Only odd multipliers give distinct values for distinct hashes.
+    return multipliers | np.uint64(1), increments
+
+
+_MULTIPLIERS, _INCREMENTS = _get_hash_parameters()
+# Number of n-gram hashes to process at once, bounding the memory
+# used in creating a signature.
+_CHUNK_SIZE = 4096
+
+
+def create_signature(hashes):
+    """Returns the MinHash signature of the n-grams whose 64 bit hashes
+    are `hashes`.
+
+    :param hashes: n-gram hashes
+    :type hashes: `numpy.ndarray`
+    :rtype: `numpy.ndarray`
+
+    """
+    signature = np.full(constants.MINHASH_PERMUTATIONS, np.iinfo(
+        np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(hashes), _CHUNK_SIZE):
+        chunk = hashes[start:start + _CHUNK_SIZE, np.newaxis]
+        values = (chunk * _MULTIPLIERS + _INCREMENTS) >> np.uint64(32)
+        signature = np.minimum(signature, values.min(axis=0).astype(
+            np.uint32))
+    return signature
+
+
+def estimate_jaccard(signature1, signature2):
+    """Returns the estimated Jaccard similarity of the sets of n-grams
+    with signatures `signature1` and `signature2`.
+
+    :param signature1: MinHash signature
+    :type signature1: `numpy.ndarray`
+    :param signature2: MinHash signature
+    :type signature2: `numpy.ndarray`
+    :rtype: `float`
+
+    """
+    return float(np.mean(signature1 == signature2))
+
+
+def from_bytes(data):
+    """Returns the signature serialised as `data`.
+
+    :param data: serialised signature
+    :type data: `bytes`
+    :rtype: `numpy.ndarray`
+
+    """
+    return np.frombuffer(data, dtype='<u4')
+
+
+def get_band_hashes(signature):
+    """Returns the hash of each locality-sensitive hashing band of
+    `signature`, as signed 64 bit integers suitable for storing in
+    SQLite.
+
+    :param signature: MinHash signature
+    :type signature: `numpy.ndarray`
+    :rtype: `list` of `int`
+
+    """
+    rows = constants.MINHASH_BAND_ROWS
+    data = to_bytes(signature)
+    band_size = rows * signature.itemsize
+    band_hashes = []
+    for band in range(constants.MINHASH_PERMUTATIONS // rows):
+        digest = hashlib.md5(
+            data[band * band_size:(band + 1) * band_size]).digest()
+        band_hashes.append(int.from_bytes(digest[:8], 'little', signed=True))
+    return band_hashes
+
+
+def to_bytes(signature):
+    """Returns `signature` serialised as bytes.
+
+    :param signature: MinHash signature
+    :type signature: `numpy.ndarray`
+    :rtype: `bytes`
+
+    """
+    return signature.astype('<u4').tobytes()
@@ -0,0 +1,57 @@
+"""Module containing functions to distribute work across processes."""
+
+import concurrent.futures
+import logging
+
+
+def map_tasks(function, tasks, processes=1):
+    """Returns a generator supplying the result of calling `function`
+    with each item in `tasks`, in the order of `tasks`.
+
+    If `processes` is greater than 1, the calls are distributed
+    across a pool of that many worker processes, in which case
+    `function` and each task must be picklable; otherwise the calls
+    are made serially in the current process.
+
+    :param function: function to call with each task
+    :type function: `function`
+    :param tasks: arguments to supply, one at a time, to `function`
+    :type tasks: iterable
+    :param processes: number of processes to use
+    :type processes: `int`
+    :rtype: `generator`
+
+    """
+    if processes is None or processes < 2:
+        for task in tasks:
+            yield function(task)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=processes) as executor:
+            yield from executor.map(function, tasks)
+
+
+class LoggerPickleMixin:
+
+    """Mixin for classes whose instances are passed to worker
+    processes, and which have a logger in their `_logger` attribute.
+
+    Before Python 3.7, a logger cannot be pickled (its handlers hold
+    locks), so the logger is pickled by its name, and got again by
+    that name when unpickled.
+
+    """
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        logger = state.pop('_logger', None)
+        if logger is not None:
+            state['_logger_name'] = logger.name
+        return state
+
+    def __setstate__(self, state):
+        state = state.copy()
+        logger_name = state.pop('_logger_name', None)
+        if logger_name is not None:
+            state['_logger'] = logging.getLogger(logger_name)
+        self.__dict__.update(state)
@@ -0,0 +1,163 @@
+"""Module containing functions to record timing spans of operations.
+
+Recording is disabled by default, in which case `span` returns a
+shared object that does nothing, so that instrumented code incurs
+almost no overhead.
+
+Spans are recorded only in the process in which recording was
+enabled; operations run in worker processes are not recorded.
+
+"""
+
+import json
+import os
+import threading
+import time
+
+
+_recorder = None
+
+
+class _NullSpan:
+
+    """Span that records nothing, used when recording is disabled."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+
+    """A timed operation, optionally with a count of the rows it
+    processed."""
+
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self.name = name
+        self.rows = None
+
+    def __enter__(self):
+        self._recorder.open_spans.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        self._recorder.open_spans.pop()
+        self._recorder.add(self.name, self._start, end, self.rows)
+        return False
+
+
+class Recorder:
+
+    """Records the spans of operations."""
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._events = []
+        self.open_spans = []
+
+    def add(self, name, start, end, rows=None):
+        """Records a span.
+
+        :param name: name of the operation
+        :type name: `str`
+        :param start: performance counter value at the start of the span
+        :type start: `float`
+        :param end: performance counter value at the end of the span
+        :type end: `float`
+        :param rows: number of rows processed, if known
+        :type rows: `int`
+
+        """
+        self._events.append((name, start, end, rows,
+                             threading.get_ident()))
+
+    def get_trace(self):
+        """Returns the recorded spans in the Chrome trace event format.
+
+        :rtype: `dict`
+
+        """
+        pid = os.getpid()
+        events = []
+        for name, start, end, rows, thread in self._events:
+            duration = end - start
+            args = {}
+            if rows is not None:
+                args['rows'] = rows
+                if duration > 0:
+                    args['rows_per_second'] = rows / duration
+            events.append({
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': thread,
+                'ts': (start - self._origin) * 1000000,
+                'dur': duration * 1000000, 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path):
+        """Writes the recorded spans to `path` in the Chrome trace event
+        JSON format.
+
+        :param path: path to output file
+        :type path: `str`
+
+        """
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.get_trace(), fh, indent=1)
+
+
+def disable():
+    """Stops recording spans and returns the recorder, if any.
+
+    :rtype: `Recorder`
+
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def enable():
+    """Starts recording spans, and returns the recorder.
+
+    :rtype: `Recorder`
+
+    """
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def set_rows(rows):
+    """Sets the number of rows processed by the innermost open span.
+
+    :param rows: number of rows processed
+    :type rows: `int`
+
+    """
+    if _recorder is not None and _recorder.open_spans:
+        _recorder.open_spans[-1].rows = rows
+
+
+def span(name):
+    """Returns a context manager that records the duration of the
+    code it wraps as a span named `name`.
+
+    The number of rows processed may be set on the `rows` attribute
+    of the returned object.
+
+    :param name: name of the operation
+    :type name: `str`
+
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return Span(_recorder, name)
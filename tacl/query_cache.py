@@ -0,0 +1,209 @@
+"""Module containing the QueryCache class."""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import zlib
+
+from . import constants
+from .tokenizer import Tokenizer
+
+
+class QueryCache:
+
+    """A cache of query results, stored compressed in a table of the
+    database being queried.
+
+    Results are keyed by the type of query and its arguments
+    (including the catalogue). They are invalidated by dropping the
+    cache's table whenever n-grams are added to the database (see
+    `clear`), so that results from before any change to the n-gram
+    data are never used; the key therefore does not identify the
+    state of the database.
+
+    When the total size of the cached results exceeds the maximum
+    size, the least recently used results are removed.
+
+    """
+
+    def __init__(self, conn, max_size, read_only=False):
+        """Initialise a QueryCache object.
+
+        A read-only cache only supplies results that are already
+        cached.
+
+        :param conn: database connection
+        :type conn: `sqlite3.Connection`
+        :param max_size: maximum size in bytes of the cached results
+        :type max_size: `int`
+        :param read_only: whether the database is read-only
+        :type read_only: `bool`
+
+        """
+        self._logger = logging.getLogger(__name__)
+        self._conn = conn
+        self._max_size = max_size
+        self._read_only = read_only
+
+    def add(self, key, writer):
+        """Adds the results captured by `writer` to the cache under
+        `key`, removing the least recently used results if the cache
+        becomes too large.
+
+        :param key: cache key
+        :type key: `str`
+        :param writer: writer that captured the results
+        :type writer: `CacheWriter`
+
+        """
+        if self._read_only:
+            return
+        data = writer.get_data()
+        if data is None:
+            self._logger.info('Query results are too large to cache')
+            return
+        with self._conn:
+            self._conn.execute(constants.CREATE_TABLE_QUERY_CACHE_SQL)
+            self._conn.execute(constants.INSERT_QUERY_CACHE_SQL,
+                               [key, data, len(data), time.time()])
+            self._evict()
+
+    @staticmethod
+    def clear(conn):
+        """Removes all results from the cache in the database of
+        `conn`.
+
+        This is done whether or not the cache is being used, so that
+        results cached by earlier uses of the database are not
+        supplied once its n-gram data has changed.
+
+        :param conn: database connection
+        :type conn: `sqlite3.Connection`
+
+        """
+        with conn:
+            conn.execute(constants.DROP_TABLE_QUERY_CACHE_SQL)
+
+    def _evict(self):
+        """Removes the least recently used results until the cache is no
+        larger than its maximum size."""
+        total_size = 0
+        cursor = self._conn.execute(constants.SELECT_QUERY_CACHE_SIZES_SQL)
+        for row in cursor.fetchall():
+            total_size += row['size']
+            if total_size > self._max_size:
+                self._conn.execute(constants.DELETE_QUERY_CACHE_SQL,
+                                   [row['key']])
+
+    def get(self, key, output_fh):
+        """Writes the results cached under `key` to `output_fh`, returning
+        True if there were any.
+
+        :param key: cache key
+        :type key: `str`
+        :param output_fh: file to write results to
+        :type output_fh: file object
+        :rtype: `bool`
+
+        """
+        try:
+            row = self._conn.execute(constants.SELECT_QUERY_CACHE_SQL,
+                                     [key]).fetchone()
+        except sqlite3.OperationalError as err:
+            # The cache table does not exist until results are first
+            # added.
+            self._logger.debug('Could not read query cache: {}'.format(err))
+            return False
+        if row is None:
+            return False
+        self._logger.info('Using cached query results')
+        if not self._read_only:
+            with self._conn:
+                self._conn.execute(constants.UPDATE_QUERY_CACHE_SQL,
+                                   [time.time(), key])
+        output_fh.write(zlib.decompress(row['data']).decode('utf-8'))
+        return True
+
+    @staticmethod
+    def get_key(query_type, catalogue, *args):
+        """Returns a key identifying a query.
+
+        :param query_type: name of the query
+        :type query_type: `str`
+        :param catalogue: catalogue used in the query
+        :type catalogue: `Catalogue`
+        :param args: other arguments to the query
+        :rtype: `str`
+
+        """
+        data = [query_type, sorted(catalogue.items())]
+        for arg in args:
+            if isinstance(arg, Tokenizer):
+                arg = [arg.pattern, arg.joiner]
+            elif isinstance(arg, (list, set, tuple)):
+                # The order of, and duplicates in, a list of n-grams
+                # do not affect the query.
+                arg = sorted(set(arg))
+            data.append(arg)
+        serialised = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(serialised.encode('utf-8')).hexdigest()
+
+    def get_writer(self, output_fh):
+        """Returns a file-like object that writes to `output_fh` and
+        captures what is written for adding to the cache.
+
+        :param output_fh: file to write results to
+        :type output_fh: file object
+        :rtype: `CacheWriter`
+
+        """
+        return CacheWriter(output_fh, self._max_size)
+
+
+class CacheWriter:
+
+    """File-like object that writes to another file and compresses
+    what is written, up to a maximum compressed size."""
+
+    def __init__(self, output_fh, max_size):
+        self._output_fh = output_fh
+        self._max_size = max_size
+        self._compressor = zlib.compressobj()
+        self._chunks = []
+        self._size = 0
+
+    def get_data(self):
+        """Returns the compressed data written, or None if it exceeded
+        the maximum size.
+
+        :rtype: `bytes`
+
+        """
+        if self._chunks is None:
+            return None
+        self._chunks.append(self._compressor.flush())
+        data = b''.join(self._chunks)
+        self._chunks = None
+        if len(data) > self._max_size:
+            return None
+        return data
+
+    @property
+    def target(self):
+        """The file that is written to."""
+        return self._output_fh
+
+    def write(self, text):
+        self._output_fh.write(text)
+        if self._chunks is not None:
+            chunk = self._compressor.compress(text.encode('utf-8'))
+            if chunk:
+                self._chunks.append(chunk)
+                self._size += len(chunk)
+                if self._size > self._max_size:
+                    # Stop capturing once the results are too large to
+                    # cache.
+                    self._chunks = None
+        return len(text)
@@ -5,6 +5,8 @@ from jinja2 import Environment, PackageLoader
 
 from pkg_resources import resource_filename, resource_listdir
 
+from .decorators import timed
+
 
 class Report:
 
@@ -53,6 +55,7 @@ class Report:
         env = Environment(extensions=['jinja2.ext.with_'], loader=loader)
         return env.get_template('{}.html'.format(self._report_name))
 
+    @timed
     def _write(self, context, report_dir, report_name, assets_dir=None,
                template=None):
         """Writes the data in `context` in the report's template to
@@ -79,9 +82,8 @@ class Report:
         """
         if template is None:
             template = self._get_template()
-        report = template.render(context)
         output_file = os.path.join(report_dir, report_name)
         with open(output_file, 'w', encoding='utf-8') as fh:
-            fh.write(report)
+            template.stream(context).dump(fh)
         if assets_dir:
             self._copy_static_assets(assets_dir)
@@ -6,16 +6,67 @@ import os
 import re
 import tempfile
 
+import numpy as np
 import pandas as pd
 
 from . import constants
-from .decorators import requires_columns
+from .decorators import requires_columns, timed_results
+from .parallel import map_tasks
 from .text import FilteredWitnessText, Text
 
 
 DELETE_FIELDNAME = 'delete'
 
 
+def _generate_bifurcated_extend_rows(task):
+    """Returns the rows of n-grams, up to the maximum size, of the
+    witness specified in `task` that contain any of its n-grams in the
+    results.
+
+    This is a module level function so that it may be run in a
+    worker process.
+
+    :param task: tokenizer, corpus, work, siglum, label, the witness'
+                 matches, and the maximum n-gram size
+    :type task: `tuple`
+    :rtype: `list` of `list`
+
+    """
+    tokenizer, corpus, work, siglum, label, matches, max_size = task
+    min_size = matches[constants.SIZE_FIELDNAME].min()
+    filter_ngrams = Results(matches, tokenizer)._generate_filter_ngrams(
+        matches, min_size)
+    witness = corpus.get_witness(work, siglum, FilteredWitnessText)
+    rows = []
+    for size, ngrams in witness.get_ngrams(min_size, max_size,
+                                           filter_ngrams):
+        rows.extend([ngram, size, work, siglum, count, label] for
+                    ngram, count in ngrams.items())
+    return rows
+
+
+def _extend_witness(task):
+    """Returns the extended results for the witness specified in
+    `task`.
+
+    This is a module level function so that it may be run in a
+    worker process.
+
+    :param task: tokenizer, corpus, work, siglum, label, the
+                 witness' matches of the highest n-gram size, and that
+                 size
+    :type task: `tuple`
+    :rtype: `pandas.DataFrame`
+
+    """
+    tokenizer, corpus, work, siglum, label, matches, highest_n = task
+    results = Results(matches, tokenizer)
+    extended_ngrams = results._generate_extended_ngrams(
+        matches, work, siglum, label, corpus, highest_n)
+    return results._generate_extended_matches(
+        extended_ngrams, highest_n, work, siglum, label)
+
+
 class Results:
 
     """Class representing a set of n-gram results.
@@ -53,6 +104,7 @@ class Results:
         if self._matches.empty:
             self._logger.info('Supplied results file is empty')
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.COUNT_FIELDNAME, constants.LABEL_FIELDNAME])
     def add_label_count(self):
@@ -63,26 +115,13 @@ class Results:
 
         """
         self._logger.info('Adding label count')
-
-        def add_label_count(df):
-            # For each n-gram and label pair, we need the maximum count
-            # among all witnesses to each work, and then the sum of those
-            # across all works.
-            work_maxima = df.groupby(constants.WORK_FIELDNAME,
-                                     sort=False).max()
-            df.loc[:, constants.LABEL_COUNT_FIELDNAME] = work_maxima[
-                constants.COUNT_FIELDNAME].sum()
-            return df
-
-        if self._matches.empty:
-            self._matches[constants.LABEL_COUNT_FIELDNAME] = 0
-        else:
-            self._matches.loc[:, constants.LABEL_COUNT_FIELDNAME] = 0
-            self._matches = self._matches.groupby(
-                [constants.LABEL_FIELDNAME, constants.NGRAM_FIELDNAME],
-                sort=False).apply(add_label_count)
+        # For each n-gram and label pair, we need the maximum count
+        # among all witnesses to each work, and then the sum of those
+        # across all works.
+        self._add_label_work_sum(constants.LABEL_COUNT_FIELDNAME, 'max')
         self._logger.info('Finished adding label count')
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.COUNT_FIELDNAME, constants.LABEL_FIELDNAME])
     def add_label_work_count(self):
@@ -98,87 +137,59 @@ class Results:
 
         """
         self._logger.info('Adding label work count')
-
-        def add_label_text_count(df):
-            work_maxima = df.groupby(constants.WORK_FIELDNAME,
-                                     sort=False).any()
-            df.loc[:, constants.LABEL_WORK_COUNT_FIELDNAME] = work_maxima[
-                constants.COUNT_FIELDNAME].sum()
-            return df
-
-        if self._matches.empty:
-            self._matches[constants.LABEL_WORK_COUNT_FIELDNAME] = 0
-        else:
-            self._matches.loc[:, constants.LABEL_WORK_COUNT_FIELDNAME] = 0
-            self._matches = self._matches.groupby(
-                [constants.LABEL_FIELDNAME, constants.NGRAM_FIELDNAME],
-                sort=False).apply(add_label_text_count)
+        self._add_label_work_sum(constants.LABEL_WORK_COUNT_FIELDNAME, 'any')
         self._logger.info('Finished adding label work count')
 
-    def _annotate_bifurcated_extend_data(self, row, smaller, larger, tokenize,
-                                         join):
-        """Returns `row` annotated with whether it should be deleted or not.
-
-        An n-gram is marked for deletion if:
-
-        * its label count is 1 and its constituent (n-1)-grams also
-          have a label count of 1; or
+    def _add_label_work_sum(self, fieldname, aggregate):
+        """Adds to each result row, in a column named `fieldname`, the sum
+        across all works within the label of `aggregate` applied to
+        the counts of that n-gram in each work's witnesses.
 
-        * there is a containing (n+1)-gram that has the same label
-          count.
-
-        :param row: row of witness n-grams to annotate
-        :type row: `pandas.Series`
-        :param smaller: rows of (n-1)-grams for this witness
-        :type smaller: `pandas.DataFrame`
-        :param larger: rows of (n+1)-grams for this witness
-        :type larger: `pandas.DataFrame`
-        :param tokenize: function to tokenize an n-gram
-        :param join: function to join tokens
-        :rtype: `pandas.Series`
+        :param fieldname: name of the column to add
+        :type fieldname: `str`
+        :param aggregate: name of the function to aggregate the counts
+                          of a work's witnesses with
+        :type aggregate: `str`
 
         """
-        lcf = constants.LABEL_COUNT_FIELDNAME
-        nf = constants.NGRAM_FIELDNAME
-        ngram = row[constants.NGRAM_FIELDNAME]
-        label_count = row[constants.LABEL_COUNT_FIELDNAME]
-        if label_count == 1 and not smaller.empty:
-            # Keep a result with a label count of 1 if its
-            # constituents do not also have a count of 1.
-            ngram_tokens = tokenize(ngram)
-            sub_ngram1 = join(ngram_tokens[:-1])
-            sub_ngram2 = join(ngram_tokens[1:])
-            pattern = FilteredWitnessText.get_filter_ngrams_pattern(
-                [sub_ngram1, sub_ngram2])
-            if smaller[smaller[constants.NGRAM_FIELDNAME].str.match(pattern)][
-                    constants.LABEL_COUNT_FIELDNAME].max() == 1:
-                row[DELETE_FIELDNAME] = True
-        elif not larger.empty and larger[larger[nf].str.contains(
-                ngram, regex=False)][lcf].max() == label_count:
-            # Remove a result if the label count of a containing
-            # n-gram is equal to its label count.
-            row[DELETE_FIELDNAME] = True
-        return row
-
+        if self._matches.empty:
+            self._matches[fieldname] = 0
+            return
+        keys = [constants.LABEL_FIELDNAME, constants.NGRAM_FIELDNAME]
+        work_values = self._matches.groupby(
+            keys + [constants.WORK_FIELDNAME], sort=False)[
+                constants.COUNT_FIELDNAME].agg(aggregate)
+        label_sums = work_values.groupby(level=keys, sort=False).sum()
+        label_sums.name = fieldname
+        if fieldname in self._matches.columns:
+            del self._matches[fieldname]
+        self._matches = self._matches.join(label_sums.astype(int), on=keys)
+
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.LABEL_FIELDNAME])
-    def bifurcated_extend(self, corpus, max_size):
+    def bifurcated_extend(self, corpus, max_size, processes=1):
         """Replaces the results with those n-grams that contain any of the
         original n-grams, and that represent points at which an n-gram
         is a constituent of multiple larger n-grams with a lower label
         count.
 
+        The n-grams of each witness are generated in parallel if more
+        than one process is specified.
+
         :param corpus: corpus of works to which results belong
         :type corpus: `Corpus`
         :param max_size: maximum size of n-gram results to include
         :type max_size: `int`
+        :param processes: number of processes to use
+        :type processes: `int`
 
         """
         temp_fd, temp_path = tempfile.mkstemp(text=True)
         try:
             self._prepare_bifurcated_extend_data(corpus, max_size, temp_path,
-                                                 temp_fd)
+                                                 temp_fd, processes)
         finally:
             try:
                 os.remove(temp_path)
@@ -189,34 +200,76 @@ class Results:
         self._bifurcated_extend()
 
     def _bifurcated_extend(self):
+        """Removes those results rows that are not bifurcation points.
+
+        A row is removed if:
+
+        * its label count is 1, its witness has (n-1)-grams, and its
+          constituent (n-1)-grams have a label count of 1; or
+
+        * otherwise, a containing (n+1)-gram in its witness has the
+          same label count.
+
+        The constituent (n-1)-grams of an n-gram are its first and
+        last n-1 tokens, and an n-gram is contained in those
+        (n+1)-grams of which it is a constituent, so both relations
+        are found by joining on constituents rather than by searching
+        the n-grams of each witness.
+
+        """
         if self._matches.empty:
             return
-        self._matches.loc[:, DELETE_FIELDNAME] = False
+        lcf = constants.LABEL_COUNT_FIELDNAME
+        nf = constants.NGRAM_FIELDNAME
+        sf = constants.SIZE_FIELDNAME
+        witness_cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME]
+        group_cols = witness_cols + [sf]
+        key_cols = group_cols + [nf]
+        matches = self._matches
         tokenize = self._tokenizer.tokenize
         join = self._tokenizer.joiner.join
-        new_results = []
-        group_cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
-                      constants.SIZE_FIELDNAME]
-        grouped = self._matches.groupby(group_cols, sort=False)
-        for (work, siglum, size), group in grouped:
-            try:
-                smaller_grams = grouped.get_group((work, siglum, size-1))
-            except KeyError:
-                smaller_grams = pd.DataFrame()
-            try:
-                larger_grams = grouped.get_group((work, siglum, size+1))
-            except KeyError:
-                larger_grams = pd.DataFrame()
-            group = group.apply(self._annotate_bifurcated_extend_data, axis=1,
-                                args=(smaller_grams, larger_grams, tokenize,
-                                      join))
-            new_results.append(group[~group['delete']])
-        all_cols = list(constants.QUERY_FIELDNAMES[:]) + \
-            [constants.LABEL_COUNT_FIELDNAME, DELETE_FIELDNAME]
-        self._matches = pd.concat(new_results, ignore_index=True,
-                                  sort=False).reindex(columns=all_cols)
-        del self._matches[DELETE_FIELDNAME]
-
+        tokens = [tokenize(ngram) for ngram in matches[nf]]
+        keys = matches[key_cols + [lcf]].assign(
+            prefix=[join(ngram_tokens[:-1]) for ngram_tokens in tokens],
+            suffix=[join(ngram_tokens[1:]) for ngram_tokens in tokens])
+        label_counts = keys.groupby(key_cols, sort=False)[lcf].max()
+        # Label counts of each row's constituent (n-1)-grams.
+        smaller_keys = keys[witness_cols].assign(**{sf: keys[sf] - 1})
+        constituent_counts = [
+            label_counts.reindex(pd.MultiIndex.from_arrays(
+                [smaller_keys[col].values for col in group_cols] +
+                [keys[constituent].values])).values
+            for constituent in ('prefix', 'suffix')]
+        constituent_max = np.fmax(*constituent_counts)
+        witness_sizes = keys[group_cols].drop_duplicates()
+        has_smaller = pd.MultiIndex.from_arrays(
+            [smaller_keys[col].values for col in group_cols]).isin(
+                pd.MultiIndex.from_arrays(
+                    [witness_sizes[col].values for col in group_cols]))
+        # Highest label count of the (n+1)-grams containing each row's
+        # n-gram.
+        containing = pd.concat([
+            keys[group_cols + [constituent, lcf]].rename(
+                columns={constituent: nf}) for constituent in
+            ('prefix', 'suffix')], ignore_index=True)
+        containing[sf] -= 1
+        containing_max = containing.groupby(key_cols, sort=False)[
+            lcf].max().reindex(pd.MultiIndex.from_arrays(
+                [keys[col].values for col in key_cols])).values
+        label_count = matches[lcf].values
+        is_single = (label_count == 1) & has_smaller
+        delete = np.where(is_single, constituent_max == 1,
+                          containing_max == label_count)
+        # Keep the rows of each witness and size together, in the
+        # order in which those groups first occur.
+        group_order_col = 'group order'
+        group_order = matches.groupby(group_cols, sort=False).ngroup()
+        kept = matches[~delete].assign(**{group_order_col: group_order[
+            ~delete]}).sort_values(by=[group_order_col], kind='mergesort')
+        all_cols = list(constants.QUERY_FIELDNAMES[:]) + [lcf]
+        self._matches = kept.reset_index(drop=True).reindex(columns=all_cols)
+
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.SIGLUM_FIELDNAME, constants.COUNT_FIELDNAME])
     def collapse_witnesses(self):
@@ -229,42 +282,37 @@ class Results:
         methods on results that have had their witnesses collapsed.
 
         """
-        # In order to allow for additional columns to be present in
-        # the input data (such as label count), copy the siglum
-        # information into a new final column, then put the sigla
-        # information into the siglum field and finally rename it.
-        #
-        # This means that in merge_sigla below, the column names are
-        # reversed from what would be expected.
         if self._matches.empty:
             self._matches.rename(columns={constants.SIGLUM_FIELDNAME:
                                           constants.SIGLA_FIELDNAME},
                                  inplace=True)
             return
-        self._matches.loc[:, constants.SIGLA_FIELDNAME] = \
-            self._matches[constants.SIGLUM_FIELDNAME]
         # This code makes the not unwarranted assumption that the same
         # n-gram means the same size and that the same work means the
         # same label.
-        grouped = self._matches.groupby(
-            [constants.WORK_FIELDNAME, constants.NGRAM_FIELDNAME,
-             constants.COUNT_FIELDNAME], sort=False)
-
-        def merge_sigla(df):
-            # Take the first result row; only the siglum should differ
-            # between them, and there may only be one row.
-            merged = df[0:1]
-            sigla = list(df[constants.SIGLA_FIELDNAME])
-            sigla.sort()
-            merged[constants.SIGLUM_FIELDNAME] = ', '.join(sigla)
-            return merged
-
-        self._matches = grouped.apply(merge_sigla)
-        del self._matches[constants.SIGLA_FIELDNAME]
-        self._matches.rename(columns={constants.SIGLUM_FIELDNAME:
-                                      constants.SIGLA_FIELDNAME},
-                             inplace=True)
+        group_cols = [constants.WORK_FIELDNAME, constants.NGRAM_FIELDNAME,
+                      constants.COUNT_FIELDNAME]
+        # Sorting by siglum first means that each group's sigla are
+        # joined in order.
+        sigla = self._join_groups(self._matches.sort_values(
+            by=constants.SIGLUM_FIELDNAME, kind='mergesort'), group_cols,
+            constants.SIGLUM_FIELDNAME)
+        sigla.name = constants.SIGLA_FIELDNAME
+        # Take the first result row of each group; only the siglum
+        # should differ between them, and there may only be one row.
+        # In order to allow for additional columns to be present in
+        # the input data (such as label count), the sigla replace the
+        # siglum column's values in place.
+        matches = self._matches.drop_duplicates(group_cols).join(
+            sigla, on=group_cols)
+        matches[constants.SIGLUM_FIELDNAME] = matches[
+            constants.SIGLA_FIELDNAME]
+        del matches[constants.SIGLA_FIELDNAME]
+        matches.rename(columns={constants.SIGLUM_FIELDNAME:
+                                constants.SIGLA_FIELDNAME}, inplace=True)
+        self._matches = matches
 
+    @timed_results
     def csv(self, fh):
         """Writes the results data to `fh` in CSV format and returns `fh`.
 
@@ -277,6 +325,7 @@ class Results:
                              index=False)
         return fh
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME])
     def excise(self, ngram):
         """Removes all rows whose n-gram contains `ngram`.
@@ -296,17 +345,28 @@ class Results:
         self._matches = self._matches[~self._matches[
             constants.NGRAM_FIELDNAME].str.contains(ngram, regex=False)]
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.LABEL_FIELDNAME])
-    def extend(self, corpus):
+    def extend(self, corpus, processes=1, spill=False):
         """Adds rows for all longer forms of n-grams in the results that are
         present in the witnesses.
 
         This works with both diff and intersect results.
 
+        Witnesses are extended in parallel if more than one process
+        is specified. If `spill` is True, each witness' extended
+        results are written to a temporary file as they are
+        generated, rather than being held in memory until all of them
+        are.
+
         :param corpus: corpus of works to which results belong
         :type corpus: `Corpus`
+        :param processes: number of processes to use
+        :type processes: `int`
+        :param spill: whether to hold extended results on disk
+        :type spill: `bool`
 
         """
         self._logger.info('Extending results')
@@ -330,23 +390,28 @@ class Results:
         # n-grams.
         matches = self._matches[
             self._matches[constants.SIZE_FIELDNAME] == highest_n]
-        extended_matches = pd.DataFrame(columns=constants.QUERY_FIELDNAMES)
         cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                 constants.LABEL_FIELDNAME]
-        for index, (work, siglum, label) in \
-                matches[cols].drop_duplicates().iterrows():
-            extended_ngrams = self._generate_extended_ngrams(
-                matches, work, siglum, label, corpus, highest_n)
+        tasks = ((self._tokenizer, corpus, work, siglum, label,
+                  witness_matches, highest_n)
+                 for (work, siglum, label), witness_matches in
+                 matches.groupby(cols, sort=False))
+        extended = map_tasks(_extend_witness, tasks, processes)
+        if spill:
+            extended_matches = self._spill_extended_matches(extended)
+        else:
+            extended_matches = [witness_matches.reindex(
+                columns=constants.QUERY_FIELDNAMES)
+                                for witness_matches in extended
+                                if not witness_matches.empty]
             extended_matches = pd.concat(
-                [extended_matches, self._generate_extended_matches(
-                    extended_ngrams, highest_n, work, siglum, label)],
-                sort=False)
-            extended_ngrams = None
+                [pd.DataFrame(columns=constants.QUERY_FIELDNAMES)] +
+                extended_matches, ignore_index=True, sort=False)
         if is_intersect:
             extended_matches = self._reciprocal_remove(extended_matches)
-        self._matches = self._matches.append(
-            extended_matches, ignore_index=True).reindex(
-                columns=constants.QUERY_FIELDNAMES)
+        self._matches = pd.concat(
+            [self._matches, extended_matches], ignore_index=True,
+            sort=False).reindex(columns=constants.QUERY_FIELDNAMES)
 
     def _generate_extended_matches(self, extended_ngrams, highest_n, work,
                                    siglum, label):
@@ -545,6 +610,7 @@ class Results:
         """
         return self._matches
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.SIGLUM_FIELDNAME, constants.COUNT_FIELDNAME,
                        constants.LABEL_FIELDNAME])
@@ -569,43 +635,37 @@ class Results:
                     constants.WORK_COUNTS_FIELDNAME])
             return
         label_order_col = 'label order'
-
-        def work_summary(group):
-            match = group.iloc[0]
-            work = match[constants.WORK_FIELDNAME]
-            minimum = group[constants.COUNT_FIELDNAME].min()
-            maximum = group[constants.COUNT_FIELDNAME].max()
-            if minimum == maximum:
-                work_count = '{}({})'.format(work, minimum)
-            else:
-                work_count = '{}({}-{})'.format(work, minimum, maximum)
-            match['work count'] = work_count
-            return match
-
-        def ngram_label_summary(group):
-            match = group.iloc[0]
-            summary = group.groupby(constants.WORK_FIELDNAME).apply(
-                work_summary)
-            work_counts = ', '.join(list(summary['work count']))
-            match[constants.WORK_COUNTS_FIELDNAME] = work_counts
-            return match
-
-        def add_label_order(row, labels):
-            row[label_order_col] = labels.index(row[constants.LABEL_FIELDNAME])
-            return row
-
         group_cols = [constants.NGRAM_FIELDNAME, constants.LABEL_FIELDNAME]
-        matches = self._matches.groupby(group_cols, sort=False).apply(
-            ngram_label_summary)
+        # Summarise the range of counts across each work's witnesses,
+        # with the works of each n-gram and label in sorted order.
+        work_ranges = self._matches.groupby(
+            group_cols + [constants.WORK_FIELDNAME])[
+                constants.COUNT_FIELDNAME].agg(['min', 'max']).reset_index()
+        works = work_ranges[constants.WORK_FIELDNAME].astype(str)
+        minima = work_ranges['min'].astype(str)
+        maxima = work_ranges['max'].astype(str)
+        work_ranges[constants.WORK_COUNTS_FIELDNAME] = np.where(
+            work_ranges['min'] == work_ranges['max'],
+            works + '(' + minima + ')',
+            works + '(' + minima + '-' + maxima + ')')
+        work_counts = self._join_groups(work_ranges, group_cols,
+                                        constants.WORK_COUNTS_FIELDNAME)
+        # Take the first result row of each n-gram and label for the
+        # values of the remaining columns.
+        matches = self._matches.drop_duplicates(group_cols).join(
+            work_counts, on=group_cols)
         del matches[constants.WORK_FIELDNAME]
         del matches[constants.SIGLUM_FIELDNAME]
         del matches[constants.COUNT_FIELDNAME]
-        matches = matches.apply(add_label_order, axis=1, args=(labels,))
+        matches[label_order_col] = pd.Categorical(
+            matches[constants.LABEL_FIELDNAME], categories=labels,
+            ordered=True)
         matches.sort_values(by=[constants.NGRAM_FIELDNAME, label_order_col],
                             ascending=True, inplace=True)
         del matches[label_order_col]
         self._matches = matches
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.COUNT_FIELDNAME])
@@ -625,26 +685,65 @@ class Results:
                              constants.TOTAL_COUNT_FIELDNAME])
             return
 
-        def witness_summary(group):
-            matches = group.sort_values(by=[constants.NGRAM_FIELDNAME],
-                                        ascending=[True])
-            match = matches.iloc[0]
-            ngrams = ', '.join(list(matches[constants.NGRAM_FIELDNAME]))
-            match[constants.NGRAMS_FIELDNAME] = ngrams
-            match[constants.NUMBER_FIELDNAME] = len(matches)
-            match[constants.TOTAL_COUNT_FIELDNAME] = matches[
-                constants.COUNT_FIELDNAME].sum()
-            return match
-
         group_cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME]
+        witness_order_col = 'witness order'
         # Remove zero-count results.
-        self._matches = self._matches[
-            self._matches[constants.COUNT_FIELDNAME] != 0]
-        self._matches = self._matches.groupby(group_cols, sort=False).apply(
-            witness_summary)
-        del self._matches[constants.NGRAM_FIELDNAME]
-        del self._matches[constants.SIZE_FIELDNAME]
-        del self._matches[constants.COUNT_FIELDNAME]
+        matches = self._matches[self._matches[constants.COUNT_FIELDNAME] != 0]
+        # Number the witnesses in the order in which they first occur,
+        # and sort by n-gram, so that each witness' first row is that
+        # of its first n-gram.
+        matches = matches.assign(**{witness_order_col: matches.groupby(
+            group_cols, sort=False).ngroup()}).sort_values(
+                by=[constants.NGRAM_FIELDNAME], kind='mergesort')
+        grouped = matches.groupby(group_cols, sort=False)
+        summary = pd.DataFrame({
+            constants.NGRAMS_FIELDNAME: self._join_groups(
+                matches, group_cols, constants.NGRAM_FIELDNAME),
+            constants.NUMBER_FIELDNAME: grouped.size(),
+            constants.TOTAL_COUNT_FIELDNAME: grouped[
+                constants.COUNT_FIELDNAME].sum()}, columns=[
+                    constants.NGRAMS_FIELDNAME, constants.NUMBER_FIELDNAME,
+                    constants.TOTAL_COUNT_FIELDNAME])
+        matches = matches.drop_duplicates(group_cols).join(
+            summary, on=group_cols)
+        matches.sort_values(by=[witness_order_col], inplace=True)
+        del matches[witness_order_col]
+        del matches[constants.NGRAM_FIELDNAME]
+        del matches[constants.SIZE_FIELDNAME]
+        del matches[constants.COUNT_FIELDNAME]
+        self._matches = matches
+
+    @staticmethod
+    def _join_groups(matches, group_cols, column):
+        """Returns a `pandas.Series`, indexed by `group_cols`, of the
+        values of `column` in each group of `matches` joined into a
+        comma separated string, in the order in which they occur.
+
+        This avoids pandas creating a Series for each group, as it
+        does when aggregating with a Python function.
+
+        :param matches: results to group
+        :type matches: `pandas.DataFrame`
+        :param group_cols: names of columns to group by
+        :type group_cols: `list` of `str`
+        :param column: name of column to join the values of
+        :type column: `str`
+        :rtype: `pandas.Series`
+
+        """
+        codes = matches.groupby(group_cols, sort=False).ngroup().values
+        order = np.argsort(codes, kind='mergesort')
+        codes = codes[order]
+        values = matches[column].values[order]
+        starts = np.flatnonzero(np.diff(codes)) + 1
+        if len(codes):
+            starts = np.insert(starts, 0, 0)
+        ends = np.append(starts[1:], len(codes))
+        keys = matches.drop_duplicates(group_cols)
+        index = pd.MultiIndex.from_arrays(
+            [keys[col].values for col in group_cols], names=group_cols)
+        return pd.Series([', '.join(values[start:end]) for start, end
+                          in zip(starts, ends)], index=index, name=column)
 
     @staticmethod
     def _is_intersect_results(results):
@@ -664,7 +763,7 @@ class Results:
             (results[constants.LABEL_FIELDNAME] != label)].empty)
 
     def _prepare_bifurcated_extend_data(self, corpus, max_size, temp_path,
-                                        temp_fd):
+                                        temp_fd, processes=1):
         # It might be wondered why this whole derivation of n-grams
         # anew from the source text is required, when an extended set
         # of results could just be passed through to the final
@@ -678,6 +777,10 @@ class Results:
                                   ascending=True, inplace=True)
         group_cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                       constants.LABEL_FIELDNAME]
+        tasks = ((self._tokenizer, corpus, work, siglum, label, group,
+                  max_size)
+                 for (work, siglum, label), group in self._matches.groupby(
+                     group_cols, sort=False))
         # Output a CSV file containing the possible n-grams to include
         # in the final output.
         self._logger.debug('Writing filtered n-grams to temporary CSV file '
@@ -685,20 +788,14 @@ class Results:
         with open(temp_fd, 'w', encoding='utf-8', newline='') as fh:
             writer = csv.writer(fh)
             writer.writerow(constants.QUERY_FIELDNAMES)
-            for (text, siglum, label), group in self._matches.groupby(
-                    group_cols, sort=False):
-                min_size = group[constants.SIZE_FIELDNAME].min()
-                filter_ngrams = self._generate_filter_ngrams(group, min_size)
-                witness = corpus.get_witness(text, siglum, FilteredWitnessText)
-                for size, ngrams in witness.get_ngrams(min_size, max_size,
-                                                       filter_ngrams):
-                    rows = [[ngram, size, text, siglum, count, label] for
-                            ngram, count in ngrams.items()]
-                    writer.writerows(rows)
+            for rows in map_tasks(_generate_bifurcated_extend_rows, tasks,
+                                  processes):
+                writer.writerows(rows)
         self._matches = pd.read_csv(temp_path, encoding='utf-8',
                                     na_filter=False)
         self.add_label_count()
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME])
     def prune_by_ngram(self, ngrams):
         """Removes results rows whose n-gram is in `ngrams`.
@@ -711,6 +808,7 @@ class Results:
         self._matches = self._matches[
             ~self._matches[constants.NGRAM_FIELDNAME].isin(ngrams)]
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.COUNT_FIELDNAME])
     def prune_by_ngram_count(self, minimum=None, maximum=None, label=None):
@@ -733,39 +831,24 @@ class Results:
 
         """
         self._logger.info('Pruning results by n-gram count')
-
-        def calculate_total(group):
-            work_grouped = group.groupby(constants.WORK_FIELDNAME, sort=False)
-            total_count = work_grouped[constants.COUNT_FIELDNAME].max().sum()
-            group['total_count'] = pd.Series([total_count] * len(group.index),
-                                             index=group.index)
-            return group
-
-        # self._matches may be empty, in which case not only is there
-        # no point trying to do the pruning, but it will raise an
-        # exception due to referencing the column 'total_count' which
-        # won't have been added. Therefore just return immediately.
         if self._matches.empty:
             return
         matches = self._matches
         if label is not None:
             matches = matches[matches[constants.LABEL_FIELDNAME] == label]
-        matches = matches.groupby(
-            constants.NGRAM_FIELDNAME, sort=False).apply(calculate_total)
-        ngrams = None
+        totals = matches.groupby(
+            [constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME],
+            sort=False)[constants.COUNT_FIELDNAME].max().groupby(
+                level=constants.NGRAM_FIELDNAME, sort=False).sum()
+        keep = pd.Series(True, index=totals.index)
         if minimum:
-            ngrams = matches[matches['total_count'] >= minimum][
-                constants.NGRAM_FIELDNAME].unique()
+            keep &= totals >= minimum
         if maximum:
-            max_ngrams = matches[matches['total_count'] <= maximum][
-                constants.NGRAM_FIELDNAME].unique()
-            if ngrams is None:
-                ngrams = max_ngrams
-            else:
-                ngrams = list(set(ngrams) & set(max_ngrams))
+            keep &= totals <= maximum
         self._matches = self._matches[
-            self._matches[constants.NGRAM_FIELDNAME].isin(ngrams)]
+            self._matches[constants.NGRAM_FIELDNAME].isin(totals.index[keep])]
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.COUNT_FIELDNAME])
     def prune_by_ngram_count_per_work(self, minimum=None, maximum=None,
                                       label=None):
@@ -809,6 +892,7 @@ class Results:
         self._matches = self._matches[self._matches[
             constants.NGRAM_FIELDNAME].isin(keep_ngrams)]
 
+    @timed_results
     @requires_columns([constants.SIZE_FIELDNAME])
     def prune_by_ngram_size(self, minimum=None, maximum=None):
         """Removes results rows whose n-gram size is outside the
@@ -828,6 +912,7 @@ class Results:
             self._matches = self._matches[
                 self._matches[constants.SIZE_FIELDNAME] <= maximum]
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.WORK_FIELDNAME,
                        constants.COUNT_FIELDNAME])
     def prune_by_work_count(self, minimum=None, maximum=None, label=None):
@@ -869,6 +954,7 @@ class Results:
                                  right_index=True)
         del self._matches[count_fieldname]
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.COUNT_FIELDNAME,
                        constants.LABEL_FIELDNAME])
     def reciprocal_remove(self):
@@ -885,6 +971,7 @@ class Results:
         return grouped.filter(
             lambda x: x[constants.LABEL_FIELDNAME].nunique() == number_labels)
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.COUNT_FIELDNAME, constants.LABEL_FIELDNAME])
@@ -951,6 +1038,7 @@ class Results:
             else:
                 substring_data['count'] -= count
 
+    @timed_results
     @requires_columns([constants.WORK_FIELDNAME, constants.LABEL_FIELDNAME])
     def relabel(self, catalogue):
         """Relabels results rows according to `catalogue`.
@@ -963,10 +1051,11 @@ class Results:
         :type catalogue: `Catalogue`
 
         """
-        for work, label in catalogue.items():
-            self._matches.loc[self._matches[constants.WORK_FIELDNAME] == work,
-                              constants.LABEL_FIELDNAME] = label
+        labels = self._matches[constants.WORK_FIELDNAME].map(dict(catalogue))
+        self._matches[constants.LABEL_FIELDNAME] = labels.where(
+            labels.notnull(), self._matches[constants.LABEL_FIELDNAME])
 
+    @timed_results
     @requires_columns([constants.LABEL_FIELDNAME])
     def remove_label(self, label):
         """Removes all results rows associated with `label`.
@@ -976,12 +1065,17 @@ class Results:
 
         """
         self._logger.info('Removing label "{}"'.format(label))
-        count = self._matches[constants.LABEL_FIELDNAME].value_counts().get(
-            label, 0)
-        self._matches = self._matches[
-            self._matches[constants.LABEL_FIELDNAME] != label]
+        # Encode the labels once, and compare the integer codes,
+        # rather than comparing every row's label string.
+        codes, labels = pd.factorize(self._matches[constants.LABEL_FIELDNAME])
+        count = 0
+        if label in labels:
+            removed = codes == labels.get_loc(label)
+            count = removed.sum()
+            self._matches = self._matches[~removed]
         self._logger.info('Removed {} labelled results'.format(count))
 
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.COUNT_FIELDNAME, constants.LABEL_FIELDNAME])
@@ -998,6 +1092,45 @@ class Results:
                 constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME],
             ascending=[False, True, False, True, True, True], inplace=True)
 
+    def _spill_extended_matches(self, extended):
+        """Returns the extended results in `extended` combined into a
+        single `pandas.DataFrame`, having first written each to a
+        temporary file.
+
+        :param extended: extended results of each witness
+        :type extended: iterable of `pandas.DataFrame`
+        :rtype: `pandas.DataFrame`
+
+        """
+        temp_fd, temp_path = tempfile.mkstemp(text=True)
+        try:
+            with open(temp_fd, 'w', encoding='utf-8', newline='') as fh:
+                header = True
+                for witness_matches in extended:
+                    if witness_matches.empty:
+                        continue
+                    witness_matches.to_csv(
+                        fh, columns=constants.QUERY_FIELDNAMES,
+                        encoding='utf-8', header=header, index=False)
+                    header = False
+            if header:
+                return pd.DataFrame(columns=constants.QUERY_FIELDNAMES)
+            # Read the textual fields back as strings, so that
+            # n-grams, works and sigla that look like numbers are kept
+            # as they were written.
+            dtypes = {constants.NGRAM_FIELDNAME: str,
+                      constants.WORK_FIELDNAME: str,
+                      constants.SIGLUM_FIELDNAME: str}
+            return pd.read_csv(temp_path, encoding='utf-8', dtype=dtypes,
+                               na_filter=False)
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError as e:
+                self._logger.error('Failed to remove temporary file '
+                                   'containing extended results: {}'.format(e))
+
+    @timed_results
     @requires_columns([constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME,
                        constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
                        constants.LABEL_FIELDNAME])
@@ -1,4 +1,5 @@
-"""Module containing the Sequence and SequenceReport classes."""
+"""Module containing the Sequence, SeededAligner and SequenceReport
+classes."""
 
 import logging
 import os
@@ -8,10 +9,68 @@ from Bio import pairwise2
 import pandas as pd
 
 from . import constants
+from .decorators import timed
+from .parallel import LoggerPickleMixin, map_tasks
 from .report import Report
 from .text import Text
 
 
+NEGATIVE_INFINITY = float('-inf')
+
+
+def _get_best_state(scores):
+    """Returns the index of the highest of `scores`."""
+    return max(range(len(scores)), key=scores.__getitem__)
+
+
+class CoveredSpans:
+
+    """Class to record the spans of a text that are covered by aligned
+    sequences, and to test whether a span falls within any one of
+    them.
+
+    A span falls within a covered span if the greatest end index of
+    the covered spans starting at or before its start is at or after
+    its end. Those greatest end indices are kept in a Fenwick (binary
+    indexed) tree over the start indices of the text, so that both
+    adding and testing a span take time logarithmic in the length of
+    the text.
+
+    """
+
+    def __init__(self, length):
+        """Initialise a CoveredSpans object.
+
+        :param length: length of the text
+        :type length: `int`
+
+        """
+        # The tree is indexed from 1, by start index plus 1, and
+        # allows for spans starting at the end of the text.
+        self._tree = [-1] * (length + 2)
+
+    def __contains__(self, span):
+        index = span[0] + 1
+        max_end = -1
+        while index > 0:
+            max_end = max(max_end, self._tree[index])
+            index -= index & -index
+        return max_end >= span[1]
+
+    def add(self, span):
+        """Adds `span` to the covered spans.
+
+        :param span: start and end indices of a span
+        :type span: 2-`tuple` of `int`
+
+        """
+        index = span[0] + 1
+        while index < len(self._tree):
+            if self._tree[index] < span[1]:
+                self._tree[index] = span[1]
+            index += index & -index
+
+
 class Sequence:
 
     """Class to format supplied sequences using simple HTML span markup."""
@@ -53,18 +112,274 @@ class Sequence:
         return self._start_index
 
 
-class SequenceReport (Report):
+class BandedExtension:
+
+    """Class to align two sequences from their start, restricted to a
+    band of diagonals around the main diagonal.
+
+    The alignment is global (gaps at either end are penalised, as
+    with `Bio.pairwise2.align.globalms`), using the affine gap scoring
+    defined in `constants`. The dynamic programming matrix is retained
+    between calls to `align`, so that aligning longer prefixes of the
+    sequences only requires computing the cells not already computed.
+
+    """
+
+    def __init__(self, s1, s2, band_width):
+        self._s1 = s1
+        self._s2 = s2
+        self._band_width = band_width
+        # Each cell holds the best score of an alignment ending in a
+        # match, a gap in s2 and a gap in s1 respectively, followed
+        # by the state of the previous cell along each of those
+        # alignments.
+        self._cells = {(0, 0): (0, NEGATIVE_INFINITY, NEGATIVE_INFINITY,
+                                None, None, None)}
+        self._extent = (0, 0)
+
+    def align(self, length1, length2):
+        """Returns the best alignment of the first `length1` characters
+        of the first sequence with the first `length2` characters of
+        the second sequence, and its score.
+
+        :param length1: length of first sequence to align
+        :type length1: `int`
+        :param length2: length of second sequence to align
+        :type length2: `int`
+        :rtype: 3-`tuple` of `str`, `str`, `float`
+
+        """
+        self._fill(length1, length2)
+        cells = self._cells
+        open_gap = constants.OPEN_GAP_PENALTY
+        extend_gap = constants.EXTEND_GAP_PENALTY
+        band_width = self._band_width
+        # Each candidate is a score, the cell and state to trace back
+        # from, and the state and length of a final gap.
+        best = (NEGATIVE_INFINITY, None, None, None, 0)
+        cell = cells.get((length1, length2))
+        if cell is not None:
+            best = (max(cell[:3]), (length1, length2), None, None, 0)
+        # Where the lengths differ by more than the band width, the
+        # alignment must end with a gap that leaves the band; allow
+        # for that by closing each cell on the last row and column
+        # with a gap to the end.
+        positions = [(length1, j) for j in range(
+            max(0, length1 - band_width),
+            min(length2, length1 + band_width + 1))]
+        positions.extend([(i, length2) for i in range(
+            max(0, length2 - band_width),
+            min(length1, length2 + band_width + 1))])
+        for position in positions:
+            cell = cells.get(position)
+            if cell is None:
+                continue
+            # A gap to the end of the second sequence is a gap in the
+            # first (state 2), and vice versa.
+            if position[0] == length1:
+                gap_state, other_state = 2, 1
+                gap_length = length2 - position[1]
+            else:
+                gap_state, other_state = 1, 2
+                gap_length = length1 - position[0]
+            scores = (cell[0] + open_gap, cell[other_state] + open_gap,
+                      cell[gap_state] + extend_gap)
+            index = _get_best_state(scores)
+            score = scores[index] + (gap_length - 1) * extend_gap
+            if score > best[0]:
+                state = (0, other_state, gap_state)[index]
+                best = (score, position, state, gap_state, gap_length)
+        score, position, state, gap_state, gap_length = best
+        a1, a2 = self._traceback(position, state)
+        if gap_state == 1:
+            a1 += self._s1[position[0]:length1]
+            a2 += '-' * gap_length
+        elif gap_state == 2:
+            a1 += '-' * gap_length
+            a2 += self._s2[position[1]:length2]
+        return a1, a2, score
+
+    def _fill(self, length1, length2):
+        """Computes the cells of the matrix, within the band, needed to
+        align prefixes of up to `length1` and `length2` characters.
+
+        :param length1: length of first sequence to align
+        :type length1: `int`
+        :param length2: length of second sequence to align
+        :type length2: `int`
+
+        """
+        old1, old2 = self._extent
+        length1 = max(length1, old1)
+        length2 = max(length2, old2)
+        if (length1, length2) == self._extent:
+            return
+        band_width = self._band_width
+        for i in range(length1 + 1):
+            start = max(0, i - band_width)
+            if i <= old1:
+                start = max(start, old2 + 1)
+            for j in range(start, min(length2, i + band_width) + 1):
+                self._cells[(i, j)] = self._get_cell(i, j)
+        self._extent = (length1, length2)
+
+    def _get_cell(self, i, j):
+        """Returns the scores and back pointers for the cell at `i`, `j`.
+
+        :param i: index into the first sequence
+        :type i: `int`
+        :param j: index into the second sequence
+        :type j: `int`
+        :rtype: `tuple`
+
+        """
+        cells = self._cells
+        open_gap = constants.OPEN_GAP_PENALTY
+        extend_gap = constants.EXTEND_GAP_PENALTY
+        match = gap2 = gap1 = NEGATIVE_INFINITY
+        match_state = gap2_state = gap1_state = None
+        previous = cells.get((i - 1, j - 1)) if i and j else None
+        if previous is not None:
+            match_state = _get_best_state(previous[:3])
+            if self._s1[i-1] == self._s2[j-1]:
+                score = constants.IDENTICAL_CHARACTER_SCORE
+            else:
+                score = constants.DIFFERENT_CHARACTER_SCORE
+            match = previous[match_state] + score
+        previous = cells.get((i - 1, j)) if i else None
+        if previous is not None:
+            scores = (previous[0] + open_gap, previous[1] + extend_gap,
+                      previous[2] + open_gap)
+            gap2_state = _get_best_state(scores)
+            gap2 = scores[gap2_state]
+        previous = cells.get((i, j - 1)) if j else None
+        if previous is not None:
+            scores = (previous[0] + open_gap, previous[1] + open_gap,
+                      previous[2] + extend_gap)
+            gap1_state = _get_best_state(scores)
+            gap1 = scores[gap1_state]
+        return (match, gap2, gap1, match_state, gap2_state, gap1_state)
+
+    def _traceback(self, position, state=None):
+        """Returns the aligned sequences ending at `position` in `state`
+        (or the best state of that cell if `state` is None).
+
+        :param position: indices of the cell to trace back from
+        :type position: 2-`tuple` of `int`
+        :param state: state of the cell to trace back from
+        :type state: `int`
+        :rtype: 2-`tuple` of `str`
+
+        """
+        i, j = position
+        cell = self._cells[position]
+        if state is None:
+            state = _get_best_state(cell[:3])
+        a1 = []
+        a2 = []
+        while i or j:
+            cell = self._cells[(i, j)]
+            previous_state = cell[state + 3]
+            if state == 0:
+                i -= 1
+                j -= 1
+                a1.append(self._s1[i])
+                a2.append(self._s2[j])
+            elif state == 1:
+                i -= 1
+                a1.append(self._s1[i])
+                a2.append('-')
+            else:
+                j -= 1
+                a1.append('-')
+                a2.append(self._s2[j])
+            state = previous_state
+        return ''.join(reversed(a1)), ''.join(reversed(a2))
+
+
+class SeededAligner:
+
+    """Class to align the context around a seed, an n-gram occurring at
+    known spans in two texts.
+
+    The context on each side of the seed is aligned separately with a
+    `BandedExtension`, so that widening the context reuses the work
+    of aligning the narrower context.
+
+    """
+
+    def __init__(self, t1, t1_span, t2, t2_span, band_width):
+        self._seed = t1[t1_span[0]:t1_span[1]]
+        self._left = BandedExtension(t1[:t1_span[0]][::-1],
+                                     t2[:t2_span[0]][::-1], band_width)
+        self._left_lengths = (t1_span[0], t2_span[0])
+        self._right = BandedExtension(t1[t1_span[1]:], t2[t2_span[1]:],
+                                      band_width)
+        self._right_lengths = (len(t1) - t1_span[1], len(t2) - t2_span[1])
+
+    def align(self, context_length):
+        """Returns the alignment of the seed with `context_length`
+        characters of context on either side, in the form returned by
+        `Bio.pairwise2`.
+
+        :param context_length: length of context on either side of
+                               the seed to include in the alignment
+        :type context_length: `int`
+        :rtype: `tuple`
+
+        """
+        left1, left2, left_score = self._left.align(
+            *[min(context_length, length) for length in self._left_lengths])
+        right1, right2, right_score = self._right.align(
+            *[min(context_length, length) for length in self._right_lengths])
+        a1 = left1[::-1] + self._seed + right1
+        a2 = left2[::-1] + self._seed + right2
+        score = left_score + right_score + \
+            len(self._seed) * constants.IDENTICAL_CHARACTER_SCORE
+        return a1, a2, score, 0, len(a1)
+
+
+class SequenceReport (LoggerPickleMixin, Report):
+
+    """Generate reports of aligned sequences between witnesses, based
+    around the n-grams they share.
+
+    By default each sequence is aligned in full with
+    `Bio.pairwise2`, which is very slow for long sequences. If a band
+    width is specified, the context on either side of the shared
+    n-gram is instead aligned outward from it, considering only
+    alignments that stay within that many characters of the
+    diagonal, and reusing the alignment of the previous context as
+    the context grows.
+
+    The text of each witness is read once. If more than one process
+    is specified, each pair of witnesses is aligned, and its report
+    written, in a pool of worker processes.
+
+    """
 
     _report_name = 'sequence'
 
-    def __init__(self, corpus, tokenizer, results):
+    def __init__(self, corpus, tokenizer, results, band_width=None,
+                 processes=1):
         self._logger = logging.getLogger(__name__)
         self._corpus = corpus
         self._tokenizer = tokenizer
+        self._band_width = band_width
+        self._processes = processes
         self._matches = pd.read_csv(results, encoding='utf-8', na_filter=False)
         self._substitutes = {}
         self._char_code = 61440
 
+    def __getstate__(self):
+        # Worker processes only align the texts supplied to them, so
+        # there is no need to pass them the results or corpus.
+        state = super().__getstate__()
+        state['_corpus'] = None
+        state['_matches'] = None
+        return state
+
+    @timed
     def generate(self, output_dir, minimum_size):
         """Generates sequence reports and writes them to the output directory.
 
@@ -88,12 +403,21 @@ class SequenceReport (Report):
         for original_ngram in original_ngrams:
             ngrams.append(self._get_text(Text(original_ngram,
                                               self._tokenizer)))
+        texts = self._get_witness_texts()
+        # self._substitutes has now been populated with every
+        # multi-character token in the texts.
+        self._reverse_substitutes = dict((v, k) for k, v in
+                                         self._substitutes.items())
         # Generate sequences for each witness in every combination of
         # (different) labels.
+        tasks = []
         for index, primary_label in enumerate(labels):
             for secondary_label in labels[index+1:]:
-                self._generate_sequences(primary_label, secondary_label,
-                                         ngrams)
+                tasks.extend(self._generate_sequences(
+                    primary_label, secondary_label, texts, ngrams))
+        for _ in map_tasks(self._generate_sequences_for_task, tasks,
+                           self._processes):
+            pass
 
     def _generate_sequence(self, t1, t1_span, t2, t2_span, context_length,
                            covered_spans):
@@ -120,21 +444,28 @@ class SequenceReport (Report):
         :param context_length: length of context on either side of
                                the spans to include in the sequence
         :type context_length: `int`
-        :param covered_spans: lists of start and end indices for parts
-                              of the texts already covered by a sequence
-        :type covered_spans: `list` of two `list`s of 2-`tuple` of `int`
+        :param covered_spans: spans of the texts already covered by
+                              a sequence
+        :type covered_spans: `list` of two `CoveredSpans`
 
         """
         old_length = 0
         self._logger.debug('Match found; generating new sequence')
+        if self._band_width is not None:
+            aligner = SeededAligner(t1, t1_span, t2, t2_span,
+                                    self._band_width)
         while True:
             s1, span1 = self._get_text_sequence(t1, t1_span, context_length)
             s2, span2 = self._get_text_sequence(t2, t2_span, context_length)
             length = len(s1)
-            alignment = pairwise2.align.globalms(
-                s1, s2, constants.IDENTICAL_CHARACTER_SCORE,
-                constants.DIFFERENT_CHARACTER_SCORE,
-                constants.OPEN_GAP_PENALTY, constants.EXTEND_GAP_PENALTY)[0]
+            if self._band_width is None:
+                alignment = pairwise2.align.globalms(
+                    s1, s2, constants.IDENTICAL_CHARACTER_SCORE,
+                    constants.DIFFERENT_CHARACTER_SCORE,
+                    constants.OPEN_GAP_PENALTY,
+                    constants.EXTEND_GAP_PENALTY)[0]
+            else:
+                alignment = aligner.align(context_length)
             context_length = length
             score = alignment[2] / length
             if not alignment:
@@ -144,14 +475,15 @@ class SequenceReport (Report):
             else:
                 self._logger.debug('Score: {}'.format(score))
             old_length = length
-        covered_spans[0].append(span1)
-        covered_spans[1].append(span2)
+        covered_spans[0].add(span1)
+        covered_spans[1].add(span2)
         return Sequence(alignment, self._reverse_substitutes, t1_span[0])
 
-    def _generate_sequences(self, primary_label, secondary_label, ngrams):
-        """Generates aligned sequences between each witness labelled
-        `primary_label` and each witness labelled `secondary_label`,
-        based around `ngrams`.
+    def _generate_sequences(self, primary_label, secondary_label, texts,
+                            ngrams):
+        """Returns the tasks of generating aligned sequences between each
+        witness labelled `primary_label` and each witness labelled
+        `secondary_label`, based around `ngrams`.
 
         :param primary_label: label for one side of the pairs of
                               witnesses to align
@@ -159,8 +491,11 @@ class SequenceReport (Report):
         :param secondary_label: label for the other side of the pairs
                                 of witnesses to align
         :type secondary_label: `str`
+        :param texts: text content of each witness
+        :type texts: `dict`
         :param ngrams: n-grams to base sequences off
         :type ngrams: `list` of `str`
+        :rtype: `list` of `tuple`
 
         """
         cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME]
@@ -170,15 +505,14 @@ class SequenceReport (Report):
         secondary_works = self._matches[self._matches[
             constants.LABEL_FIELDNAME] == secondary_label][
                 cols].drop_duplicates()
-        for index, (work1, siglum1) in primary_works.iterrows():
-            text1 = self._get_text(self._corpus.get_witness(work1, siglum1))
+        tasks = []
+        for work1, siglum1 in primary_works.itertuples(index=False):
             label1 = '{}_{}'.format(work1, siglum1)
-            for index, (work2, siglum2) in secondary_works.iterrows():
-                text2 = self._get_text(self._corpus.get_witness(
-                    work2, siglum2))
+            for work2, siglum2 in secondary_works.itertuples(index=False):
                 label2 = '{}_{}'.format(work2, siglum2)
-                self._generate_sequences_for_texts(label1, text1, label2,
-                                                   text2, ngrams)
+                tasks.append((label1, texts[(work1, siglum1)], label2,
+                              texts[(work2, siglum2)], ngrams))
+        return tasks
 
     def _generate_sequences_for_ngram(self, t1, t2, ngram, covered_spans):
         """Generates aligned sequences for the texts `t1` and `t2`, based
@@ -192,9 +526,9 @@ class SequenceReport (Report):
         :type t2: `str`
         :param ngram: n-gram to base sequences on
         :type ngram: `str`
-        :param covered_spans: lists of start and end indices for parts
-                              of the texts already covered by a sequence
-        :type covered_spans: `list` of two `list`s of 2-`tuple` of `int`
+        :param covered_spans: spans of the texts already covered by
+                              a sequence
+        :type covered_spans: `list` of two `CoveredSpans`
 
         """
         self._logger.debug('Generating sequences for n-gram "{}"'.format(
@@ -233,16 +567,12 @@ class SequenceReport (Report):
         :type ngrams: `list` of `str`
 
         """
-        # self._subsitutes is gradually populated as each text is
-        # processed, so this needs to be regenerated each time.
-        self._reverse_substitutes = dict((v, k) for k, v in
-                                         self._substitutes.items())
         sequences = []
         # Keep track of spans within each text that have been covered
         # by an aligned sequence, to ensure that they aren't reported
-        # more than once. The first sub-list contains span indices for
-        # text t1, the second for t2.
-        covered_spans = [[], []]
+        # more than once. The first item contains the spans for text
+        # t1, the second for t2.
+        covered_spans = [CoveredSpans(len(t1)), CoveredSpans(len(t2))]
         for ngram in ngrams:
             sequences.extend(self._generate_sequences_for_ngram(
                 t1, t2, ngram, covered_spans))
@@ -253,6 +583,17 @@ class SequenceReport (Report):
             os.makedirs(self._output_dir, exist_ok=True)
             self._write(context, self._output_dir, report_name)
 
+    def _generate_sequences_for_task(self, task):
+        """Generates and outputs aligned sequences for the pair of witnesses
+        in `task`.
+
+        :param task: labels and text content of two witnesses, and
+                     the n-grams to base sequences on
+        :type task: `tuple`
+
+        """
+        self._generate_sequences_for_texts(*task)
+
     def _get_text(self, text):
         """Returns the text content of `text`, with all multi-character tokens
         replaced with a single character. Substitutions are recorded
@@ -273,6 +614,21 @@ class SequenceReport (Report):
                 tokens[i] = substitute
         return self._tokenizer.joiner.join(tokens)
 
+    def _get_witness_texts(self):
+        """Returns the text content, as returned by `_get_text`, of each
+        witness in the matches, keyed by work and siglum.
+
+        :rtype: `dict`
+
+        """
+        cols = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME]
+        witnesses = self._matches[cols].drop_duplicates()
+        texts = {}
+        for work, siglum in witnesses.itertuples(index=False):
+            texts[(work, siglum)] = self._get_text(
+                self._corpus.get_witness(work, siglum))
+        return texts
+
     def _get_text_sequence(self, text, span, context_length):
         """Returns the subset of `text` encompassed by `span`, plus
         `context_length` characters before and after.
@@ -298,31 +654,10 @@ class SequenceReport (Report):
         :type span1: 2-`tuple` of `int`
         :param span2: start and end indices of a span
         :type span2: 2-`tuple` of `int`
-        :param covered_spans: lists of start and end indices for parts
-                              of the texts already covered by a sequence
-        :type covered_spans: `list` of two `list`s of 2-`tuple` of `int`
-        :rtype: `bool`
-
-        """
-        if self._is_span_inside(span1, covered_spans[0]) and \
-           self._is_span_inside(span2, covered_spans[1]):
-            return True
-        return False
-
-    def _is_span_inside(self, span, covered_spans):
-        """Returns True if `span` falls within `covered_spans`.
-
-        :param span: start and end indices of a span
-        :type span: 2-`tuple` of `int`
-        :param covered_spans: list of start and end indices for parts
-                              of the text already covered by a sequence
-        :type covered_spans: `list` of  2-`tuple` of `int`
+        :param covered_spans: spans of the texts already covered by
+                              a sequence
+        :type covered_spans: `list` of two `CoveredSpans`
         :rtype: `bool`
 
         """
-        start = span[0]
-        end = span[1]
-        for c_start, c_end in covered_spans:
-            if start >= c_start and end <= c_end:
-                return True
-        return False
+        return span1 in covered_spans[0] and span2 in covered_spans[1]
@@ -1,19 +1,74 @@
 """Module containing the StatisticsReport class."""
 
-import re
-
+import numpy as np
 import pandas as pd
 
 from . import constants
-from .text import Text
+from .decorators import timed
+from .parallel import map_tasks
+from .text import find_ngrams
+
+
+def get_coverage(tokens, ngrams, tokenizer):
+    """Returns the number of tokens in `tokens` that are covered by
+    at least one occurrence of any of `ngrams`.
+
+    The occurrences of every n-gram are found by `find_ngrams`, and
+    recorded as token index intervals, which are combined into a
+    boolean mask of the covered tokens.
+
+    :param tokens: tokens of the text to measure coverage of
+    :type tokens: `list` of `str`
+    :param ngrams: n-grams to locate in `tokens`
+    :type ngrams: iterable of `str`
+    :param tokenizer: tokenizer used for `tokens` and `ngrams`
+    :type tokenizer: `Tokenizer`
+    :rtype: `int`
+
+    """
+    occurrences = set((start, end) for start, end, ngram in
+                      find_ngrams(tokens, ngrams, tokenizer))
+    # Mark the start and end of each occurrence interval, such that
+    # a cumulative sum is positive for every covered token.
+    boundaries = np.zeros(len(tokens) + 1, dtype=np.int64)
+    if occurrences:
+        starts, ends = zip(*occurrences)
+        np.add.at(boundaries, list(starts), 1)
+        np.add.at(boundaries, list(ends), -1)
+    return int(np.count_nonzero(np.cumsum(boundaries[:-1])))
+
+
+def _process_witness(task):
+    """Returns the statistics row for the witness specified in `task`.
+
+    This is a module level function so that it may be run in a
+    worker process.
+
+    :param task: corpus, tokenizer, work, siglum, label and n-grams
+    :type task: `tuple`
+    :rtype: `dict`
+
+    """
+    corpus, tokenizer, work, siglum, label, ngrams = task
+    tokens = corpus.get_witness(work, siglum).get_tokens()
+    total_count = len(tokens)
+    matching_count = get_coverage(tokens, ngrams, tokenizer)
+    percentage = matching_count / total_count * 100
+    return {constants.WORK_FIELDNAME: work,
+            constants.SIGLUM_FIELDNAME: siglum,
+            constants.COUNT_TOKENS_FIELDNAME: matching_count,
+            constants.TOTAL_TOKENS_FIELDNAME: total_count,
+            constants.PERCENTAGE_FIELDNAME: percentage,
+            constants.LABEL_FIELDNAME: label}
 
 
 class StatisticsReport:
 
-    def __init__(self, corpus, tokenizer, matches):
+    def __init__(self, corpus, tokenizer, matches, processes=1):
         self._corpus = corpus
         self._tokenizer = tokenizer
         self._matches = pd.read_csv(matches, encoding='utf-8', na_filter=False)
+        self._processes = processes
         self._stats = pd.DataFrame()
 
     def csv(self, fh):
@@ -27,6 +82,7 @@ class StatisticsReport:
         self._stats.to_csv(fh, encoding='utf-8', index=False)
         return fh
 
+    @timed
     def generate_statistics(self):
         """Replaces result rows with summary statistics about the results.
 
@@ -34,100 +90,34 @@ class StatisticsReport:
         percentage of matching tokens and label for each witness in
         the results.
 
+        Witnesses are processed in parallel if more than one process
+        was specified.
+
         """
-        matches = self._matches
-        witness_fields = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
-                          constants.LABEL_FIELDNAME]
-        witnesses = matches[witness_fields].drop_duplicates()
-        rows = []
-        for index, (work, siglum, label) in witnesses.iterrows():
-            witness = self._corpus.get_witness(work, siglum)
-            witness_matches = matches[
-                (matches[constants.WORK_FIELDNAME] == work) &
-                (matches[constants.SIGLUM_FIELDNAME] == siglum)]
-            total_count, matching_count = self._process_witness(
-                witness, witness_matches)
-            percentage = matching_count / total_count * 100
-            rows.append({constants.WORK_FIELDNAME: work,
-                         constants.SIGLUM_FIELDNAME: siglum,
-                         constants.COUNT_TOKENS_FIELDNAME: matching_count,
-                         constants.TOTAL_TOKENS_FIELDNAME: total_count,
-                         constants.PERCENTAGE_FIELDNAME: percentage,
-                         constants.LABEL_FIELDNAME: label})
+        rows = map_tasks(_process_witness, self._get_tasks(),
+                         self._processes)
         self._stats = pd.DataFrame(
-            rows, columns=constants.STATISTICS_FIELDNAMES)
+            list(rows), columns=constants.STATISTICS_FIELDNAMES)
 
-    def _generate_text_from_slices(self, full_text, slices):
-        """Return a single string consisting of the parts specified in
-        `slices` joined together by the tokenizer's joining string.
+    def _get_tasks(self):
+        """Returns a generator supplying the data required to process each
+        witness in the results.
 
-        :param full_text: the text to be sliced
-        :type full_text: `str`
-        :param slices: list of slice indices to apply to `full_text`
-        :type slices: `list` of `list`\s
-        :rtype: `str`
+        In order to provide a correct count of matched tokens,
+        avoiding the twin dangers of counting the same token multiple
+        times due to being part of multiple n-grams (which can happen
+        even in reduced results) and not counting tokens due to an
+        n-gram overlapping with itself or another n-gram, only the
+        distinct n-grams of each witness are required; their
+        occurrences are located in the witness text itself.
 
-        """
-        sliced_text = []
-        for start, end in slices:
-            sliced_text.append(full_text[start:end])
-        return self._tokenizer.joiner.join(sliced_text)
-
-    @staticmethod
-    def _merge_slices(match_slices):
-        """Return a list of slice indices lists derived from `match_slices`
-        with no overlaps."""
-        # Sort by earliest range, then by largest range.
-        match_slices.sort(key=lambda x: (x[0], -x[1]))
-        merged_slices = [match_slices.pop(0)]
-        for slice_indices in match_slices:
-            last_end = merged_slices[-1][1]
-            if slice_indices[0] <= last_end:
-                if slice_indices[1] > last_end:
-                    merged_slices[-1][1] = slice_indices[1]
-            else:
-                merged_slices.append(slice_indices)
-        return merged_slices
-
-    def _process_witness(self, witness, matches):
-        """Return the counts of total tokens and matching tokens in `witness`.
-
-        :param witness: witness text
-        :type witness: `tacl.WitnessText`
-        :param matches: n-gram matches
-        :type matches: `pandas.DataFrame`
-        :rtype: `tuple` of `int`
+        :rtype: `generator` of `tuple`
 
         """
-        # In order to provide a correct count of matched tokens,
-        # avoiding the twin dangers of counting the same token
-        # multiple times due to being part of multiple n-grams (which
-        # can happen even in reduced results) and not counting tokens
-        # due to an n-gram overlapping with itself or another n-gram,
-        # a bit of work is required.
-        #
-        # Using regular expressions, get the slice indices for all
-        # matches (including overlapping ones) for all matching
-        # n-grams. Merge these slices together (without overlap) and
-        # create a Text using that text, which can then be tokenised
-        # and the tokens counted.
-        tokens = witness.get_tokens()
-        full_text = witness.get_token_content()
-        fields = [constants.NGRAM_FIELDNAME, constants.SIZE_FIELDNAME]
-        match_slices = []
-        for index, (ngram, size) in matches[fields].iterrows():
-            pattern = re.compile(re.escape(ngram))
-            # Because the same n-gram may overlap itself ("heh" in the
-            # string "heheh"), re.findall cannot be used.
-            start = 0
-            while True:
-                match = pattern.search(full_text, start)
-                if match is None:
-                    break
-                match_slices.append([match.start(), match.end()])
-                start = match.start() + 1
-        merged_slices = self._merge_slices(match_slices)
-        match_content = self._generate_text_from_slices(
-            full_text, merged_slices)
-        match_text = Text(match_content, self._tokenizer)
-        return len(tokens), len(match_text.get_tokens())
+        witness_fields = [constants.WORK_FIELDNAME, constants.SIGLUM_FIELDNAME,
+                          constants.LABEL_FIELDNAME]
+        grouped = self._matches.groupby(witness_fields, sort=False)[
+            constants.NGRAM_FIELDNAME]
+        for (work, siglum, label), ngrams in grouped:
+            yield (self._corpus, self._tokenizer, work, siglum, label,
+                   list(ngrams.unique()))
@@ -4,12 +4,13 @@ import logging
 import os
 
 from lxml import etree
-from pkg_resources import resource_filename
 
 from . import constants
+from .parallel import map_tasks
+from .xslt import get_transform, TransformPickleMixin
 
 
-class Stripper:
+class Stripper (TransformPickleMixin):
 
     """Class used for preprocessing a corpus of texts by stripping out all
     material that is not the textual material proper, and generating
@@ -18,15 +19,27 @@ class Stripper:
     The intention is to keep the stripped text as close in formatting
     to the original as possible, including whitespace.
 
+    If more than one process is specified, files are stripped in a
+    pool of worker processes, each of which compiles its own XSLT
+    transform.
+
+    In incremental mode, a file is not stripped if the existing
+    output for its work is newer than it; otherwise any existing
+    output for the work is replaced. When not in incremental mode,
+    it is an error for the output for a work to already exist.
+
     """
 
-    def __init__(self, input_dir, output_dir):
+    xslt = 'strip_tei.xsl'
+
+    def __init__(self, input_dir, output_dir, processes=1,
+                 incremental=False):
         self._logger = logging.getLogger(__name__)
         self._input_dir = os.path.abspath(input_dir)
         self._output_dir = os.path.abspath(output_dir)
-        xslt_filename = resource_filename(
-            __name__, 'assets/xslt/strip_tei.xsl')
-        self.transform = etree.XSLT(etree.parse(xslt_filename))
+        self._processes = processes
+        self._incremental = incremental
+        self.transform = get_transform(self.xslt)
 
     def get_witnesses(self, source_tree):
         """Returns a list of all witnesses of variant readings in
@@ -48,14 +61,41 @@ class Stripper:
             witnesses = [(constants.BASE_WITNESS, constants.BASE_WITNESS_ID)]
         return witnesses
 
+    def _is_stripped(self, file_path, work):
+        """Returns True if the output for `work` exists and is newer than
+        the source file at `file_path`.
+
+        :param file_path: path to source file
+        :type file_path: `str`
+        :param work: name of work
+        :type work: `str`
+        :rtype: `bool`
+
+        """
+        work_dir = os.path.join(self._output_dir, work)
+        try:
+            output_paths = [os.path.join(work_dir, filename) for filename
+                            in os.listdir(work_dir)]
+        except OSError:
+            return False
+        if not output_paths:
+            return False
+        source_mtime = os.path.getmtime(file_path)
+        return min(os.path.getmtime(path) for path in output_paths) >= \
+            source_mtime
+
     def _output_file(self, work, witnesses):
         work_dir = os.path.join(self._output_dir, work)
         try:
-            os.makedirs(work_dir)
+            os.makedirs(work_dir, exist_ok=self._incremental)
         except OSError as err:
             logging.error('Could not create output directory: {}'.format(
                 err))
             raise
+        # Remove any previous output, which may include witnesses
+        # that are no longer attested.
+        for filename in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, filename))
         for witness in witnesses.keys():
             witness_file_path = os.path.join(
                 work_dir, '{}.txt'.format(witness))
@@ -70,12 +110,39 @@ class Stripper:
                 self._logger.error(
                     'Could not create output directory: {}'.format(err))
                 raise
+        for _ in map_tasks(self._process_file, self._get_file_paths(),
+                           self._processes):
+            pass
+
+    def _get_file_paths(self):
+        """Returns a generator of the paths to each XML file in the input
+        directory.
+
+        :rtype: `generator` of `str`
+
+        """
         for dirpath, dirnames, filenames in os.walk(self._input_dir):
             for filename in filenames:
                 if os.path.splitext(filename)[1] == '.xml':
-                    work, witnesses = self.strip_file(
-                        os.path.join(dirpath, filename))
-                    self._output_file(work, witnesses)
+                    yield os.path.join(dirpath, filename)
+
+    def _process_file(self, file_path):
+        """Strips the file at `file_path` and outputs its witnesses,
+        unless in incremental mode and the output is up to date.
+
+        :param file_path: path to file to strip
+        :type file_path: `str`
+
+        """
+        if self._incremental:
+            work = os.path.splitext(os.path.basename(file_path))[0]
+            if self._is_stripped(file_path, work):
+                self._logger.info('Skipping unchanged file {}'.format(
+                    file_path))
+                return
+        result = self.strip_file(file_path)
+        if result is not None:
+            self._output_file(*result)
 
     def strip_file(self, filename):
         file_path = os.path.join(self._input_dir, filename)
@@ -89,6 +156,8 @@ class Stripper:
             logging.warning('XML file "{}" is invalid'.format(filename))
             return
         witnesses = {}
+        # Each witness' text is transformed from the same parsed
+        # document.
         for witness, witness_id in self.get_witnesses(tei_doc):
             witness_param = "'{}'".format(witness_id)
             text = str(self.transform(tei_doc, witness_id=witness_param))
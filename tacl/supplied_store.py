@@ -0,0 +1,226 @@
+"""Module containing the SuppliedStore class."""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import constants, profiler
+from .decorators import timed
+from .exceptions import MalformedQueryError, MalformedResultsError
+from .parallel import LoggerPickleMixin
+
+
+class SuppliedStore (LoggerPickleMixin):
+
+    """Class providing the supplied results queries of `DataStore`
+    without a database.
+
+    The supplied results are loaded into memory, and the n-grams
+    common to, or unique to, each set of results are found from
+    counts of the distinct labels of each n-gram. Since no database
+    is opened, any number of these queries may be run at the same
+    time, in separate processes, without contending for a lock.
+
+    """
+
+    def __init__(self):
+        self._logger = logging.getLogger(__name__)
+
+    @timed
+    def diff_supplied(self, results_filenames, labels, tokenizer, output_fh):
+        """Returns `output_fh` populated with CSV results giving the n-grams
+        that are unique to the witnesses in each set of works in
+        `results_sets`, using the labels in `labels`.
+
+        Note that this is not the same as the symmetric difference of
+        these sets, except in the case where there are only two
+        labels.
+
+        :param results_filenames: list of results filenames to be diffed
+        :type results_filenames: `list` of `str`
+        :param labels: labels to be applied to the results_sets
+        :type labels: `list`
+        :param tokenizer: tokenizer for the n-grams
+        :type tokenizer: `Tokenizer`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        matches = self._load_results_sets(results_filenames, labels)
+        self._logger.info('Running supplied diff')
+        matches = self._select_by_label_count(matches, 1)
+        matches = self._reduce_diff_results(matches, tokenizer)
+        return self._csv(matches, output_fh)
+
+    @timed
+    def intersection_supplied(self, results_filenames, labels, output_fh):
+        """Returns `output_fh` populated with CSV results giving the n-grams
+        that are common to witnesses in every set of works in
+        `results_sets`, using the labels in `labels`.
+
+        :param results_filenames: list of results to be diffed
+        :type results_filenames: `list` of `str`
+        :param labels: labels to be applied to the results_sets
+        :type labels: `list`
+        :param output_fh: object to output results to
+        :type output_fh: file-like object
+        :rtype: file-like object
+
+        """
+        matches = self._load_results_sets(results_filenames, labels)
+        self._logger.info('Running supplied intersect')
+        matches = self._select_by_label_count(matches, len(labels))
+        return self._csv(matches, output_fh)
+
+    @staticmethod
+    def _csv(matches, output_fh):
+        profiler.set_rows(len(matches))
+        matches.to_csv(output_fh, encoding='utf-8', float_format='%d',
+                       index=False)
+        return output_fh
+
+    @staticmethod
+    def _get_label_counts(matches):
+        """Returns the number of distinct labels with which each n-gram
+        in `matches` occurs, aligned with `matches`.
+
+        :param matches: results
+        :type matches: `pandas.DataFrame`
+        :rtype: `numpy.ndarray`
+
+        """
+        ngram_codes, ngrams = pd.factorize(matches[constants.NGRAM_FIELDNAME])
+        label_codes, labels = pd.factorize(matches[constants.LABEL_FIELDNAME])
+        # Each distinct pair of n-gram and label is counted once
+        # against its n-gram.
+        label_total = max(len(labels), 1)
+        pairs = np.unique(ngram_codes.astype(np.int64) * label_total +
+                          label_codes)
+        counts = np.bincount(pairs // label_total, minlength=len(ngrams))
+        return counts[ngram_codes]
+
+    def _load_results_sets(self, results_filenames, labels):
+        """Returns the results in `results_filenames`, each labelled with
+        the corresponding label in `labels`.
+
+        :param results_filenames: paths to results files
+        :type results_filenames: `list` of `str`
+        :param labels: labels to be applied to the results
+        :type labels: `list` of `str`
+        :rtype: `pandas.DataFrame`
+
+        """
+        if len(labels) < 2:
+            raise MalformedQueryError(
+                constants.INSUFFICIENT_LABELS_QUERY_ERROR)
+        if len(results_filenames) != len(labels):
+            raise MalformedQueryError(
+                constants.SUPPLIED_ARGS_LENGTH_MISMATCH_ERROR)
+        required_cols = constants.QUERY_FIELDNAMES[:-1]
+        # Read the textual fields as strings, so that n-grams, works
+        # and sigla that look like numbers are compared as they are
+        # written.
+        dtypes = {constants.NGRAM_FIELDNAME: str,
+                  constants.WORK_FIELDNAME: str,
+                  constants.SIGLUM_FIELDNAME: str}
+        matches = []
+        for results_filename, label in zip(results_filenames, labels):
+            self._logger.info('Loading supplied results {}'.format(
+                results_filename))
+            results = pd.read_csv(results_filename, encoding='utf-8',
+                                  dtype=dtypes, na_filter=False)
+            missing_cols = ['"{}"'.format(col) for col in required_cols
+                            if col not in results.columns]
+            if missing_cols:
+                raise MalformedResultsError(
+                    constants.MISSING_REQUIRED_COLUMNS_ERROR.format(
+                        ', '.join(missing_cols)))
+            results = results.reindex(columns=required_cols)
+            results[constants.LABEL_FIELDNAME] = label
+            matches.append(results)
+        return pd.concat(matches, ignore_index=True)
+
+    def _select_by_label_count(self, matches, label_count):
+        """Returns those results in `matches` whose n-gram occurs with
+        `label_count` distinct labels, ordered by n-gram.
+
+        :param matches: results
+        :type matches: `pandas.DataFrame`
+        :param label_count: number of labels
+        :type label_count: `int`
+        :rtype: `pandas.DataFrame`
+
+        """
+        matches = matches[self._get_label_counts(matches) == label_count]
+        # Order the results by n-gram and then as supplied.
+        return matches.sort_values(constants.NGRAM_FIELDNAME,
+                                   kind='mergesort')
+
+    def _reduce_diff_results(self, matches, tokenizer):
+        """Returns `matches` with filler results removed.
+
+        This is the reduction made by `DataStore._reduce_diff_results`
+        (which see), made on all witnesses at once. The n-grams of
+        each witness are reduced size by size, an n-gram being kept
+        only if both or neither of the (n-1)-grams that compose it
+        are among the n-grams of the next smaller size (with a
+        non-zero count, once reduced).
+
+        :param matches: diff results
+        :type matches: `pandas.DataFrame`
+        :param tokenizer: tokenizer for the n-grams
+        :type tokenizer: `Tokenizer`
+        :rtype: `pandas.DataFrame`
+
+        """
+        self._logger.info('Removing filler results')
+        NGRAM = constants.NGRAM_FIELDNAME
+        COUNT = constants.COUNT_FIELDNAME
+        WITNESS, PREFIX, SUFFIX = 'witness', 'prefix', 'suffix'
+        witness_fields = [constants.WORK_FIELDNAME,
+                          constants.SIGLUM_FIELDNAME]
+        # Order the results by witness and size, keeping the order of
+        # results within each.
+        matches = matches.sort_values(
+            witness_fields + [constants.SIZE_FIELDNAME],
+            kind='mergesort').reset_index(drop=True)
+        witnesses = pd.Series(matches.groupby(witness_fields).ngroup().values)
+        # Each size is reduced against the next smaller size present
+        # for its witness.
+        ranks = matches.groupby(witnesses)[constants.SIZE_FIELDNAME].rank(
+            method='dense').values.astype(int) - 1
+        counts = matches[COUNT].values.copy()
+        tokenize = tokenizer.tokenize
+        join = tokenizer.joiner.join
+        for rank in range(1, ranks.max() + 1 if len(ranks) else 1):
+            current = np.flatnonzero(ranks == rank)
+            previous = np.flatnonzero(ranks == rank - 1)
+            previous_counts = pd.DataFrame({
+                WITNESS: witnesses.values[previous],
+                NGRAM: matches[NGRAM].values[previous],
+                COUNT: counts[previous]}).drop_duplicates(
+                    [WITNESS, NGRAM], keep='last')
+            tokens = [tokenize(ngram) for ngram in
+                      matches[NGRAM].values[current]]
+            sub_ngrams = pd.DataFrame({
+                WITNESS: witnesses.values[current],
+                PREFIX: [join(ngram_tokens[:-1]) for ngram_tokens in tokens],
+                SUFFIX: [join(ngram_tokens[1:]) for ngram_tokens in tokens]})
+            statuses = []
+            for field in (PREFIX, SUFFIX):
+                statuses.append(sub_ngrams.merge(
+                    previous_counts, how='left', left_on=[WITNESS, field],
+                    right_on=[WITNESS, NGRAM])[COUNT].values)
+            prefix_status, suffix_status = statuses
+            prefix_missing = pd.isnull(prefix_status)
+            suffix_missing = pd.isnull(suffix_status)
+            keep = (prefix_missing & suffix_missing) | (
+                ~prefix_missing & ~suffix_missing & (prefix_status != 0) &
+                (suffix_status != 0))
+            counts[current[~keep]] = 0
+            self._logger.debug('Reduced down {} n-grams to {}'.format(
+                len(current), np.count_nonzero(keep)))
+        return matches[counts != 0].reindex(
+            columns=constants.QUERY_FIELDNAMES)
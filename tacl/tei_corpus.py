@@ -5,9 +5,10 @@ import os
 import re
 
 from lxml import etree
-from pkg_resources import resource_filename
 
 from . import constants
+from .parallel import map_tasks
+from .xslt import get_transform, TransformPickleMixin
 
 
 TEI_CORPUS_XML = '''<teiCorpus xmlns="http://www.tei-c.org/ns/1.0"
@@ -32,7 +33,7 @@ resp_splitter = re.compile(r'\{|\}')
 witnesses_splitter = re.compile(r'【|】')
 
 
-class TEICorpus:
+class TEICorpus (TransformPickleMixin):
 
     """A TEICorpus represents a collection of TEI XML documents.
 
@@ -45,17 +46,22 @@ class TEICorpus:
     This class must not be instantiated directly; rather a subclass
     appropriate to the source should be used.
 
+    If more than one process is specified, works are tidied in a pool
+    of worker processes. In incremental mode, a work is not tidied if
+    its existing output is newer than all of its source parts.
+
     """
 
     xslt = ''
 
-    def __init__(self, input_dir, output_dir):
+    def __init__(self, input_dir, output_dir, processes=1,
+                 incremental=False):
         self._logger = logging.getLogger(__name__)
         self._input_dir = os.path.abspath(input_dir)
         self._output_dir = os.path.abspath(output_dir)
-        xslt_filename = resource_filename(__name__, 'assets/xslt/{}'.format(
-            self.xslt))
-        self.transform = etree.XSLT(etree.parse(xslt_filename))
+        self._processes = processes
+        self._incremental = incremental
+        self.transform = get_transform(self.xslt)
 
     def _assemble_parts(self, work, paths):
         parts = list(paths.keys())
@@ -129,15 +135,35 @@ class TEICorpus:
             '/tei:teiCorpus/tei:teiHeader/tei:fileDesc/tei:sourceDesc',
             namespaces=constants.NAMESPACES)[0]
         wit_list = etree.SubElement(source_desc, TEI + 'listWit')
+        xml_ids = {}
         for index, siglum in enumerate(witnesses):
             wit = etree.SubElement(wit_list, TEI + 'witness')
             xml_id = 'wit{}'.format(index+1)
             wit.set(constants.XML + 'id', xml_id)
             wit.text = siglum
-            full_siglum = '【{}】'.format(siglum)
-            self._update_refs(root, bearers, 'wit', full_siglum, xml_id)
+            xml_ids['【{}】'.format(siglum)] = xml_id
+        self._update_refs(root, bearers, 'wit', xml_ids)
         return root
 
+    def _is_tidied(self, work, paths):
+        """Returns True if the output for `work` exists and is newer than
+        each of its source parts at `paths`.
+
+        :param work: filename of work
+        :type work: `str`
+        :param paths: paths to source parts, keyed by part label
+        :type paths: `dict`
+        :rtype: `bool`
+
+        """
+        output_filename = os.path.join(self._output_dir, work)
+        try:
+            output_mtime = os.path.getmtime(output_filename)
+        except OSError:
+            return False
+        return all(os.path.getmtime(path) <= output_mtime
+                   for path in paths.values())
+
     def _output_work(self, work, root):
         """Saves the TEI XML document `root` at the path `work`."""
         output_filename = os.path.join(self._output_dir, work)
@@ -176,33 +202,53 @@ class TEICorpus:
                     'Could not create output directory: {}'.format(err))
                 raise
         works = self._assemble_part_list()
-        for work, paths in works.items():
-            root = self._assemble_parts(work, paths)
-            root = self._populate_header(root)
-            root = self._handle_resps(root)
-            root = self._handle_witnesses(root)
-            self._output_work(work, root)
+        for _ in map_tasks(self._tidy_work, works.items(), self._processes):
+            pass
 
     def _tidy(self, *args, **kwargs):
         raise NotImplementedError
 
-    def _update_refs(self, root, bearers, attribute, ref_text, xml_id):
-        """Change `ref_text` on `bearers` to xml:id references.
+    def _tidy_work(self, task):
+        """Assembles, tidies and outputs the work and source parts
+        specified in `task`.
+
+        :param task: filename of work and paths to its source parts
+        :type task: `tuple`
+
+        """
+        work, paths = task
+        if self._incremental and self._is_tidied(work, paths):
+            self._logger.info('Skipping unchanged work {}'.format(work))
+            return
+        root = self._assemble_parts(work, paths)
+        root = self._populate_header(root)
+        root = self._handle_resps(root)
+        root = self._handle_witnesses(root)
+        self._output_work(work, root)
+
+    def _update_refs(self, root, bearers, attribute, xml_ids):
+        """Change the reference texts on `bearers` to xml:id references.
 
         :param root: root of TEI document
         :type root: `etree._Element`
         :param bearers: elements bearing `attribute`
         :param attribute: attribute to update
         :type attribute: `str`
-        :param ref_text: text to replace
-        :type ref_text: `str`
-        :param xml_id: xml:id
-        :type xml_id: `str`
+        :param xml_ids: xml:ids keyed by the text they replace
+        :type xml_ids: `dict`
 
         """
-        ref = ' #{} '.format(xml_id)
+        # Match longer texts first, so that a text that is contained
+        # within another does not break it up.
+        pattern = re.compile('|'.join(
+            re.escape(ref_text) for ref_text in
+            sorted(xml_ids, key=len, reverse=True)))
+
+        def replace(match):
+            return ' #{} '.format(xml_ids[match.group(0)])
+
         for bearer in bearers:
-            attribute_text = bearer.get(attribute).replace(ref_text, ref)
+            attribute_text = pattern.sub(replace, bearer.get(attribute))
             refs = ' '.join(sorted(attribute_text.strip().split()))
             bearer.set(attribute, refs)
 
@@ -266,6 +312,7 @@ class TEICorpusCBETAGitHub (TEICorpus):
             namespaces=constants.NAMESPACES)[0]
         edition_stmt = etree.Element(TEI + 'editionStmt')
         file_desc.insert(1, edition_stmt)
+        xml_ids = {}
         for index, (resp_resp, resp_name) in enumerate(resps):
             resp_stmt = etree.SubElement(edition_stmt, TEI + 'respStmt')
             xml_id = 'resp{}'.format(index+1)
@@ -274,8 +321,8 @@ class TEICorpusCBETAGitHub (TEICorpus):
             resp.text = resp_resp
             name = etree.SubElement(resp_stmt, TEI + 'name')
             name.text = resp_name
-            resp_data = '{{{}|{}}}'.format(resp_resp, resp_name)
-            self._update_refs(root, bearers, 'resp', resp_data, xml_id)
+            xml_ids['{{{}|{}}}'.format(resp_resp, resp_name)] = xml_id
+        self._update_refs(root, bearers, 'resp', xml_ids)
         return root
 
     def _tidy(self, work, file_path):
@@ -6,6 +6,51 @@ import os.path
 import re
 
 
+def find_ngrams(tokens, ngrams, tokenizer):
+    """Returns a generator of the start and end indices in `tokens` of
+    every occurrence of each of `ngrams`, along with the n-gram.
+
+    All of the n-grams are located in a single pass over `tokens` for
+    each n-gram size, with each window of tokens looked up in a
+    dictionary of the n-grams of that size. Occurrences may overlap.
+
+    :param tokens: tokens of the text to find n-grams in
+    :type tokens: `list` of `str`
+    :param ngrams: n-grams to locate in `tokens`
+    :type ngrams: iterable of `str`
+    :param tokenizer: tokenizer used for `tokens` and `ngrams`
+    :type tokenizer: `Tokenizer`
+    :rtype: `generator` of 3-`tuple` of `int`, `int`, `str`
+
+    """
+    join = tokenizer.joiner.join
+    # Identify each distinct token by an integer, normalising away
+    # any whitespace within a token in the same way that n-grams
+    # are generated.
+    token_ids = {}
+    ids = [token_ids.setdefault(join(token.split()), len(token_ids))
+           for token in tokens]
+    patterns = {}
+    for ngram in set(ngrams):
+        try:
+            pattern = tuple(token_ids[join(token.split())] for token in
+                            tokenizer.tokenize(ngram))
+        except KeyError:
+            # An n-gram containing a token that is not in the text
+            # cannot occur in it.
+            continue
+        if pattern:
+            patterns.setdefault(len(pattern), {}).setdefault(
+                pattern, []).append(ngram)
+    for size, size_patterns in patterns.items():
+        windows = zip(*[ids[offset:] for offset in range(size)])
+        for index, window in enumerate(windows):
+            matched_ngrams = size_patterns.get(window)
+            if matched_ngrams is not None:
+                for ngram in matched_ngrams:
+                    yield index, index + size, ngram
+
+
 class Text:
 
     """Class for base text functionality (getting tokens, generating
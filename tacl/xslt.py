@@ -0,0 +1,55 @@
+"""Module containing functions to load the XSLT transforms supplied
+with tacl."""
+
+from lxml import etree
+from pkg_resources import resource_filename
+
+from .parallel import LoggerPickleMixin
+
+
+# Compiled XSLT transforms, keyed by filename, so that each process
+# compiles a transform only once.
+_transforms = {}
+
+
+def get_transform(xslt):
+    """Returns the transform compiled from the XSLT asset `xslt`,
+    reusing one previously compiled in this process.
+
+    Compiled transforms cannot be pickled, so objects that are passed
+    to worker processes should get their transforms from this
+    function rather than carry them.
+
+    :param xslt: filename of XSLT asset
+    :type xslt: `str`
+    :rtype: `etree.XSLT`
+
+    """
+    transform = _transforms.get(xslt)
+    if transform is None:
+        xslt_filename = resource_filename(
+            __name__, 'assets/xslt/{}'.format(xslt))
+        transform = _transforms[xslt] = etree.XSLT(etree.parse(xslt_filename))
+    return transform
+
+
+class TransformPickleMixin (LoggerPickleMixin):
+
+    """Mixin for classes whose instances are passed to worker
+    processes, and which have in their `transform` attribute the
+    transform compiled from the XSLT asset named by their `xslt`
+    attribute, and a logger in their `_logger` attribute.
+
+    The transform is not pickled, but got again from `get_transform`
+    when unpickled; the logger is pickled by its name.
+
+    """
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state['transform']
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.transform = get_transform(self.xslt)
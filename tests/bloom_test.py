@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from tacl import bloom, constants
+
+
+class BloomTestCase (unittest.TestCase):
+
+    def setUp(self):
+        self._ngrams = ['n-gram {}'.format(i) for i in range(1000)]
+        self._absent_ngrams = ['absent {}'.format(i) for i in range(1000)]
+
+    def test_contains(self):
+        """Tests that a filter contains all of its n-grams and few
+        others."""
+        ngram_filter = bloom.create_filter(bloom.hash_ngrams(self._ngrams))
+        self.assertTrue(bloom.contains(
+            ngram_filter, bloom.hash_ngrams(self._ngrams)).all())
+        false_positives = bloom.contains(
+            ngram_filter, bloom.hash_ngrams(self._absent_ngrams)).sum()
+        self.assertLess(false_positives, 20)
+
+    def test_create_filter_size(self):
+        self.assertEqual(
+            len(bloom.create_filter(bloom.hash_ngrams([]))) * 8,
+            constants.NGRAM_FILTER_MINIMUM_BITS)
+        ngram_filter = bloom.create_filter(bloom.hash_ngrams(self._ngrams))
+        bits = len(ngram_filter) * 8
+        self.assertEqual(bits & (bits - 1), 0)
+        self.assertGreaterEqual(
+            bits, len(self._ngrams) * constants.NGRAM_FILTER_BITS_PER_NGRAM)
+
+    def test_hash_ngrams(self):
+        hashes = bloom.hash_ngrams(['ab', 'cd', 'ab'])
+        self.assertEqual(hashes.shape, (3, constants.NGRAM_FILTER_HASHES))
+        self.assertEqual(hashes[0].tolist(), hashes[2].tolist())
+        self.assertNotEqual(hashes[0].tolist(), hashes[1].tolist())
+        self.assertEqual(bloom.hash_ngrams([]).shape,
+                         (0, constants.NGRAM_FILTER_HASHES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import os.path
+import pickle
 import unittest
 from unittest.mock import call, MagicMock, mock_open, patch
 
@@ -69,5 +70,14 @@ class CorpusTestCase (TaclTestCase):
                           call(corpus, name2, siglum1)])
 
 
+    def test_pickle(self):
+        # The logger is not pickled (before Python 3.7 it could not
+        # be, once given a handler), but is got again by name.
+        corpus = tacl.Corpus('/test', self._tokenizer)
+        self.assertNotIn('_logger', corpus.__getstate__())
+        unpickled = pickle.loads(pickle.dumps(corpus))
+        self.assertIs(unpickled._logger, corpus._logger)
+        self.assertEqual(unpickled._path, corpus._path)
+
 if __name__ == '__main__':
     unittest.main()
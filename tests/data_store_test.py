@@ -3,13 +3,16 @@
 import collections
 import io
 import sqlite3
+import sys
 import unittest
-from unittest.mock import call, MagicMock, sentinel
+from unittest.mock import call, MagicMock, patch, sentinel
 
 import pandas as pd
 
 import tacl
-from tacl.exceptions import MalformedQueryError
+from tacl import bloom
+from tacl.exceptions import MalformedQueryError, MalformedResultsError
+from tacl.query_cache import QueryCache
 from .tacl_test_case import TaclTestCase
 
 
@@ -24,8 +27,34 @@ class DataStoreTestCase (TaclTestCase):
         store._conn.execute.assert_called_once_with(
             tacl.constants.CREATE_INDEX_TEXTNGRAM_SQL)
 
+    def test_add_missing_filters_and_minhashes(self):
+        store = tacl.DataStore(':memory:')
+        store._conn = MagicMock(spec_set=sqlite3.Connection)
+        store._conn.execute.side_effect = [
+            [(1, 2), (2, 2)], [(1, 2), (1, 3)], None, None]
+        get_text_size_hashes = self._create_patch(
+            'tacl.DataStore._get_text_size_hashes')
+        get_text_size_hashes.return_value = bloom.hash_ngrams(['a', 'b'])
+        add_minhash = self._create_patch('tacl.DataStore._add_minhash')
+        store._add_missing_filters_and_minhashes(True, True)
+        # The n-grams of each text and size are hashed only once.
+        self.assertEqual(get_text_size_hashes.mock_calls,
+                         [call(store, 1, 2), call(store, 1, 3),
+                          call(store, 2, 2)])
+        ngram_filter = bloom.create_filter(
+            get_text_size_hashes.return_value)
+        self.assertEqual(store._conn.execute.mock_calls[2:], [
+            call(tacl.constants.INSERT_NGRAM_FILTER_SQL,
+                 [1, 2, ngram_filter]),
+            call(tacl.constants.INSERT_NGRAM_FILTER_SQL,
+                 [2, 2, ngram_filter])])
+        self.assertEqual([minhash_call[1][1:3] for minhash_call in
+                          add_minhash.mock_calls], [(1, 2), (1, 3)])
+
     def test_add_ngrams(self):
         add_indices = self._create_patch('tacl.DataStore._add_indices')
+        add_missing = self._create_patch(
+            'tacl.DataStore._add_missing_filters_and_minhashes')
         add_text_ngrams = self._create_patch('tacl.DataStore._add_text_ngrams')
         analyse = self._create_patch('tacl.DataStore._analyse')
         initialise = self._create_patch('tacl.DataStore._initialise_database')
@@ -39,12 +68,16 @@ class DataStoreTestCase (TaclTestCase):
         initialise.assert_called_once_with(store)
         corpus.get_witnesses.assert_called_once_with()
         self.assertEqual(add_text_ngrams.mock_calls,
-                         [call(store, text1, 2, 3), call(store, text2, 2, 3)])
+                         [call(store, text1, 2, 3, False, False),
+                          call(store, text2, 2, 3, False, False)])
         add_indices.assert_called_once_with(store)
+        self.assertFalse(add_missing.called)
         analyse.assert_called_once_with(store)
 
     def test_add_ngrams_with_catalogue(self):
         add_indices = self._create_patch('tacl.DataStore._add_indices')
+        add_missing = self._create_patch(
+            'tacl.DataStore._add_missing_filters_and_minhashes')
         add_text_ngrams = self._create_patch('tacl.DataStore._add_text_ngrams')
         analyse = self._create_patch('tacl.DataStore._analyse')
         initialise = self._create_patch('tacl.DataStore._initialise_database')
@@ -59,12 +92,14 @@ class DataStoreTestCase (TaclTestCase):
         corpus.get_witnesses.return_value = iter([text1, text2])
         store = tacl.DataStore(':memory:')
         catalogue = tacl.Catalogue({'T1': 'A'})
-        store.add_ngrams(corpus, 2, 3, catalogue)
+        store.add_ngrams(corpus, 2, 3, catalogue, filters=True)
         initialise.assert_called_once_with(store)
         corpus.get_witnesses.assert_called_once_with('T1')
-        add_text_ngrams.assert_has_calls([call(store, text1, 2, 3),
-                                          call(store, text2, 2, 3)])
+        add_text_ngrams.assert_has_calls(
+            [call(store, text1, 2, 3, True, False),
+             call(store, text2, 2, 3, True, False)])
         add_indices.assert_called_once_with(store)
+        add_missing.assert_called_once_with(store, True, False)
         analyse.assert_called_once_with(store)
 
     def test_add_temporary_ngrams(self):
@@ -127,6 +162,32 @@ class DataStoreTestCase (TaclTestCase):
         actual_ngrams = set([row['ngram'] for row in cursor.fetchall()])
         self.assertEqual(actual_ngrams, expected_ngrams)
 
+    def test_add_temporary_results(self):
+        store = tacl.DataStore(':memory:')
+        store._conn = MagicMock(spec_set=sqlite3.Connection)
+        results = io.StringIO(
+            'count,label,ngram,siglum,size,work\n'
+            '2,X,AB,base,2,T1\n'
+            '1,X,BC,base,2,T1\n'
+            '\n'
+            '3,Y,AB,A,2,T2\n'
+            '4,Y,CD,A\n\n')
+        with patch('tacl.constants.SUPPLIED_RESULTS_BATCH_SIZE', 2):
+            store._add_temporary_results(results, 'A')
+        sql = tacl.constants.INSERT_TEMPORARY_RESULTS_SQL
+        self.assertEqual(store._conn.executemany.mock_calls, [
+            call(sql, [['AB', '2', 'T1', 'base', '2', 'A'],
+                       ['BC', '2', 'T1', 'base', '1', 'A']]),
+            call(sql, [['AB', '2', 'T2', 'A', '3', 'A'],
+                       ['CD', None, None, 'A', '4', 'A']])])
+
+    def test_add_temporary_results_missing_columns(self):
+        store = tacl.DataStore(':memory:')
+        store._conn = MagicMock(spec_set=sqlite3.Connection)
+        results = io.StringIO('ngram,size,work,siglum\nAB,2,T1,base\n')
+        self.assertRaises(MalformedResultsError,
+                          store._add_temporary_results, results, 'A')
+
     def test_add_text_ngrams_existing(self):
         get_text_id = self._create_patch('tacl.DataStore._get_text_id')
         get_text_id.return_value = sentinel.text_id
@@ -164,8 +225,10 @@ class DataStoreTestCase (TaclTestCase):
             call(store, sentinel.text_id, 3)])
         text.get_ngrams.assert_called_once_with(2, 3, [])
         add_text_size_ngrams.assert_has_calls([
-            call(store, sentinel.text_id, 2, sentinel.two_grams),
-            call(store, sentinel.text_id, 3, sentinel.three_grams)])
+            call(store, sentinel.text_id, 2, sentinel.two_grams, False,
+                 False),
+            call(store, sentinel.text_id, 3, sentinel.three_grams, False,
+                 False)])
 
     def test_add_text_record(self):
         store = tacl.DataStore(':memory:')
@@ -193,15 +256,41 @@ class DataStoreTestCase (TaclTestCase):
         store._conn = MagicMock(spec_set=sqlite3.Connection)
         size = 1
         ngrams = collections.OrderedDict([('a', 2), ('b', 1)])
-        store._add_text_size_ngrams(sentinel.text_id, size, ngrams)
-        store._conn.execute.assert_called_once_with(
-            tacl.constants.INSERT_TEXT_HAS_NGRAM_SQL,
-            [sentinel.text_id, size, len(ngrams)])
+        add_minhash = self._create_patch('tacl.DataStore._add_minhash')
+        store._add_text_size_ngrams(sentinel.text_id, size, ngrams, True,
+                                    True)
+        hashes = bloom.hash_ngrams(ngrams)
+        ngram_filter = bloom.create_filter(hashes)
+        self.assertEqual(store._conn.execute.mock_calls, [
+            call(tacl.constants.INSERT_TEXT_HAS_NGRAM_SQL,
+                 [sentinel.text_id, size, len(ngrams)]),
+            call(tacl.constants.INSERT_NGRAM_FILTER_SQL,
+                 [sentinel.text_id, size, ngram_filter])])
+        self.assertEqual(add_minhash.call_count, 1)
+        self.assertEqual(add_minhash.call_args[0][:3],
+                         (store, sentinel.text_id, size))
+        self.assertEqual(add_minhash.call_args[0][3].tolist(),
+                         hashes.tolist())
         store._conn.executemany.assert_called_once_with(
             tacl.constants.INSERT_NGRAM_SQL,
             [[sentinel.text_id, 'a', size, 2],
              [sentinel.text_id, 'b', size, 1]])
 
+    def test_add_text_size_ngrams_without_hashes(self):
+        store = tacl.DataStore(':memory:')
+        store._conn = MagicMock(spec_set=sqlite3.Connection)
+        ngrams = collections.OrderedDict([('a', 2), ('b', 1)])
+        add_minhash = self._create_patch('tacl.DataStore._add_minhash')
+        hash_ngrams = self._create_patch('tacl.bloom.hash_ngrams')
+        store._add_text_size_ngrams(sentinel.text_id, 1, ngrams)
+        self.assertEqual(store._conn.execute.mock_calls, [
+            call(tacl.constants.INSERT_TEXT_HAS_NGRAM_SQL,
+                 [sentinel.text_id, 1, len(ngrams)])])
+        self.assertFalse(add_minhash.called)
+        # Without filters or MinHash signatures, n-grams are not
+        # hashed.
+        self.assertFalse(hash_ngrams.called)
+
     def test_analyse(self):
         store = tacl.DataStore(':memory:')
         store._conn = MagicMock(spec_set=sqlite3.Connection)
@@ -240,6 +329,18 @@ class DataStoreTestCase (TaclTestCase):
     def test_csv(self):
         pass
 
+    def test_csv_cached_stdout(self):
+        """Tests that results being cached while written to stdout on
+        Windows are written with the same line terminator as uncached
+        results."""
+        store = tacl.DataStore(':memory:')
+        with patch('sys.platform', 'win32'), \
+                patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            writer = QueryCache(store._conn, 1000).get_writer(sys.stdout)
+            self.assertIs(writer.target, sys.stdout)
+            store._csv([(1, 2)], ['a', 'b'], writer)
+            self.assertEqual(stdout.getvalue(), 'a,b\n1,2\n')
+
     def test_delete_text_ngrams(self):
         store = tacl.DataStore(':memory:')
         store._conn = MagicMock(spec_set=sqlite3.Connection)
@@ -286,6 +387,9 @@ class DataStoreTestCase (TaclTestCase):
         get_placeholders = self._create_patch(
             'tacl.DataStore._get_placeholders', False)
         get_placeholders.return_value = sentinel.placeholders
+        get_ngram_filter_counts = self._create_patch(
+            'tacl.DataStore._get_ngram_filter_counts', False)
+        get_ngram_filter_counts.return_value = None
         log_query_plan = self._create_patch('tacl.DataStore._log_query_plan',
                                             False)
         input_fh = MagicMock(name='fh')
@@ -298,6 +402,8 @@ class DataStoreTestCase (TaclTestCase):
         output_fh = store.diff_asymmetric(catalogue, sentinel.prime_label,
                                           tokenizer, input_fh)
         set_labels.assert_called_once_with(store, catalogue)
+        get_ngram_filter_counts.assert_called_once_with(
+            [sentinel.prime_label, sentinel.label])
         get_placeholders.assert_called_once_with([sentinel.label])
         self.assertTrue(log_query_plan.called)
         sql = tacl.constants.SELECT_DIFF_ASYMMETRIC_SQL.format(
@@ -309,6 +415,25 @@ class DataStoreTestCase (TaclTestCase):
         self.assertTrue(_diff.called)
         self.assertEqual(input_fh, output_fh)
 
+    def test_diff_asymmetric_query_engine(self):
+        # The n-gram filters are not consulted when the query engine
+        # is asked for.
+        set_labels = self._create_patch('tacl.DataStore._set_labels')
+        set_labels.return_value = {'A': 1, 'B': 1}
+        get_ngram_filter_counts = self._create_patch(
+            'tacl.DataStore._get_ngram_filter_counts', False)
+        _diff = self._create_patch('tacl.DataStore._diff', False)
+        _diff.return_value = sentinel.output_fh
+        store = tacl.DataStore(':memory:')
+        store._conn = MagicMock(spec_set=sqlite3.Connection)
+        output_fh = store.diff_asymmetric(
+            MagicMock(name='catalogue'), 'A', MagicMock(name='tokenizer'),
+            sentinel.output_fh,
+            engine=tacl.constants.DIFF_ASYMMETRIC_ENGINE_QUERY)
+        self.assertFalse(get_ngram_filter_counts.called)
+        self.assertTrue(store._conn.execute.called)
+        self.assertEqual(output_fh, sentinel.output_fh)
+
     def test_diff_asymmetric_invalid_label(self):
         # Tests that the right error is raised when the supplied label
         # is not present in the catalogue.
@@ -460,6 +585,22 @@ class DataStoreTestCase (TaclTestCase):
     def test_initialise_database(self):
         pass
 
+    def test_is_ngram_filter_cheaper(self):
+        # Testing the prime label's n-grams against each other
+        # witness' filters must cost no more than reading the other
+        # witnesses' n-grams.
+        is_cheaper = tacl.DataStore._is_ngram_filter_cheaper
+        filter_counts = {'A': {2: (1, 10), 3: (1, 10)},
+                         'B': {2: (10, 300), 3: (10, 300)}}
+        self.assertTrue(is_cheaper(filter_counts, 'A', ['B']))
+        filter_counts['B'] = {2: (10, 299), 3: (10, 300)}
+        self.assertFalse(is_cheaper(filter_counts, 'A', ['B']))
+        # Sizes the prime label's witnesses lack need no tests.
+        filter_counts['B'] = {2: (10, 299), 4: (10, 1000)}
+        self.assertTrue(is_cheaper(filter_counts, 'A', ['B']))
+        with patch('tacl.constants.NGRAM_FILTER_MAXIMUM_TESTS', 99):
+            self.assertFalse(is_cheaper(filter_counts, 'A', ['B']))
+
     def test_intersection(self):
         labels = [sentinel.label1, sentinel.label2]
         set_labels = self._create_patch('tacl.DataStore._set_labels')
@@ -469,6 +610,8 @@ class DataStoreTestCase (TaclTestCase):
         get_placeholders = self._create_patch(
             'tacl.DataStore._get_placeholders', False)
         get_placeholders.return_value = sentinel.placeholders
+        get_ngram_filter_counts = self._create_patch(
+            'tacl.DataStore._get_ngram_filter_counts', False)
         log_query_plan = self._create_patch('tacl.DataStore._log_query_plan',
                                             False)
         input_fh = MagicMock(name='fh')
@@ -479,6 +622,8 @@ class DataStoreTestCase (TaclTestCase):
         store._conn = MagicMock(spec_set=sqlite3.Connection)
         cursor = store._conn.execute.return_value
         output_fh = store.intersection(catalogue, input_fh)
+        # The n-gram filters are used only when asked for.
+        self.assertFalse(get_ngram_filter_counts.called)
         set_labels.assert_called_once_with(store, catalogue)
         get_placeholders.assert_called_once_with(labels)
         self.assertTrue(log_query_plan.called)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import pickle
 import unittest
 
 import pandas as pd
@@ -16,12 +17,10 @@ class NgramHighlightReportTestCase (TaclTestCase):
             tacl.constants.TOKENIZER_JOINER_CBETA)
 
     def test_highlight(self):
-        input_text = (
-            '<span>火</span><span>無</span><span>[火*因]</span>。'
-            '<span>是</span><span>故</span><span>顯</span><span>物</span>')
-        ngrams = ['無[火*因]是']
+        input_text = '火無[火*因]。是故顯物'
+        ngrams = [['無[火*因]是']]
         report = tacl.NgramHighlightReport(None, self._tokenizer)
-        actual_text = report._highlight(input_text, ngrams, True)
+        actual_text = report._highlight(input_text, ngrams, [])
         expected_text = (
             '<span>火</span><span class="highlight1">無</span>'
             '<span class="highlight1">[火*因]</span>。'
@@ -29,32 +28,43 @@ class NgramHighlightReportTestCase (TaclTestCase):
             '<span>物</span>')
         self.assertEqual(actual_text, expected_text)
 
+    def test_highlight_groups(self):
+        input_text = '火無[火*因]。是故顯物'
+        ngrams = [['無[火*因]是', '顯物'], ['是故']]
+        report = tacl.NgramHighlightReport(None, self._tokenizer)
+        actual_text = report._highlight(input_text, ngrams, [])
+        expected_text = (
+            '<span>火</span><span class="highlight1">無</span>'
+            '<span class="highlight1">[火*因]</span>。'
+            '<span class="highlight2">是</span>'
+            '<span class="highlight2">故</span>'
+            '<span class="highlight1">顯</span>'
+            '<span class="highlight1">物</span>')
+        self.assertEqual(actual_text, expected_text)
+
     def test_highlight_minus(self):
-        input_text = (
-            '<span class="highlight2">火</span><span class="highlight">無</span>'
-            '<span class="highlight1">[火*因]</span>。<span class="highlight1">'
-            '是</span><span>故</span><span class="highlight2">火</span>'
-            '<span>顯</span><span>物</span><span class="highlight2">火</span>')
+        input_text = '火無[火*因]。是故火顯物火'
+        ngrams = [['無[火*因]是'], ['火']]
         minus_ngrams = ['火顯']
         report = tacl.NgramHighlightReport(None, self._tokenizer)
-        actual_text = report._highlight(input_text, minus_ngrams, False)
+        actual_text = report._highlight(input_text, ngrams, minus_ngrams)
         expected_text = (
-            '<span class="highlight2">火</span><span class="highlight">無</span>'
-            '<span class="highlight1">[火*因]</span>。<span class="highlight1">'
-            '是</span><span>故</span><span>火</span><span>顯</span><span>物'
-            '</span><span class="highlight2">火</span>')
+            '<span class="highlight2">火</span><span class="highlight1">無'
+            '</span><span class="highlight1">[火*因]</span>。'
+            '<span class="highlight1">是</span><span>故</span><span>火</span>'
+            '<span>顯</span><span>物</span><span class="highlight2">火</span>')
         self.assertEqual(actual_text, expected_text)
 
-    def test_prepare_text_cbeta(self):
-        input_text = '無[火*因]是<物即\n\n    同如'
+    def test_highlight_no_ngrams_cbeta(self):
+        input_text = '無[火*因]是物即\n\n    同如'
         expected_text = (
             '<span>無</span><span>[火*因]</span><span>是</span><span>物</span>'
             '<span>即</span>\n\n    <span>同</span><span>如</span>')
         report = tacl.NgramHighlightReport(None, self._tokenizer)
-        actual_text = report._prepare_text(input_text)
+        actual_text = report._highlight(input_text, [], [])
         self.assertEqual(actual_text, expected_text)
 
-    def test_prepare_text_pagel(self):
+    def test_highlight_no_ngrams_pagel(self):
         input_text = "'dzin dang | snang\n \nba'i"
         expected_text = (
             "<span>'dzin</span> <span>dang</span> | <span>snang</span>\n \n"
@@ -62,9 +72,16 @@ class NgramHighlightReportTestCase (TaclTestCase):
         tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_PAGEL,
                                    tacl.constants.TOKENIZER_JOINER_PAGEL)
         report = tacl.NgramHighlightReport(None, tokenizer)
-        actual_text = report._prepare_text(input_text)
+        actual_text = report._highlight(input_text, [], [])
         self.assertEqual(actual_text, expected_text)
 
+    def test_pickle(self):
+        # The logger is not pickled, but is got again by name.
+        report = tacl.NgramHighlightReport(None, self._tokenizer, 2)
+        self.assertNotIn('_logger', report.__getstate__())
+        unpickled = pickle.loads(pickle.dumps(report))
+        self.assertIs(unpickled._logger, report._logger)
+
 
 class ResultsHighlightReportTestCase (TaclTestCase):
 
@@ -122,23 +139,8 @@ class ResultsHighlightReportTestCase (TaclTestCase):
         expected_text_list = ['t2/base.txt', 't2/大.txt', 't3/base.txt']
         self.assertEqual(actual_text_list, expected_text_list)
 
-    def test_get_regexp_pattern(self):
-        input_ngram = 'ab[cd]e'
-        report = tacl.ResultsHighlightReport(None, self._tokenizer)
-        actual_pattern = report._get_regexp_pattern(input_ngram)
-        expected_pattern = (r'(<span[^>]*>a</span>\W*<span[^>]*>b</span>\W*'
-                            r'<span[^>]*>\[cd\]</span>\W*<span[^>]*>e</span>)')
-        self.assertEqual(actual_pattern, expected_pattern)
-
     def test_highlight(self):
-        input_text = (
-            '<span data-count="0" data-texts=" ">火</span>'
-            '<span data-count="0" data-texts=" ">無</span>'
-            '<span data-count="0" data-texts=" ">[火*因]</span>。'
-            '<span data-count="0" data-texts=" ">是</span>'
-            '<span data-count="0" data-texts=" ">故</span>'
-            '<span data-count="0" data-texts=" ">顯</span>'
-            '<span data-count="0" data-texts=" ">物</span>')
+        input_text = '火無[火*因]。是故顯物'
         input_results = pd.DataFrame([
             {tacl.constants.NGRAM_FIELDNAME: '無[火*因]是',
              tacl.constants.SIZE_FIELDNAME: '3',
@@ -158,8 +160,34 @@ class ResultsHighlightReportTestCase (TaclTestCase):
             '<span data-count="0" data-texts=" ">物</span>')
         self.assertEqual(actual_text, expected_text)
 
-    def test_prepare_text_cbeta(self):
-        input_text = '無[火*因]是<物即\n\n    同如'
+    def test_highlight_overlapping(self):
+        input_text = '火火火顯'
+        input_results = pd.DataFrame([
+            {tacl.constants.NGRAM_FIELDNAME: '火火',
+             tacl.constants.SIZE_FIELDNAME: '2',
+             tacl.constants.WORK_FIELDNAME: 't2',
+             tacl.constants.SIGLUM_FIELDNAME: 'base',
+             tacl.constants.COUNT_FIELDNAME: '2',
+             tacl.constants.LABEL_FIELDNAME: 'B'},
+            {tacl.constants.NGRAM_FIELDNAME: '火顯',
+             tacl.constants.SIZE_FIELDNAME: '2',
+             tacl.constants.WORK_FIELDNAME: 't1',
+             tacl.constants.SIGLUM_FIELDNAME: 'a',
+             tacl.constants.COUNT_FIELDNAME: '1',
+             tacl.constants.LABEL_FIELDNAME: 'A'}])
+        report = tacl.ResultsHighlightReport(None, self._tokenizer)
+        actual_text = report._highlight(input_text, input_results)
+        expected_text = (
+            '<span data-count="0" data-texts=" t2/base.txt ">火</span>'
+            '<span data-count="0" data-texts=" t2/base.txt ">火</span>'
+            '<span data-count="0" data-texts=" t1/a.txt t2/base.txt ">火'
+            '</span>'
+            '<span data-count="0" data-texts=" t1/a.txt ">顯</span>')
+        self.assertEqual(actual_text, expected_text)
+
+    def test_highlight_no_matches_cbeta(self):
+        input_text = '無[火*因]是物即\n\n    同如'
+        input_results = pd.DataFrame(columns=tacl.constants.QUERY_FIELDNAMES)
         expected_text = (
             '<span data-count="0" data-texts=" ">無</span>'
             '<span data-count="0" data-texts=" ">[火*因]</span>'
@@ -169,11 +197,12 @@ class ResultsHighlightReportTestCase (TaclTestCase):
             '    <span data-count="0" data-texts=" ">同</span>'
             '<span data-count="0" data-texts=" ">如</span>')
         report = tacl.ResultsHighlightReport(None, self._tokenizer)
-        actual_text = report._prepare_text(input_text)
+        actual_text = report._highlight(input_text, input_results)
         self.assertEqual(actual_text, expected_text)
 
-    def test_prepare_text_pagel(self):
+    def test_highlight_no_matches_pagel(self):
         input_text = "'dzin dang | snang\n \nba'i"
+        input_results = pd.DataFrame(columns=tacl.constants.QUERY_FIELDNAMES)
         expected_text = (
             '''<span data-count="0" data-texts=" ">'dzin</span>'''
             ' <span data-count="0" data-texts=" ">dang</span> |'
@@ -182,7 +211,7 @@ class ResultsHighlightReportTestCase (TaclTestCase):
         tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_PAGEL,
                                    tacl.constants.TOKENIZER_JOINER_PAGEL)
         report = tacl.ResultsHighlightReport(None, tokenizer)
-        actual_text = report._prepare_text(input_text)
+        actual_text = report._highlight(input_text, input_results)
         self.assertEqual(actual_text, expected_text)
 
 
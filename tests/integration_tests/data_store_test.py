@@ -1,5 +1,6 @@
 import io
 import os.path
+import tempfile
 import unittest
 
 import tacl
@@ -19,7 +20,8 @@ class DataStoreIntegrationTestCase (TaclTestCase):
         self._catalogue = tacl.Catalogue()
         self._catalogue.load(os.path.join(self._data_dir, 'catalogue.txt'))
         self._store = tacl.DataStore(':memory:')
-        self._store.add_ngrams(self._corpus, 1, 3)
+        self._store.add_ngrams(self._corpus, 1, 3, filters=True,
+                               minhashes=True)
 
     def test_add_ngrams(self):
         self._store._conn.row_factory = None
@@ -241,6 +243,27 @@ class DataStoreIntegrationTestCase (TaclTestCase):
         ]
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_diff_asymmetric_engines(self):
+        tokenizer = tacl.Tokenizer(*tacl.constants.TOKENIZERS['cbeta'])
+        expected_rows = self._get_rows_from_csv(self._store.diff_asymmetric(
+            self._catalogue, 'A', tokenizer, io.StringIO(newline='')))
+        for engine in tacl.constants.DIFF_ASYMMETRIC_ENGINES:
+            actual_rows = self._get_rows_from_csv(
+                self._store.diff_asymmetric(
+                    self._catalogue, 'A', tokenizer, io.StringIO(newline=''),
+                    engine=engine))
+            self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_diff_asymmetric_without_ngram_filters(self):
+        tokenizer = tacl.Tokenizer(*tacl.constants.TOKENIZERS['cbeta'])
+        expected_rows = self._get_rows_from_csv(self._store.diff_asymmetric(
+            self._catalogue, 'A', tokenizer, io.StringIO(newline='')))
+        self._store._conn.execute('DELETE FROM TextNGramFilter')
+        actual_rows = self._get_rows_from_csv(self._store.diff_asymmetric(
+            self._catalogue, 'A', tokenizer, io.StringIO(newline=''),
+            engine=tacl.constants.DIFF_ASYMMETRIC_ENGINE_FILTER))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
     def test_diff_supplied(self):
         tokenizer = tacl.Tokenizer(*tacl.constants.TOKENIZERS['cbeta'])
         supplied_dir = os.path.join(self._data_dir, 'supplied_input')
@@ -301,6 +324,42 @@ class DataStoreIntegrationTestCase (TaclTestCase):
             ('th', '2', 'T3', 'base', '1', 'C')]
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_intersection_without_ngram_filters(self):
+        expected_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline='')))
+        self._store._conn.execute('DELETE FROM TextNGramFilter')
+        actual_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline='')))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+        # Adding n-grams without filters adds no missing filters,
+        # but with them does.
+        self._store.add_ngrams(self._corpus, 1, 3)
+        self.assertIsNone(self._store._get_ngram_filter_counts(
+            list(self._store._set_labels(self._catalogue))))
+        self._store.add_ngrams(self._corpus, 1, 3, filters=True)
+        self.assertIsNotNone(self._store._get_ngram_filter_counts(
+            list(self._store._set_labels(self._catalogue))))
+        actual_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline='')))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_intersection_engines(self):
+        expected_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline=''),
+            engine=tacl.constants.INTERSECT_ENGINE_SUBQUERY))
+        for engine in tacl.constants.INTERSECT_ENGINES:
+            actual_rows = self._get_rows_from_csv(self._store.intersection(
+                self._catalogue, io.StringIO(newline=''), engine=engine))
+            self.assertEqual(set(actual_rows), set(expected_rows),
+                             engine)
+        # The filter engine still gives the intersection when there
+        # are no n-gram filters.
+        self._store._conn.execute('DELETE FROM TextNGramFilter')
+        actual_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline=''),
+            engine=tacl.constants.INTERSECT_ENGINE_FILTER))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
     def test_intersection_supplied(self):
         supplied_dir = os.path.join(self._data_dir, 'supplied_input')
         results = [os.path.join(supplied_dir, 'intersect_input_1.csv'),
@@ -335,6 +394,138 @@ class DataStoreIntegrationTestCase (TaclTestCase):
             MalformedQueryError, self._store.intersection_supplied,
             results, labels, io.StringIO(newline=''))
 
+    def test_intersection_read_only(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'test.db')
+            store = tacl.DataStore(db_path)
+            store.add_ngrams(self._corpus, 1, 2)
+            store._conn.close()
+            read_only_store = tacl.DataStore(db_path, read_only=True)
+            actual_rows = self._get_rows_from_csv(
+                read_only_store.intersection(
+                    self._catalogue, io.StringIO(newline='')))
+            read_only_store._conn.close()
+            # The labels set for the query must not have been written
+            # to the database.
+            store = tacl.DataStore(db_path)
+            labels = store._conn.execute(
+                'SELECT DISTINCT label FROM Text').fetchall()
+            store._conn.close()
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('t', '1', 'T1', 'base', '2', 'A'),
+            ('t', '1', 'T1', 'a', '2', 'A'),
+            ('t', '1', 'T2', 'base', '2', 'B'),
+            ('t', '1', 'T2', 'a', '2', 'B'),
+            ('t', '1', 'T3', 'base', '2', 'C'),
+            ('h', '1', 'T1', 'base', '1', 'A'),
+            ('h', '1', 'T1', 'a', '1', 'A'),
+            ('h', '1', 'T2', 'base', '2', 'B'),
+            ('h', '1', 'T2', 'a', '2', 'B'),
+            ('h', '1', 'T3', 'base', '1', 'C'),
+            ('th', '2', 'T1', 'base', '1', 'A'),
+            ('th', '2', 'T1', 'a', '1', 'A'),
+            ('th', '2', 'T2', 'base', '1', 'B'),
+            ('th', '2', 'T2', 'a', '1', 'B'),
+            ('th', '2', 'T3', 'base', '1', 'C')]
+        self.assertEqual(set(actual_rows), set(expected_rows))
+        self.assertEqual([tuple(row) for row in labels], [('',)])
+
+    def test_shared_ngrams(self):
+        catalogue = tacl.Catalogue({'T1': 'A', 'T2': 'A', 'T3': 'B',
+                                    'T4': 'C'})
+        actual_rows = self._store.shared_ngrams(
+            catalogue, 2, 'C').values.tolist()
+        expected_rows = [
+            ['T1', 'a', 'T2', 6, 4, 8],
+            ['T1', 'a', 'T3', 1, 1, 8],
+            ['T1', 'base', 'T2', 6, 3, 9],
+            ['T1', 'base', 'T3', 1, 1, 9],
+            ['T2', 'a', 'T1', 6, 3, 10],
+            ['T2', 'a', 'T3', 1, 1, 10],
+            ['T2', 'base', 'T1', 5, 2, 10],
+            ['T2', 'base', 'T3', 1, 1, 10],
+            ['T3', 'base', 'T1', 1, 1, 3],
+            ['T3', 'base', 'T2', 1, 1, 3],
+        ]
+        self.assertEqual(actual_rows, expected_rows)
+
+    def test_query_cache(self):
+        store = tacl.DataStore(':memory:', query_cache_size=1)
+        store.add_ngrams(self._corpus, 1, 3)
+        diff = store.diff(self._catalogue, self._tokenizer,
+                          io.StringIO(newline='')).getvalue()
+        expected = store.intersection(
+            self._catalogue, io.StringIO(newline='')).getvalue()
+        # Changing the n-gram data other than by adding n-grams does
+        # not invalidate the cache.
+        store._conn.execute('UPDATE TextNGram SET count = count + 1')
+        actual = store.intersection(
+            self._catalogue, io.StringIO(newline='')).getvalue()
+        self.assertEqual(actual, expected)
+        self.assertEqual(store.diff(self._catalogue, self._tokenizer,
+                                    io.StringIO(newline='')).getvalue(),
+                         diff)
+        # A different query is not supplied from the cache.
+        catalogue = tacl.Catalogue(self._catalogue)
+        del catalogue['T5']
+        actual = store.intersection(
+            catalogue, io.StringIO(newline='')).getvalue()
+        self.assertNotEqual(actual, expected)
+        # Adding n-grams invalidates the cache.
+        store.add_ngrams(self._corpus, 1, 3)
+        actual = store.intersection(
+            self._catalogue, io.StringIO(newline='')).getvalue()
+        self.assertNotEqual(actual, expected)
+        uncached_store = tacl.DataStore(':memory:')
+        uncached_store._conn = store._conn
+        self.assertEqual(actual, uncached_store.intersection(
+            self._catalogue, io.StringIO(newline='')).getvalue())
+
+    def test_query_cache_keyword_arguments(self):
+        """Tests that cached queries may be passed their output file, and
+        arguments that are not part of the cache key, by keyword."""
+        store = tacl.DataStore(':memory:', query_cache_size=1)
+        store.add_ngrams(self._corpus, 1, 3)
+        expected_rows = self._get_rows_from_csv(self._store.intersection(
+            self._catalogue, io.StringIO(newline='')))
+        # The second query is supplied from the cache.
+        for engine in (tacl.constants.INTERSECT_ENGINE_SUBQUERY,
+                       tacl.constants.INTERSECT_ENGINE_MERGE):
+            actual_rows = self._get_rows_from_csv(store.intersection(
+                self._catalogue, output_fh=io.StringIO(newline=''),
+                engine=engine))
+            self.assertEqual(set(actual_rows), set(expected_rows))
+        self.assertEqual(store._conn.execute(
+            'SELECT COUNT(*) FROM QueryCache').fetchone()[0], 1)
+        expected = self._store.search(
+            self._catalogue, ['the'], io.StringIO(newline='')).getvalue()
+        actual = store.search(self._catalogue, ngrams=['the'],
+                              output_fh=io.StringIO(newline='')).getvalue()
+        self.assertEqual(actual, expected)
+        actual = store.search(self._catalogue, ['the'],
+                              io.StringIO(newline='')).getvalue()
+        self.assertEqual(actual, expected)
+
+    def test_query_cache_eviction(self):
+        store = tacl.DataStore(':memory:', query_cache_size=1)
+        store.add_ngrams(self._corpus, 1, 3)
+        store.search(self._catalogue, ['the'], io.StringIO(newline=''))
+        store.search(self._catalogue, ['we'], io.StringIO(newline=''))
+        size = store._conn.execute(
+            'SELECT SUM(size) FROM QueryCache').fetchone()[0]
+        # Reduce the cache size so that only the most recently used
+        # results fit.
+        store._cache._max_size = size - 1
+        store.search(self._catalogue, ['the'], io.StringIO(newline=''))
+        store.search(self._catalogue, ['seh'], io.StringIO(newline=''))
+        store._conn.row_factory = None
+        keys = store._conn.execute('SELECT key FROM QueryCache').fetchall()
+        expected_keys = [(store._cache.get_key(
+            'search', self._catalogue, ngrams),)
+                         for ngrams in (['seh'], ['the'])]
+        self.assertEqual(set(keys), set(expected_keys))
+
     def test_search(self):
         ngrams = ['the', 'seh', 'we']
         actual_rows = self._get_rows_from_csv(
@@ -353,6 +544,66 @@ class DataStoreIntegrationTestCase (TaclTestCase):
         ]
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_search_without_ngram_filters(self):
+        ngrams = ['the', 'seh', 'we', 'zz']
+        expected_rows = self._get_rows_from_csv(self._store.search(
+            self._catalogue, ngrams, io.StringIO(newline='')))
+        self._store._conn.execute('DROP TABLE TextNGramFilter')
+        actual_rows = self._get_rows_from_csv(self._store.search(
+            self._catalogue, ngrams, io.StringIO(newline='')))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_similar(self):
+        actual_rows = self._get_rows_from_csv(self._store.similar(
+            'T1', 2, 0, io.StringIO(newline='')))
+        self.assertEqual(actual_rows[0], tacl.constants.SIMILAR_FIELDNAMES)
+        conn = self._store._conn
+        ngrams = {}
+        for work, siglum, ngram in conn.execute(
+                'SELECT Text.work, Text.siglum, TextNGram.ngram '
+                'FROM Text, TextNGram '
+                'WHERE Text.id = TextNGram.text AND TextNGram.size = 2'):
+            ngrams.setdefault((work, siglum), set()).add(ngram)
+        jaccards = []
+        for work, siglum, related_work, related_siglum, size, jaccard in \
+                actual_rows[1:]:
+            self.assertEqual(work, 'T1')
+            self.assertNotEqual(related_work, 'T1')
+            self.assertEqual(size, '2')
+            witness = ngrams[(work, siglum)]
+            related_witness = ngrams[(related_work, related_siglum)]
+            expected_jaccard = len(witness & related_witness) / len(
+                witness | related_witness)
+            self.assertAlmostEqual(float(jaccard), expected_jaccard,
+                                   delta=0.2)
+            jaccards.append(float(jaccard))
+        self.assertEqual(jaccards, sorted(jaccards, reverse=True))
+        # The witnesses of T2 share the most 2-grams with those of T1.
+        self.assertIn(('T1', 'base', 'T2', 'base'),
+                      [row[:4] for row in actual_rows])
+        # The largest size of n-gram is used by default.
+        actual_rows = self._get_rows_from_csv(self._store.similar(
+            'T1', None, 0.15, io.StringIO(newline='')))
+        self.assertTrue(actual_rows[1:])
+        for row in actual_rows[1:]:
+            self.assertEqual(row[4], '3')
+            self.assertGreaterEqual(float(row[5]), 0.15)
+        self.assertRaises(MalformedQueryError, self._store.similar, 'T1', 4,
+                          0, io.StringIO(newline=''))
+
+    def test_similar_without_minhashes(self):
+        store = tacl.DataStore(':memory:')
+        store.add_ngrams(self._corpus, 1, 3)
+        self.assertRaises(MalformedQueryError, store.similar, 'T1', 2, 0,
+                          io.StringIO(newline=''))
+        # Adding n-grams with MinHash signatures adds those that are
+        # missing.
+        store.add_ngrams(self._corpus, 1, 3, minhashes=True)
+        self.assertEqual(
+            store.similar('T1', 2, 0, io.StringIO(newline='')).getvalue(),
+            self._store.similar('T1', 2, 0,
+                                io.StringIO(newline='')).getvalue())
+
     def test_validate_missing_text(self):
         self._catalogue['missing'] = 'A'
         with self.assertRaises(FileNotFoundError):
@@ -0,0 +1,153 @@
+import io
+import itertools
+import os.path
+import pickle
+import tempfile
+import unittest
+import unittest.mock
+
+import pandas as pd
+
+import tacl
+from tacl.exceptions import MalformedQueryError
+from ..tacl_test_case import TaclTestCase
+
+
+class JitCReportIntegrationTestCase (TaclTestCase):
+
+    def setUp(self):
+        self._tokenizer = tacl.Tokenizer(
+            tacl.constants.TOKENIZER_PATTERN_CBETA,
+            tacl.constants.TOKENIZER_JOINER_CBETA)
+        data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self._corpus = tacl.Corpus(os.path.join(data_dir, 'stripped'),
+                                   self._tokenizer)
+        self._catalogue = tacl.Catalogue(
+            {'T1': 'A', 'T2': 'A', 'T5': 'A', 'T3': 'B', 'T4': 'B'})
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._temp_dir = temp_dir.name
+        self._db_path = os.path.join(self._temp_dir, 'test.db')
+        store = tacl.DataStore(self._db_path)
+        store.add_ngrams(self._corpus, 1, 3)
+        store._conn.close()
+
+    def _generate(self, store, name, processes=1, size=None):
+        """Generates a JITC report in a directory called `name`, and
+        returns the path to it and the context with which its HTML
+        report would be rendered."""
+        output_dir = os.path.join(self._temp_dir, name)
+        report = tacl.JitCReport(store, self._corpus, self._tokenizer,
+                                 processes)
+        # The report's HTML template is not part of this package, so
+        # the report is not written out.
+        with unittest.mock.patch.object(tacl.JitCReport, '_write',
+                                        autospec=True) as write:
+            report.generate(output_dir, self._catalogue, 'A', size)
+        store._conn.close()
+        return output_dir, write.call_args[0][1]
+
+    def test_generate_cached_store(self):
+        """Tests that a report generated with a store that caches queries
+        is the same as one without."""
+        expected_dir, expected_context = self._generate(
+            tacl.DataStore(self._db_path), 'uncached')
+        actual_dir, actual_context = self._generate(
+            tacl.DataStore(self._db_path, query_cache_size=1), 'cached')
+        self.assertEqual(actual_context, expected_context)
+        self._compare_results_dirs(actual_dir, expected_dir)
+
+    def test_generate_processes(self):
+        """Tests that a report generated using a pool of processes is the
+        same as one generated serially."""
+        expected_dir, expected_context = self._generate(
+            tacl.DataStore(self._db_path), 'serial')
+        actual_dir, actual_context = self._generate(
+            tacl.DataStore(self._db_path), 'parallel', processes=2)
+        self.assertEqual(actual_context, expected_context)
+        self._compare_results_dirs(actual_dir, expected_dir)
+
+    def test_generate_processes_locked(self):
+        """Tests that generating a report using a pool of processes with a
+        store that holds the database locked raises an error."""
+        store = tacl.DataStore(self._db_path)
+        store.counts(self._catalogue, io.StringIO())
+        report = tacl.JitCReport(store, self._corpus, self._tokenizer, 2)
+        self.assertRaises(MalformedQueryError, report.generate,
+                          os.path.join(self._temp_dir, 'locked'),
+                          self._catalogue, 'A')
+        store._conn.close()
+
+    def test_pickle(self):
+        """Tests that a report passed to a worker process carries no
+        logger, and opens its own read-only store."""
+        store = tacl.DataStore(self._db_path)
+        report = tacl.JitCReport(store, self._corpus, self._tokenizer, 2)
+        state = report.__getstate__()
+        self.assertNotIn('_logger', state)
+        self.assertNotIn('_logger', state['_supplied_store'].__getstate__())
+        unpickled = pickle.loads(pickle.dumps(report))
+        self.addCleanup(tacl.jitc._read_only_stores.pop, store.db_name)
+        self.assertIs(unpickled._logger, report._logger)
+        self.assertEqual(unpickled._store.db_name, store.db_name)
+        self.assertTrue(unpickled._store._read_only)
+        self.assertIs(unpickled._supplied_store._logger,
+                      report._supplied_store._logger)
+        store._conn.close()
+
+    def test_generate_shared_ngrams(self):
+        """Tests that the matrix of shared n-grams from which a report is
+        generated when given an n-gram size has the counts found in
+        the intersections from which a report is otherwise generated."""
+        size = 2
+        output_dir, context = self._generate(tacl.DataStore(self._db_path),
+                                             'intersections')
+        data_dir = os.path.join(output_dir, 'data')
+        maybe_works = sorted(work for work, label in self._catalogue.items()
+                             if label == 'A')
+        expected_rows = set()
+        for yes_work, maybe_work in itertools.permutations(maybe_works, 2):
+            no_ngrams = set(self._read_results(os.path.join(
+                data_dir, yes_work, 'intersect_with_no.csv'))[
+                    tacl.constants.NGRAM_FIELDNAME])
+            results = self._read_results(os.path.join(
+                data_dir, 'ym_intersects', '{}_intersect_{}.csv'.format(
+                    *sorted([yes_work, maybe_work]))))
+            results = results[
+                (results[tacl.constants.WORK_FIELDNAME] == maybe_work) &
+                (results[tacl.constants.SIZE_FIELDNAME] == size)]
+            for siglum in self._corpus.get_sigla(maybe_work):
+                witness_results = results[
+                    results[tacl.constants.SIGLUM_FIELDNAME] == siglum]
+                if witness_results.empty:
+                    continue
+                exclusive_results = witness_results[~witness_results[
+                    tacl.constants.NGRAM_FIELDNAME].isin(no_ngrams)]
+                tokens = self._corpus.get_witness(
+                    maybe_work, siglum).get_tokens()
+                expected_rows.add((
+                    maybe_work, siglum, yes_work,
+                    witness_results[tacl.constants.COUNT_FIELDNAME].sum(),
+                    exclusive_results[tacl.constants.COUNT_FIELDNAME].sum(),
+                    len(tokens) - size + 1))
+        store = tacl.DataStore(self._db_path)
+        matrix = store.shared_ngrams(self._catalogue, size, 'B')
+        store._conn.close()
+        matrix = matrix.reindex(
+            columns=tacl.constants.SHARED_NGRAMS_FIELDNAMES)
+        actual_rows = set(tuple(row) for row in
+                          matrix.itertuples(index=False))
+        self.assertEqual(actual_rows, expected_rows)
+        # The report is generated from the matrix for each work.
+        output_dir, context = self._generate(tacl.DataStore(self._db_path),
+                                             'shared', size=size)
+        self.assertEqual(context['works'], list(enumerate(maybe_works)))
+        self.assertEqual(len(context['tables']), len(maybe_works))
+
+    def _read_results(self, path):
+        return pd.read_csv(path, encoding='utf-8', na_filter=False,
+                           dtype={tacl.constants.NGRAM_FIELDNAME: str})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import os.path
 import shlex
 import subprocess
@@ -36,3 +37,23 @@ class LifetimeReportTestCase (TaclTestCase):
             report = tacl.LifetimeReport()
             report.generate(temp_dir, catalogue, results, label)
             self._compare_results_dirs(temp_dir, expected_dir)
+
+    def test_generate_numeric_works(self):
+        # Works whose names are read as numbers are reported by name.
+        catalogue = tacl.Catalogue({'1': 'A', '2': 'B'})
+        tokenizer = tacl.Tokenizer(*tacl.constants.TOKENIZERS['cbeta'])
+        results = tacl.Results(io.StringIO(
+            'ngram,size,work,siglum,count,label\n'
+            'A,1,1,wit1,1,A\n'
+            'A,1,1,wit2,3,A\n'
+            'A,1,2,wit1,2,B\n'
+            'B,1,2,wit1,1,B\n'), tokenizer)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            report = tacl.LifetimeReport()
+            report.generate(temp_dir, catalogue, results, 'A')
+            with open(os.path.join(temp_dir, 'lifetime-A.html'),
+                      encoding='utf-8') as fh:
+                html = fh.read()
+        self.assertIn('<td>A</td>\n<td>1 (1\N{EN DASH}3)</td>\n'
+                      '<td>2 (2)</td>', html)
+        self.assertIn('<td>B</td>\n<td></td>\n<td>2 (1)</td>', html)
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
 import os
+import shutil
+import tempfile
 import unittest
 
+import pandas as pd
 
 import tacl
 from ..tacl_test_case import TaclTestCase
@@ -89,6 +92,50 @@ class ResultsIntegrationTestCase (TaclTestCase):
         expected_rows = self._get_rows_from_file(expected_results)
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_extend_parallel(self):
+        input_data = os.path.join(self._data_dir,
+                                  'cbeta-non-extend-results.csv')
+        corpus = tacl.Corpus(os.path.join(self._stripped_dir, 'cbeta'),
+                             self._tokenizer)
+        results = tacl.Results(input_data, self._tokenizer)
+        results.extend(corpus)
+        expected_rows = self._get_rows_from_results(results)
+        for processes, spill in ((2, False), (1, True), (2, True)):
+            results = tacl.Results(input_data, self._tokenizer)
+            results.extend(corpus, processes, spill)
+            actual_rows = self._get_rows_from_results(results)
+            self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_extend_spill_numeric_works(self):
+        # Works whose names look like numbers should keep those names
+        # when the extended results are spilled to disk.
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        works = {'t1': '0001', 't2': '0002', 't3': '0003'}
+        corpus_dir = os.path.join(temp_dir.name, 'corpus')
+        for work, new_work in works.items():
+            shutil.copytree(os.path.join(self._stripped_dir, 'cbeta', work),
+                            os.path.join(corpus_dir, new_work))
+        corpus = tacl.Corpus(corpus_dir, self._tokenizer)
+        input_data = pd.read_csv(
+            os.path.join(self._data_dir, 'cbeta-non-extend-results.csv'),
+            encoding='utf-8', dtype={tacl.constants.NGRAM_FIELDNAME: str,
+                                     tacl.constants.WORK_FIELDNAME: str,
+                                     tacl.constants.SIGLUM_FIELDNAME: str},
+            na_filter=False)
+        input_data[tacl.constants.WORK_FIELDNAME] = input_data[
+            tacl.constants.WORK_FIELDNAME].map(works)
+        results = tacl.Results(input_data.copy(), self._tokenizer)
+        results.extend(corpus, 1, False)
+        expected_rows = self._get_rows_from_results(results)
+        results = tacl.Results(input_data.copy(), self._tokenizer)
+        results.extend(corpus, 1, True)
+        actual_rows = self._get_rows_from_results(results)
+        self.assertEqual(set(actual_rows), set(expected_rows))
+        self.assertEqual(
+            set(results._matches[tacl.constants.WORK_FIELDNAME]),
+            {'0001', '0002', '0003'})
+
     def test_extend_pagel(self):
         results = os.path.join(self._data_dir, 'pagel-non-extend-results.csv')
         command = 'tacl results -e {} -t {} {}'.format(
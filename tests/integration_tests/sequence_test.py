@@ -21,10 +21,18 @@ class SequenceIntegrationTestCase (unittest.TestCase):
 
     def test_file_creation(self):
         """Tests that only the expected files are created."""
+        self._test_file_creation('')
+
+    def test_file_creation_parallel(self):
+        """Tests that only the expected files are created when aligning
+        witnesses in multiple processes."""
+        self._test_file_creation('-p 2')
+
+    def _test_file_creation(self, options):
         corpus_dir = os.path.join(self._data_dir, 'corpus')
         results = os.path.join(self._data_dir, 'results.csv')
-        command = 'tacl align -m 4 {} {} {}'.format(
-            corpus_dir, self._actual_output_dir, results)
+        command = 'tacl align {} -m 4 {} {} {}'.format(
+            options, corpus_dir, self._actual_output_dir, results)
         subprocess.call(shlex.split(command))
         expected_files = set(['T1_base-T3_base.html', 'T1_base-T3_wit1.html',
                               'T2_base-T3_base.html', 'T2_base-T3_wit1.html'])
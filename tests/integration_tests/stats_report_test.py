@@ -16,6 +16,12 @@ class StatisticsReportIntegrationTestCase (TaclTestCase):
         self._stripped_dir = os.path.join(self._data_dir, 'stripped')
 
     def test_generate_statistics(self):
+        self._test_generate_statistics(1)
+
+    def test_generate_statistics_parallel(self):
+        self._test_generate_statistics(2)
+
+    def _test_generate_statistics(self, processes):
         tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_CBETA,
                                    tacl.constants.TOKENIZER_JOINER_CBETA)
         corpus = tacl.Corpus(self._stripped_dir, tokenizer)
@@ -31,7 +37,8 @@ class StatisticsReportIntegrationTestCase (TaclTestCase):
             ['ABCD', '4', 'b', 'base', '2', 'B'],
             )
         results_fh = self._create_csv(input_results)
-        report = tacl.StatisticsReport(corpus, tokenizer, results_fh)
+        report = tacl.StatisticsReport(corpus, tokenizer, results_fh,
+                                       processes)
         report.generate_statistics()
         actual_results = self._get_rows_from_csv(report.csv(
             io.StringIO(newline='')))
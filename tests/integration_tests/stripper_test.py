@@ -25,10 +25,14 @@ class StripperIntegrationTestCase (unittest.TestCase):
         if os.path.exists(self._actual_output_dir):
             shutil.rmtree(self._actual_output_dir)
 
-    def test_github_strip_files(self):
+    def _test_github_strip_files(self, processes=1, incremental=False):
         xml_dir = os.path.join(self._xml_dir, 'github')
-        stripper = tacl.Stripper(xml_dir, self._actual_output_dir)
+        stripper = tacl.Stripper(xml_dir, self._actual_output_dir,
+                                 processes, incremental)
         stripper.strip_files()
+        self._check_github_output()
+
+    def _check_github_output(self):
         expected_files = ['T0001/CBETA.txt', 'T0001/元.txt', 'T0001/大.txt',
                           'T0001/宋.txt', 'T0001/明.txt', 'T0002/base.txt']
         for filename in expected_files:
@@ -55,6 +59,43 @@ class StripperIntegrationTestCase (unittest.TestCase):
                 files.add(os.path.join(directory, filename))
         self.assertEqual(files, set(expected_files))
 
+    def test_github_strip_files(self):
+        self._test_github_strip_files()
+
+    def test_github_strip_files_existing_output(self):
+        self._test_github_strip_files()
+        xml_dir = os.path.join(self._xml_dir, 'github')
+        stripper = tacl.Stripper(xml_dir, self._actual_output_dir)
+        self.assertRaises(OSError, stripper.strip_files)
+
+    def test_github_strip_files_incremental(self):
+        self._test_github_strip_files(incremental=True)
+        # Output newer than its source is left untouched.
+        unchanged_path = os.path.join(self._actual_output_dir, 'T0001',
+                                      'CBETA.txt')
+        with open(unchanged_path, 'w') as fh:
+            fh.write('unchanged')
+        # Output older than its source is replaced.
+        stale_path = os.path.join(self._actual_output_dir, 'T0002',
+                                  'base.txt')
+        os.utime(stale_path, (0, 0))
+        extra_path = os.path.join(self._actual_output_dir, 'T0002',
+                                  'extra.txt')
+        with open(extra_path, 'w') as fh:
+            fh.write('extra')
+        os.utime(extra_path, (0, 0))
+        xml_dir = os.path.join(self._xml_dir, 'github')
+        stripper = tacl.Stripper(xml_dir, self._actual_output_dir,
+                                 incremental=True)
+        stripper.strip_files()
+        with open(unchanged_path) as fh:
+            self.assertEqual(fh.read(), 'unchanged')
+        self.assertFalse(os.path.exists(extra_path))
+        self.assertTrue(os.path.getmtime(stale_path) > 0)
+
+    def test_github_strip_files_parallel(self):
+        self._test_github_strip_files(processes=2)
+
 
 if __name__ == '__main__':
     unittest.main()
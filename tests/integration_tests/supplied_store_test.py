@@ -0,0 +1,87 @@
+import io
+import os.path
+import unittest
+
+import tacl
+from ..tacl_test_case import TaclTestCase
+
+
+class SuppliedStoreIntegrationTestCase (TaclTestCase):
+
+    def setUp(self):
+        self._tokenizer = tacl.Tokenizer(
+            tacl.constants.TOKENIZER_PATTERN_CBETA,
+            tacl.constants.TOKENIZER_JOINER_CBETA)
+        self._supplied_dir = os.path.join(os.path.dirname(__file__), 'data',
+                                          'supplied_input')
+        self._store = tacl.SuppliedStore()
+
+    def _get_supplied_paths(self, query):
+        return [os.path.join(self._supplied_dir, '{}_input_{}.csv'.format(
+            query, index)) for index in range(1, 4)]
+
+    def test_diff_supplied(self):
+        results = self._get_supplied_paths('diff')
+        labels = ('A', 'B', 'C')
+        actual_rows = self._get_rows_from_csv(
+            self._store.diff_supplied(results, labels, self._tokenizer,
+                                      io.StringIO(newline='')))
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('過失', '2', 'T0005', 'base', '5', 'A'),
+            ('過失', '2', 'T0003', '大', '2', 'A'),
+            ('皆不', '2', 'T0004', 'base', '1', 'A'),
+            ('皆不', '2', 'T0002', '大', '1', 'A'),
+            ('皆不', '2', 'T0003', '大', '1', 'A'),
+            ('棄捨', '2', 'T0004', '元', '4', 'A'),
+            ('棄捨', '2', 'T0003', 'base', '2', 'A'),
+            ('七佛', '2', 'T0006', 'base', '3', 'B'),
+            ('七佛', '2', 'T0004', '元', '3', 'B'),
+            ('七佛', '2', 'T0002', '大', '2', 'B'),
+            ('人子', '2', 'T0004', '元', '1', 'C'),
+            ('人子', '2', 'T0007', 'base', '1', 'C')]
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_engines(self):
+        """Tests that the supplied queries give the same results as those
+        made with a database (though not necessarily in the same
+        order)."""
+        data_store = tacl.DataStore(':memory:')
+        for query, args in (
+                ('diff', [self._tokenizer]), ('intersect', [])):
+            results = self._get_supplied_paths(query)
+            for labels in (('A', 'B', 'C'), ('A', 'B', 'A')):
+                method = '{}_supplied'.format(
+                    'diff' if query == 'diff' else 'intersection')
+                expected_rows = self._get_rows_from_csv(
+                    getattr(data_store, method)(
+                        results, labels, *args,
+                        output_fh=io.StringIO(newline='')))
+                actual_rows = self._get_rows_from_csv(
+                    getattr(self._store, method)(
+                        results, labels, *args,
+                        output_fh=io.StringIO(newline='')))
+                self.assertEqual(sorted(actual_rows), sorted(expected_rows))
+
+    def test_intersection_supplied(self):
+        results = self._get_supplied_paths('intersect')
+        labels = ('A', 'B', 'C')
+        actual_rows = self._get_rows_from_csv(
+            self._store.intersection_supplied(results, labels,
+                                              io.StringIO(newline='')))
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('龍皆起前', '4', 'T0033', '元', '1', 'A'),
+            ('龍皆起前', '4', 'T0034', '明', '2', 'A'),
+            ('龍皆起前', '4', 'T0002', 'base', '3', 'B'),
+            ('龍皆起前', '4', 'T0052', 'base', '2', 'C'),
+            ('[月*劦]生', '2', 'T0002', '明', '10', 'A'),
+            ('[月*劦]生', '2', 'T0002', 'base', '10', 'A'),
+            ('[月*劦]生', '2', 'T0023', '大', '2', 'B'),
+            ('[月*劦]生', '2', 'T0053', '大', '2', 'C'),
+        ]
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
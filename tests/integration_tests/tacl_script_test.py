@@ -33,8 +33,8 @@ class TaclScriptIntegrationTestCase (TaclTestCase):
         # these tests, define the command here.
         minimum = 1
         maximum = 3
-        ngrams_command = 'tacl ngrams {} {} {} {}'.format(
-            self._db_path, self._corpus_dir, minimum, maximum)
+        ngrams_command = 'tacl ngrams --filters --minhashes {} {} {} {}'\
+            .format(self._db_path, self._corpus_dir, minimum, maximum)
         self._ngrams_command_args = shlex.split(ngrams_command)
         if os.path.exists(self._db_path):
             raise Exception('{} exists; aborting tests that would create '
@@ -327,6 +327,28 @@ class TaclScriptIntegrationTestCase (TaclTestCase):
             ('人子', '2', 'T0007', 'base', '1', 'C')]
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_diff_supplied_without_database(self):
+        supplied_dir = os.path.join(self._data_dir, 'supplied_input')
+        results1 = os.path.join(supplied_dir, 'diff_input_1.csv')
+        results2 = os.path.join(supplied_dir, 'diff_input_2.csv')
+        command = 'tacl sdiff -l A B -s {} {}'.format(results1, results2)
+        actual_rows = self._get_rows_from_command(command)
+        expected_rows = self._get_rows_from_command(
+            'tacl sdiff -d {} -l A B -s {} {}'.format(
+                self._db_path, results1, results2))
+        self.assertEqual(set(actual_rows), set(expected_rows))
+        self.assertTrue(len(actual_rows) > 1)
+        # Database arguments are rejected without a database.
+        for argument in ('-m', '-r 2', '--query-cache-size 1'):
+            command = 'tacl sdiff {} -l A B -s {} {}'.format(
+                argument, results1, results2)
+            process = subprocess.run(
+                shlex.split(command), stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(process.returncode, 2)
+            self.assertIn(constants.SUPPLIED_DB_ARGUMENTS_ERROR,
+                          process.stderr)
+
     def test_excise(self):
         excise_dir = os.path.join(self._data_dir, 'excise')
         ngrams_list = os.path.join(excise_dir, 'ngrams.txt')
@@ -407,6 +429,39 @@ class TaclScriptIntegrationTestCase (TaclTestCase):
             ('[月*劦]生', '2', 'T0053', '大', '2', 'C')]
         self.assertEqual(set(actual_rows), set(expected_rows))
 
+    def test_intersection_supplied_without_database(self):
+        supplied_dir = os.path.join(self._data_dir, 'supplied_input')
+        results1 = os.path.join(supplied_dir, 'intersect_input_1.csv')
+        results2 = os.path.join(supplied_dir, 'intersect_input_2.csv')
+        results3 = os.path.join(supplied_dir, 'intersect_input_3.csv')
+        command = 'tacl sintersect -l A B C -s {} {} {}'.format(
+            results1, results2, results3)
+        actual_rows = self._get_rows_from_command(command)
+        expected_rows = [
+            constants.QUERY_FIELDNAMES,
+            ('龍皆起前', '4', 'T0033', '元', '1', 'A'),
+            ('龍皆起前', '4', 'T0034', '明', '2', 'A'),
+            ('龍皆起前', '4', 'T0002', 'base', '3', 'B'),
+            ('龍皆起前', '4', 'T0052', 'base', '2', 'C'),
+            ('[月*劦]生', '2', 'T0002', '明', '10', 'A'),
+            ('[月*劦]生', '2', 'T0002', 'base', '10', 'A'),
+            ('[月*劦]生', '2', 'T0023', '大', '2', 'B'),
+            ('[月*劦]生', '2', 'T0053', '大', '2', 'C')]
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_similar(self):
+        subprocess.call(self._ngrams_command_args)
+        command = 'tacl similar {} T1'.format(self._db_path)
+        actual_rows = self._get_rows_from_command(command)
+        expected_rows = [
+            constants.SIMILAR_FIELDNAMES,
+            ('T1', 'a', 'T2', 'a', '3', '0.2265625'),
+            ('T1', 'a', 'T2', 'base', '3', '0.171875'),
+            ('T1', 'base', 'T2', 'base', '3', '0.15625'),
+            ('T1', 'base', 'T2', 'a', '3', '0.1015625'),
+        ]
+        self.assertEqual(actual_rows, expected_rows)
+
     def test_search(self):
         subprocess.call(self._ngrams_command_args)
         command = 'tacl search {} {} {} {}'.format(
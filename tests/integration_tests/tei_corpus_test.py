@@ -67,3 +67,31 @@ class TEICorpusCBETAGitHubIntegrationTestCase (TEICorpusIntegrationTestCase):
         corpus.tidy()
         expected_files = ['T0001.xml', 'T0002.xml']
         self.check_tidy_results(expected_files)
+
+    def test_tidy_incremental(self):
+        corpus = tacl.TEICorpusCBETAGitHub(
+            self._xml_dir, self._actual_output_dir, incremental=True)
+        corpus.tidy()
+        expected_files = ['T0001.xml', 'T0002.xml']
+        self.check_tidy_results(expected_files)
+        # Output newer than all of its source parts is left untouched.
+        unchanged_path = os.path.join(self._actual_output_dir, 'T0001.xml')
+        with open(unchanged_path, 'w') as fh:
+            fh.write('unchanged')
+        # Output older than one of its source parts is replaced.
+        stale_path = os.path.join(self._actual_output_dir, 'T0002.xml')
+        with open(stale_path, 'w') as fh:
+            fh.write('stale')
+        os.utime(stale_path, (0, 0))
+        corpus.tidy()
+        with open(unchanged_path) as fh:
+            self.assertEqual(fh.read(), 'unchanged')
+        with open(stale_path) as fh:
+            self.assertNotEqual(fh.read(), 'stale')
+
+    def test_tidy_parallel(self):
+        corpus = tacl.TEICorpusCBETAGitHub(
+            self._xml_dir, self._actual_output_dir, processes=2)
+        corpus.tidy()
+        expected_files = ['T0001.xml', 'T0002.xml']
+        self.check_tidy_results(expected_files)
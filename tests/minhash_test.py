@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from tacl import bloom, constants, minhash
+
+
+class MinHashTestCase (unittest.TestCase):
+
+    def _get_signature(self, ngrams):
+        return minhash.create_signature(bloom.hash_ngrams(ngrams)[:, 0])
+
+    def test_estimate_jaccard(self):
+        ngrams1 = ['n-gram {}'.format(i) for i in range(0, 3000)]
+        ngrams2 = ['n-gram {}'.format(i) for i in range(1000, 4000)]
+        signature1 = self._get_signature(ngrams1)
+        signature2 = self._get_signature(ngrams2)
+        self.assertEqual(minhash.estimate_jaccard(signature1, signature1),
+                         1.0)
+        # The actual Jaccard similarity is 0.5.
+        self.assertAlmostEqual(
+            minhash.estimate_jaccard(signature1, signature2), 0.5, delta=0.15)
+        signature3 = self._get_signature(['other {}'.format(i)
+                                          for i in range(3000)])
+        self.assertLess(minhash.estimate_jaccard(signature1, signature3), 0.1)
+
+    def test_create_signature(self):
+        ngrams = ['a', 'b', 'c']
+        signature = self._get_signature(ngrams)
+        self.assertEqual(signature.shape, (constants.MINHASH_PERMUTATIONS,))
+        # The signature does not depend on the order of the n-grams,
+        # or on how they are divided into chunks.
+        self.assertEqual(signature.tolist(),
+                         self._get_signature(ngrams[::-1]).tolist())
+
+    def test_get_band_hashes(self):
+        signature1 = self._get_signature(['a', 'b', 'c'])
+        signature2 = signature1.copy()
+        signature2[0] += 1
+        hashes1 = minhash.get_band_hashes(signature1)
+        hashes2 = minhash.get_band_hashes(signature2)
+        self.assertEqual(len(hashes1), constants.MINHASH_PERMUTATIONS //
+                         constants.MINHASH_BAND_ROWS)
+        self.assertNotEqual(hashes1[0], hashes2[0])
+        self.assertEqual(hashes1[1:], hashes2[1:])
+
+    def test_to_bytes(self):
+        signature = self._get_signature(['a', 'b', 'c'])
+        self.assertEqual(
+            minhash.from_bytes(minhash.to_bytes(signature)).tolist(),
+            signature.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+from unittest.mock import patch
+
+import tacl
+from tacl import profiler
+from .tacl_test_case import TaclTestCase
+
+
+class ProfilerTestCase (TaclTestCase):
+
+    def setUp(self):
+        self._tokenizer = tacl.Tokenizer(
+            tacl.constants.TOKENIZER_PATTERN_CBETA,
+            tacl.constants.TOKENIZER_JOINER_CBETA)
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_csv(self):
+        """Tests that fetching the rows of a query is recorded separately
+        from writing them."""
+        store = tacl.DataStore(':memory:')
+        cursor = store._conn.execute(
+            'SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3')
+        recorder = profiler.enable()
+        with patch('tacl.constants.CSV_BATCH_SIZE', 2):
+            output_fh = store._csv(cursor, ['a'], io.StringIO(newline=''))
+        self.assertEqual(output_fh.getvalue(), 'a\r\n1\r\n2\r\n3\r\n')
+        events = recorder.get_trace()['traceEvents']
+        self.assertEqual(
+            [(event['name'], event['args']['rows']) for event in events],
+            [('DataStore._csv.fetch', 2), ('DataStore._csv.write', 2),
+             ('DataStore._csv.fetch', 1), ('DataStore._csv.write', 1),
+             ('DataStore._csv.fetch', 0), ('DataStore._csv', 3)])
+
+    def test_disabled(self):
+        """Tests that nothing is recorded when profiling is disabled."""
+        self.assertIsNone(profiler.disable())
+        with profiler.span('test') as span:
+            span.rows = 3
+            profiler.set_rows(4)
+        recorder = profiler.enable()
+        self.assertEqual(recorder.get_trace()['traceEvents'], [])
+
+    def test_span(self):
+        recorder = profiler.enable()
+        with profiler.span('outer'):
+            with profiler.span('inner') as span:
+                span.rows = 10
+            profiler.set_rows(20)
+        self.assertIs(profiler.disable(), recorder)
+        events = recorder.get_trace()['traceEvents']
+        self.assertEqual([event['name'] for event in events],
+                         ['inner', 'outer'])
+        inner, outer = events
+        self.assertEqual(inner['args']['rows'], 10)
+        self.assertEqual(outer['args']['rows'], 20)
+        self.assertEqual(inner['ph'], 'X')
+        self.assertTrue(outer['ts'] <= inner['ts'])
+        self.assertTrue(inner['ts'] + inner['dur'] <=
+                        outer['ts'] + outer['dur'])
+
+    def test_timed_results(self):
+        """Tests that Results operations are recorded with the number of
+        result rows."""
+        input_data = (
+            ['AB', '2', 'A', 'base', '1', 'A'],
+            ['ABC', '3', 'A', 'base', '1', 'A'],
+            ['AB', '2', 'B', 'base', '1', 'B'])
+        fh = self._create_csv(input_data)
+        results = tacl.Results(fh, self._tokenizer)
+        recorder = profiler.enable()
+        results.prune_by_ngram_size(minimum=3)
+        events = recorder.get_trace()['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['name'], 'Results.prune_by_ngram_size')
+        self.assertEqual(events[0]['args']['rows'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
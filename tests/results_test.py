@@ -177,6 +177,29 @@ class ResultsTestCase (TaclTestCase):
         actual_rows = self._get_rows_from_results(results)
         self.assertEqual(actual_rows, expected_rows)
 
+    def test_bifurcated_extend_token_boundaries(self):
+        # An n-gram is contained in a larger n-gram only as a sequence
+        # of whole tokens, not as a substring of its text.
+        tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_PAGEL,
+                                   tacl.constants.TOKENIZER_JOINER_PAGEL)
+        input_data = (
+            ['ab c', '2', 'a', 'base', '1', 'A', '2'],
+            ['ab cd e', '3', 'a', 'base', '1', 'A', '2'],
+            ['ab cd', '2', 'a', 'base', '1', 'A', '2'],
+        )
+        fieldnames = tuple(list(tacl.constants.QUERY_FIELDNAMES[:]) +
+                           [tacl.constants.LABEL_COUNT_FIELDNAME])
+        fh = self._create_csv(input_data, fieldnames=fieldnames)
+        results = tacl.Results(fh, tokenizer)
+        results._bifurcated_extend()
+        expected_rows = [
+            fieldnames,
+            ('ab c', '2', 'a', 'base', '1', 'A', '2'),
+            ('ab cd e', '3', 'a', 'base', '1', 'A', '2'),
+        ]
+        actual_rows = self._get_rows_from_results(results)
+        self.assertEqual(actual_rows, expected_rows)
+
     def test_collapse_witnesses(self):
         input_data = (
             ['AB', '2', 'a', 'base', '4', 'A'],
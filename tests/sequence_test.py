@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+import pickle
+import random
+
 import tacl
 from .tacl_test_case import TaclTestCase
 
@@ -17,3 +20,65 @@ class SequenceReportTestCase (TaclTestCase):
         actual_text = sequence_report._get_text(text)
         expected_text = 'abc{}d'.format(chr(61440))
         self.assertEqual(actual_text, expected_text)
+
+    def test_pickle(self):
+        # The corpus, results and logger are not pickled, but the
+        # logger is got again by name.
+        tokenizer = tacl.Tokenizer(*tacl.constants.TOKENIZERS['cbeta'])
+        fh = self._create_csv((['AB', '2', 't1', 'wit1', '2', 'A'],))
+        sequence_report = tacl.SequenceReport(None, tokenizer, fh)
+        state = sequence_report.__getstate__()
+        self.assertNotIn('_logger', state)
+        self.assertIsNone(state['_matches'])
+        unpickled = pickle.loads(pickle.dumps(sequence_report))
+        self.assertIs(unpickled._logger, sequence_report._logger)
+        self.assertIsNone(unpickled._matches)
+
+    def test_banded_extension(self):
+        extension = tacl.sequence.BandedExtension('abcdef', 'abxdeyyf', 2)
+        self.assertEqual(extension.align(3, 3), ('abc', 'abx', 1))
+        # Aligning longer prefixes reuses the already computed cells.
+        self.assertEqual(extension.align(6, 8),
+                         ('abcde--f', 'abxdeyyf', 3.4))
+
+    def test_banded_extension_outside_band(self):
+        extension = tacl.sequence.BandedExtension('abcdefgh', 'ab', 1)
+        self.assertEqual(extension.align(8, 2), ('abcdefgh', 'ab------', 1))
+
+    def test_seeded_aligner(self):
+        aligner = tacl.sequence.SeededAligner(
+            'xyzSEEDabc', (3, 7), 'zSEEDabd', (1, 5), 2)
+        self.assertEqual(aligner.align(1), ('zSEEDa', 'zSEEDa', 6, 0, 6))
+        self.assertEqual(aligner.align(3),
+                         ('xyzSEEDabc', '--zSEEDabd', 5.4, 0, 10))
+
+    def test_covered_spans(self):
+        covered_spans = tacl.sequence.CoveredSpans(40)
+        self.assertNotIn((0, 1), covered_spans)
+        covered_spans.add((10, 20))
+        covered_spans.add((2, 30))
+        covered_spans.add((15, 40))
+        self.assertIn((2, 30), covered_spans)
+        self.assertIn((12, 18), covered_spans)
+        self.assertIn((20, 40), covered_spans)
+        self.assertNotIn((1, 5), covered_spans)
+        self.assertNotIn((10, 35), covered_spans)
+        self.assertNotIn((35, 41), covered_spans)
+        covered_spans.add((40, 40))
+        self.assertIn((40, 40), covered_spans)
+
+    def test_covered_spans_random(self):
+        """Tests that whether a span is covered agrees with a check of
+        each covered span."""
+        rng = random.Random(0)
+        covered_spans = tacl.sequence.CoveredSpans(100)
+        spans = []
+        for i in range(200):
+            start = rng.randrange(100)
+            span = (start, rng.randrange(start, 101))
+            expected = any(covered[0] <= span[0] and covered[1] >= span[1]
+                           for covered in spans)
+            self.assertEqual(span in covered_spans, expected)
+            if rng.random() < 0.2:
+                covered_spans.add(span)
+                spans.append(span)
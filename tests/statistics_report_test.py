@@ -3,18 +3,40 @@
 import unittest
 
 import tacl
+from tacl.statistics_report import get_coverage
 from .tacl_test_case import TaclTestCase
 
 
 class ReportTestCase (TaclTestCase):
 
-    def test_merge_slices(self):
-        input_slices = [
-            [4, 7], [6, 12], [4, 6], [13, 14], [1, 2], [12, 13], [15, 18]
-        ]
-        expected_slices = [[1, 2], [4, 14], [15, 18]]
-        actual_slices = tacl.StatisticsReport._merge_slices(input_slices)
-        self.assertEqual(actual_slices, expected_slices)
+    def setUp(self):
+        self._tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_CBETA,
+                                         tacl.constants.TOKENIZER_JOINER_CBETA)
+
+    def test_get_coverage(self):
+        tokens = self._tokenizer.tokenize('ABCDABABDCABCD')
+        ngrams = ['AB', 'ABD', 'ABCD', 'AB', 'XY']
+        self.assertEqual(get_coverage(tokens, ngrams, self._tokenizer), 13)
+
+    def test_get_coverage_self_overlap(self):
+        tokens = self._tokenizer.tokenize('heheha')
+        self.assertEqual(get_coverage(tokens, ['heh'], self._tokenizer), 5)
+
+    def test_get_coverage_multi_character_tokens(self):
+        tokens = self._tokenizer.tokenize('A[B/C]DA[B/\nC]')
+        ngrams = ['A[B/C]', '[B/C]D']
+        self.assertEqual(get_coverage(tokens, ngrams, self._tokenizer), 5)
+
+    def test_get_coverage_token_boundaries(self):
+        tokenizer = tacl.Tokenizer(tacl.constants.TOKENIZER_PATTERN_LATIN,
+                                   tacl.constants.TOKENIZER_JOINER_LATIN)
+        tokens = tokenizer.tokenize('ca bd a b')
+        self.assertEqual(get_coverage(tokens, ['a b'], tokenizer), 2)
+
+    def test_get_coverage_no_matches(self):
+        tokens = self._tokenizer.tokenize('ABC')
+        self.assertEqual(get_coverage(tokens, [], self._tokenizer), 0)
+        self.assertEqual(get_coverage([], ['AB'], self._tokenizer), 0)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import pickle
 import unittest
 
 from lxml import etree
@@ -139,6 +140,17 @@ class StripTestCase (unittest.TestCase):
         actual_output = str(self.stripper.transform(etree.XML(input_xml)))
         self.assertEqual(expected_output, actual_output)
 
+    def test_pickle(self):
+        # Neither the compiled XSLT transform nor the logger is
+        # pickled; both are got again when unpickled.
+        state = self.stripper.__getstate__()
+        self.assertNotIn('transform', state)
+        self.assertNotIn('_logger', state)
+        unpickled = pickle.loads(pickle.dumps(self.stripper))
+        self.assertIs(unpickled.transform, self.stripper.transform)
+        self.assertIs(unpickled._logger, self.stripper._logger)
+        self.assertEqual(unpickled._output_dir, self.stripper._output_dir)
+
     def test_tt(self):
         """Tests that tt is stripped down to the content of
         t[@lang='chi']."""
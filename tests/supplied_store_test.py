@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+import tacl
+from tacl.exceptions import MalformedQueryError, MalformedResultsError
+from .tacl_test_case import TaclTestCase
+
+
+class SuppliedStoreTestCase (TaclTestCase):
+
+    """Unit tests of the SuppliedStore class."""
+
+    def setUp(self):
+        self._tokenizer = tacl.Tokenizer(
+            *tacl.constants.TOKENIZERS['cbeta'])
+
+    def test_diff_supplied_one_label(self):
+        store = tacl.SuppliedStore()
+        output_fh = MagicMock(name='fh')
+        self.assertRaises(MalformedQueryError, store.diff_supplied,
+                          ['a.csv'], ['A'], self._tokenizer, output_fh)
+
+    def test_get_label_counts(self):
+        matches = pd.DataFrame(
+            [['AB', 'A'], ['BC', 'A'], ['AB', 'B'], ['AB', 'A'],
+             ['CD', 'C'], ['BC', 'C']],
+            columns=[tacl.constants.NGRAM_FIELDNAME,
+                     tacl.constants.LABEL_FIELDNAME])
+        actual_counts = list(tacl.SuppliedStore._get_label_counts(matches))
+        self.assertEqual(actual_counts, [2, 2, 2, 2, 1, 2])
+
+    def test_intersection_supplied_argument_mismatch(self):
+        store = tacl.SuppliedStore()
+        output_fh = MagicMock(name='fh')
+        self.assertRaises(MalformedQueryError, store.intersection_supplied,
+                          ['a.csv', 'b.csv'], ['A', 'B', 'C'], output_fh)
+
+    def test_load_results_sets_missing_columns(self):
+        store = tacl.SuppliedStore()
+        results = [io.StringIO('ngram,size,work\nAB,2,T1\n'),
+                   self._create_csv([['AB', '2', 'T2', 'base', '1', 'X']])]
+        self.assertRaises(MalformedResultsError, store._load_results_sets,
+                          results, ['A', 'B'])
+
+    def test_load_results_sets(self):
+        store = tacl.SuppliedStore()
+        results = [
+            self._create_csv([['AB', '2', 'T1', 'base', '1', 'X'],
+                              ['12', '2', 'T1', 'base', '2', 'X']]),
+            self._create_csv([['AB', '2', '0001', 'base', '3', 'Y']])]
+        matches = store._load_results_sets(results, ['A', 'B'])
+        self.assertEqual(list(matches.columns),
+                         list(tacl.constants.QUERY_FIELDNAMES))
+        self.assertEqual(
+            [tuple(row) for row in matches.itertuples(index=False)],
+            [('AB', 2, 'T1', 'base', 1, 'A'), ('12', 2, 'T1', 'base', 2, 'A'),
+             ('AB', 2, '0001', 'base', 3, 'B')])
+
+    def test_reduce_diff_results_no_overlap(self):
+        # An n-gram that does not overlap at all with any (n-1)-gram
+        # should be kept:
+        #   abdef vs abcbde
+        input_data = (
+            ['ef', '2', 'a', 'base', '1', 'A'],
+            ['abd', '3', 'a', 'base', '1', 'A'],
+            ['def', '3', 'a', 'base', '1', 'A'],
+            ['abde', '4', 'a', 'base', '1', 'A'],
+            ['bdef', '4', 'a', 'base', '1', 'A'],
+            ['abdef', '5', 'a', 'base', '1', 'A'],
+            ['bc', '2', 'b', 'base', '1', 'B'],
+            ['cb', '2', 'b', 'base', '1', 'B'],
+            ['abc', '3', 'b', 'base', '1', 'B'],
+            ['bcb', '3', 'b', 'base', '1', 'B'],
+            ['cbd', '3', 'b', 'base', '1', 'B'],
+            ['abcb', '4', 'b', 'base', '1', 'B'],
+            ['bcbd', '4', 'b', 'base', '1', 'B'],
+            ['cbde', '4', 'b', 'base', '1', 'B'],
+            ['abcbd', '5', 'b', 'base', '1', 'B'],
+            ['bcbde', '5', 'b', 'base', '1', 'B'],
+            ['cbdef', '5', 'b', 'base', '1', 'B'],
+            ['abcbde', '6', 'b', 'base', '1', 'B'],
+            ['bcbdef', '6', 'b', 'base', '1', 'B'],
+            ['abcbdef', '7', 'b', 'base', '1', 'B'])
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('ef', '2', 'a', 'base', '1', 'A'),
+            ('abd', '3', 'a', 'base', '1', 'A'),
+            ('bc', '2', 'b', 'base', '1', 'B'),
+            ('cb', '2', 'b', 'base', '1', 'B'),
+            ('bcb', '3', 'b', 'base', '1', 'B')
+        ]
+        actual_rows = self._reduce_diff(input_data)
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_reduce_diff_results_size(self):
+        # Consider a diff where the smallest gram for a witness is
+        # larger than the smallest gram across all witnesses:
+        #   abdef vs abcbdef
+        input_data = (
+            ['abd', '3', 'a', 'base', '1', 'A'],
+            ['abde', '4', 'a', 'base', '1', 'A'],
+            ['abdef', '5', 'a', 'base', '1', 'A'],
+            ['bc', '2', 'b', 'base', '1', 'B'],
+            ['cb', '2', 'b', 'base', '1', 'B'],
+            ['abc', '3', 'b', 'base', '1', 'B'],
+            ['bcb', '3', 'b', 'base', '1', 'B'],
+            ['cbd', '3', 'b', 'base', '1', 'B'],
+            ['abcb', '4', 'b', 'base', '1', 'B'],
+            ['bcbd', '4', 'b', 'base', '1', 'B'],
+            ['cbde', '4', 'b', 'base', '1', 'B'],
+            ['abcbd', '5', 'b', 'base', '1', 'B'],
+            ['bcbde', '5', 'b', 'base', '1', 'B'],
+            ['cbdef', '5', 'b', 'base', '1', 'B'],
+            ['abcbde', '6', 'b', 'base', '1', 'B'],
+            ['bcbdef', '6', 'b', 'base', '1', 'B'],
+            ['abcbdef', '7', 'b', 'base', '1', 'B'])
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('abd', '3', 'a', 'base', '1', 'A'),
+            ('bc', '2', 'b', 'base', '1', 'B'),
+            ('cb', '2', 'b', 'base', '1', 'B'),
+            ('bcb', '3', 'b', 'base', '1', 'B')
+        ]
+        actual_rows = self._reduce_diff(input_data)
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def test_reduce_diff_results_witnesses(self):
+        # The same n-grams in different witnesses are reduced
+        # independently.
+        input_data = (
+            ['ab', '2', 'a', 'base', '1', 'A'],
+            ['bc', '2', 'a', 'base', '1', 'A'],
+            ['abc', '3', 'a', 'base', '1', 'A'],
+            ['ab', '2', 'a', 'wit', '1', 'A'],
+            ['abc', '3', 'a', 'wit', '1', 'A'],
+            ['bc', '2', 'b', 'base', '1', 'A'],
+            ['abc', '3', 'b', 'base', '1', 'A'])
+        expected_rows = [
+            tacl.constants.QUERY_FIELDNAMES,
+            ('ab', '2', 'a', 'base', '1', 'A'),
+            ('bc', '2', 'a', 'base', '1', 'A'),
+            ('abc', '3', 'a', 'base', '1', 'A'),
+            ('ab', '2', 'a', 'wit', '1', 'A'),
+            ('bc', '2', 'b', 'base', '1', 'A')
+        ]
+        actual_rows = self._reduce_diff(input_data)
+        self.assertEqual(set(actual_rows), set(expected_rows))
+
+    def _reduce_diff(self, input_data):
+        store = tacl.SuppliedStore()
+        matches = pd.read_csv(self._create_csv(input_data), encoding='utf-8',
+                              na_filter=False)
+        out_fh = io.StringIO(newline='')
+        store._reduce_diff_results(matches, self._tokenizer).to_csv(
+            out_fh, index=False)
+        return self._get_rows_from_csv(out_fh)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import pickle
 import unittest
 
 from lxml import etree
@@ -88,6 +89,32 @@ class TEICorpusCBETAGitHubTestCase (unittest.TestCase):
                                            method='text', encoding='unicode')
             self.assertEqual(expected_output, actual_output)
 
+    def test_pickle(self):
+        # Neither the compiled XSLT transform nor the logger is
+        # pickled; both are got again when unpickled.
+        state = self.corpus.__getstate__()
+        self.assertNotIn('transform', state)
+        self.assertNotIn('_logger', state)
+        unpickled = pickle.loads(pickle.dumps(self.corpus))
+        self.assertIs(unpickled.transform, self.corpus.transform)
+        self.assertIs(unpickled._logger, self.corpus._logger)
+        self.assertEqual(unpickled._input_dir, self.corpus._input_dir)
+
+    def test_update_refs(self):
+        """Tests that all reference texts are replaced with sorted xml:id
+        references."""
+        root = etree.XML('''
+<div xmlns="http://www.tei-c.org/ns/1.0">
+  <lem wit="【宋】【大】">念</lem>
+  <rdg wit="【大】【元】【明】">忘</rdg>
+</div>''')
+        bearers = root.xpath('//*[@wit]')
+        xml_ids = {'【元】': 'wit1', '【大】': 'wit2', '【宋】': 'wit3',
+                   '【明】': 'wit4'}
+        self.corpus._update_refs(root, bearers, 'wit', xml_ids)
+        self.assertEqual([bearer.get('wit') for bearer in bearers],
+                         ['#wit2 #wit3', '#wit1 #wit2 #wit4'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -23,6 +23,16 @@ class TextTestCase (TaclTestCase):
         expected_content = 'aFcFfgFe'
         self.assertEqual(actual_content, expected_content)
 
+    def test_find_ngrams(self):
+        tokens = ['a', 'b', 'a', 'b', 'a', '[c d]']
+        ngrams = ['aba', 'ba[cd]', 'e', 'ab', 'bc']
+        actual_occurrences = set(tacl.text.find_ngrams(
+            tokens, ngrams, self._tokenizer))
+        expected_occurrences = {
+            (0, 3, 'aba'), (2, 5, 'aba'), (3, 6, 'ba[cd]'), (0, 2, 'ab'),
+            (2, 4, 'ab')}
+        self.assertEqual(actual_occurrences, expected_occurrences)
+
     def test_get_ngrams(self):
         content = '阿闍世[(禾*尤)\n/上/日]首佛足。敬強阿闍世耶。又'
         text = tacl.WitnessText('test', 'base', content, self._tokenizer)